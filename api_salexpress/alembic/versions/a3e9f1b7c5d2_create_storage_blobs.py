@@ -0,0 +1,44 @@
+"""create_storage_blobs
+
+Revision ID: a3e9f1b7c5d2
+Revises: f6c2d7a4b8e3
+Create Date: 2026-03-02 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e9f1b7c5d2'
+down_revision: Union[str, None] = 'f6c2d7a4b8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'storage_blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False, comment='SHA-256 do conteúdo (hex)'),
+        sa.Column('key', sa.String(512), nullable=False, comment='Key do objeto no R2'),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False, server_default='0', comment='Tamanho físico do objeto'),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0', comment='Nodes que referenciam o objeto'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash', name='uq_storage_blobs_content_hash')
+    )
+    op.create_index(op.f('ix_storage_blobs_id'), 'storage_blobs', ['id'], unique=False)
+
+    # Arquivos existentes continuam sem hash (objeto próprio, fora da deduplicação)
+    op.add_column('storage_nodes', sa.Column('content_hash', sa.String(64), nullable=True, comment='SHA-256 do conteúdo (storage_blobs)'))
+    op.create_index(op.f('ix_storage_nodes_content_hash'), 'storage_nodes', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_storage_nodes_content_hash'), table_name='storage_nodes')
+    op.drop_column('storage_nodes', 'content_hash')
+    op.drop_index(op.f('ix_storage_blobs_id'), table_name='storage_blobs')
+    op.drop_table('storage_blobs')
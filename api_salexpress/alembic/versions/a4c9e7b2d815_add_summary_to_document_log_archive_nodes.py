@@ -0,0 +1,30 @@
+"""add_summary_to_document_log_archive_nodes
+
+Revision ID: a4c9e7b2d815
+Revises: d7f3b1a9c264
+Create Date: 2026-03-30 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c9e7b2d815'
+down_revision: Union[str, None] = 'd7f3b1a9c264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Arquivos já existentes ficam com NULL: o resumo é calculado na primeira leitura
+    op.add_column(
+        'document_log_archive_nodes',
+        sa.Column('resumo', sa.JSON(), nullable=True, comment='Por ação: total e último log do node no mês')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('document_log_archive_nodes', 'resumo')
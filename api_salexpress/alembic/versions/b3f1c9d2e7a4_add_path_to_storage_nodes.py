@@ -0,0 +1,45 @@
+"""add_path_to_storage_nodes
+
+Revision ID: b3f1c9d2e7a4
+Revises: a1b2c3d4e5f7
+Create Date: 2026-01-12 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c9d2e7a4'
+down_revision: Union[str, None] = 'a1b2c3d4e5f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Path materializado: IDs dos ancestrais + o próprio node (ex: "/1/5/23/")
+    op.add_column('storage_nodes', sa.Column('path', sa.String(512), nullable=True, comment='Caminho materializado de ancestrais (/1/5/23/)'))
+    op.create_index('ix_storage_nodes_path', 'storage_nodes', ['path'], unique=False)
+
+    # Backfill nível a nível: uma query por nível da árvore (não por node)
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "UPDATE storage_nodes SET path = CONCAT('/', id, '/') WHERE parent_id IS NULL"
+    ))
+
+    while True:
+        result = conn.execute(sa.text(
+            "UPDATE storage_nodes c "
+            "JOIN storage_nodes p ON c.parent_id = p.id "
+            "SET c.path = CONCAT(p.path, c.id, '/') "
+            "WHERE c.path IS NULL AND p.path IS NOT NULL"
+        ))
+        if result.rowcount == 0:
+            break
+
+
+def downgrade() -> None:
+    op.drop_index('ix_storage_nodes_path', table_name='storage_nodes')
+    op.drop_column('storage_nodes', 'path')
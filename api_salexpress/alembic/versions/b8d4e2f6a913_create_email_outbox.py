@@ -0,0 +1,51 @@
+"""create_email_outbox
+
+Revision ID: b8d4e2f6a913
+Revises: a3e9f1b7c5d2
+Create Date: 2026-03-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4e2f6a913'
+down_revision: Union[str, None] = 'a3e9f1b7c5d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('destinatarios', sa.JSON(), nullable=False),
+        sa.Column('assunto', sa.String(255), nullable=False),
+        sa.Column('mensagem', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=False),
+        sa.Column('conteudo_hash', sa.String(64), nullable=False),
+        sa.Column('origem', sa.String(50), nullable=True, comment='Quem enfileirou (vencimento, reset_senha, ...)'),
+        sa.Column('notification_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('tentativas', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('ultimo_erro', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('enviada_em', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_email_outbox_id'), 'email_outbox', ['id'], unique=False)
+    op.create_index(op.f('ix_email_outbox_conteudo_hash'), 'email_outbox', ['conteudo_hash'], unique=False)
+    op.create_index(op.f('ix_email_outbox_notification_id'), 'email_outbox', ['notification_id'], unique=False)
+    op.create_index('idx_email_outbox_status_next', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_email_outbox_status_next', table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_notification_id'), table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_conteudo_hash'), table_name='email_outbox')
+    op.drop_index(op.f('ix_email_outbox_id'), table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,47 @@
+"""create_notification_preferences
+
+Revision ID: b9e3d6a1c478
+Revises: a4c9e7b2d815
+Create Date: 2026-04-02 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e3d6a1c478'
+down_revision: Union[str, None] = 'a4c9e7b2d815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_preferences',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('tipo_usuario', sa.String(20), nullable=False),
+        sa.Column('modo_notificacao', sa.String(20), nullable=False, server_default='imediato',
+                  comment='imediato, diario ou semanal (resumo)'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'tipo_usuario', name='uq_notification_preferences_user')
+    )
+    op.create_index(op.f('ix_notification_preferences_id'), 'notification_preferences', ['id'], unique=False)
+
+    # Quem já usou PUT /modo-notificacao tem todos os seguimentos ativos no mesmo modo de resumo
+    op.execute(
+        "INSERT INTO notification_preferences (user_id, tipo_usuario, modo_notificacao) "
+        "SELECT user_id, tipo_usuario, MIN(modo_notificacao) FROM document_followers "
+        "WHERE ativo = 1 GROUP BY user_id, tipo_usuario "
+        "HAVING COUNT(DISTINCT modo_notificacao) = 1 AND MIN(modo_notificacao) <> 'imediato'"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_notification_preferences_id'), table_name='notification_preferences')
+    op.drop_table('notification_preferences')
@@ -0,0 +1,56 @@
+"""track_physical_storage_usage
+
+Revision ID: c3f8a2e6d914
+Revises: b9e3d6a1c478
+Create Date: 2026-04-06 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a2e6d914'
+down_revision: Union[str, None] = 'b9e3d6a1c478'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'company_blob_refs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False, comment='SHA-256 do conteúdo (hex)'),
+        sa.Column('refs', sa.Integer(), nullable=False, server_default='0', comment='Nodes ativos da empresa com o conteúdo'),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False, server_default='0', comment='Tamanho físico do objeto'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'content_hash', name='uq_company_blob_refs_hash')
+    )
+    op.create_index(op.f('ix_company_blob_refs_id'), 'company_blob_refs', ['id'], unique=False)
+
+    # Carga inicial (mesma regra de reconcile_company_usage): arquivos ativos com company_id
+    conn = op.get_bind()
+    active = "FROM storage_nodes WHERE deleted_at IS NULL AND company_id IS NOT NULL AND type = 'file'"
+    conn.execute(sa.text(
+        "INSERT INTO company_blob_refs (company_id, content_hash, refs, size_bytes) "
+        "SELECT company_id, content_hash, COUNT(*), COALESCE(MAX(size_bytes), 0) "
+        f"{active} AND content_hash IS NOT NULL GROUP BY company_id, content_hash"
+    ))
+    conn.execute(sa.text(
+        "INSERT INTO company_storage_usage (company_id, dimension, bucket, items, bytes) "
+        "SELECT company_id, 'physical', 'file', SUM(items), SUM(bytes) FROM ("
+        f"SELECT company_id, COUNT(*) AS items, COALESCE(SUM(size_bytes), 0) AS bytes {active} "
+        "AND content_hash IS NULL GROUP BY company_id "
+        "UNION ALL "
+        "SELECT company_id, 0, SUM(size_bytes) FROM company_blob_refs GROUP BY company_id"
+        ") t GROUP BY company_id"
+    ))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM company_storage_usage WHERE dimension = 'physical'")
+    op.drop_index(op.f('ix_company_blob_refs_id'), table_name='company_blob_refs')
+    op.drop_table('company_blob_refs')
@@ -0,0 +1,33 @@
+"""add_notification_digest_mode
+
+Revision ID: c5a1d9e3f72b
+Revises: b8d4e2f6a913
+Create Date: 2026-03-10 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a1d9e3f72b'
+down_revision: Union[str, None] = 'b8d4e2f6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('document_followers', sa.Column(
+        'modo_notificacao', sa.String(20), nullable=False, server_default='imediato',
+        comment='imediato, diario ou semanal (resumo)'
+    ))
+    op.add_column('document_notifications', sa.Column('email_outbox_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_document_notifications_email_outbox_id'), 'document_notifications', ['email_outbox_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_document_notifications_email_outbox_id'), table_name='document_notifications')
+    op.drop_column('document_notifications', 'email_outbox_id')
+    op.drop_column('document_followers', 'modo_notificacao')
@@ -0,0 +1,58 @@
+"""collapse_inherited_shares
+
+Revision ID: c7d2e8f4a1b6
+Revises: b3f1c9d2e7a4
+Create Date: 2026-01-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e8f4a1b6'
+down_revision: Union[str, None] = 'b3f1c9d2e7a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Com herança implícita, o Share da pasta ancestral já cobre a subárvore:
+    # remove as cópias por descendente (mesmo receptor e remetente) que não
+    # concedem mais do que o compartilhamento do ancestral.
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "DELETE s FROM shares s "
+        "JOIN storage_nodes n ON n.id = s.node_id "
+        "JOIN shares a ON a.shared_with_user_id = s.shared_with_user_id "
+        "AND a.shared_by_user_id = s.shared_by_user_id "
+        "AND a.type_user_receiver <=> s.type_user_receiver "
+        "AND a.id <> s.id "
+        "AND a.allow_editing >= s.allow_editing "
+        "JOIN storage_nodes an ON an.id = a.node_id "
+        "WHERE n.id <> an.id AND n.path LIKE CONCAT(an.path, '%')"
+    ))
+
+
+def downgrade() -> None:
+    # Recria a cópia por descendente de cada compartilhamento de pasta (como antes
+    # da herança implícita), inclusive para pastas compartilhadas depois do upgrade.
+    # Com mais de uma pasta ancestral compartilhada, vale a maior permissão de edição.
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        "INSERT INTO shares (node_id, shared_with_user_id, shared_by_user_id, "
+        "type_user_sender, type_user_receiver, allow_editing) "
+        "SELECT n.id, a.shared_with_user_id, a.shared_by_user_id, "
+        "MAX(a.type_user_sender), a.type_user_receiver, MAX(a.allow_editing) "
+        "FROM shares a "
+        "JOIN storage_nodes an ON an.id = a.node_id "
+        "JOIN storage_nodes n ON n.path LIKE CONCAT(an.path, '%') AND n.id <> an.id "
+        "WHERE NOT EXISTS ("
+        "SELECT 1 FROM shares s WHERE s.node_id = n.id "
+        "AND s.shared_with_user_id = a.shared_with_user_id "
+        "AND s.shared_by_user_id = a.shared_by_user_id "
+        "AND s.type_user_receiver <=> a.type_user_receiver) "
+        "GROUP BY n.id, a.shared_with_user_id, a.shared_by_user_id, a.type_user_receiver"
+    ))
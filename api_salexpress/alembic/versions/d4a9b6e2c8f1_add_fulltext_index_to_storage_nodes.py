@@ -0,0 +1,33 @@
+"""add_fulltext_index_to_storage_nodes
+
+Revision ID: d4a9b6e2c8f1
+Revises: c7d2e8f4a1b6
+Create Date: 2026-01-26 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9b6e2c8f1'
+down_revision: Union[str, None] = 'c7d2e8f4a1b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Índice FULLTEXT para a busca por nome/comentários (substitui ILIKE '%termo%')
+    op.create_index(
+        'ix_storage_nodes_fulltext',
+        'storage_nodes',
+        ['name', 'comments'],
+        unique=False,
+        mysql_prefix='FULLTEXT'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_storage_nodes_fulltext', table_name='storage_nodes')
@@ -0,0 +1,89 @@
+"""partition_and_archive_document_logs
+
+Revision ID: d7f3b1a9c264
+Revises: c5a1d9e3f72b
+Create Date: 2026-03-24 10:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3b1a9c264'
+down_revision: Union[str, None] = 'c5a1d9e3f72b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partições criadas à frente do mês atual (depois mantidas por POST /storage-quota/logs/arquivar)
+MONTHS_AHEAD = 3
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'document_log_archives',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('periodo', sa.String(7), nullable=False, comment='Mês arquivado (AAAA-MM)'),
+        sa.Column('inicio', sa.DateTime(), nullable=False, comment='Início do mês'),
+        sa.Column('fim', sa.DateTime(), nullable=False, comment='Início do mês seguinte (exclusivo)'),
+        sa.Column('object_key', sa.String(500), nullable=False, comment='Key do arquivo .jsonl.gz no R2'),
+        sa.Column('total_registros', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('tamanho_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('version_keys', sa.JSON(), nullable=True, comment='Keys de versões substituídas referenciadas no mês'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        mysql_charset='utf8mb4',
+        mysql_collate='utf8mb4_unicode_ci'
+    )
+    op.create_index(op.f('ix_document_log_archives_id'), 'document_log_archives', ['id'], unique=False)
+    op.create_index(op.f('ix_document_log_archives_periodo'), 'document_log_archives', ['periodo'], unique=False)
+
+    op.create_table(
+        'document_log_archive_nodes',
+        sa.Column('archive_id', sa.Integer(), nullable=False, comment='ID em document_log_archives'),
+        sa.Column('node_id', sa.Integer(), nullable=False, comment='ID do documento/pasta'),
+        sa.Column('total_registros', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('archive_id', 'node_id')
+    )
+    op.create_index(op.f('ix_document_log_archive_nodes_node_id'), 'document_log_archive_nodes', ['node_id'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'mysql':
+        return
+
+    # Particionamento exige a coluna de partição em toda chave única (inclusive a PK).
+    # O id continua AUTO_INCREMENT e único na prática; ix_document_logs_id segue indexando-o.
+    op.execute("ALTER TABLE document_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+
+    # Uma partição por mês, do log mais antigo até MONTHS_AHEAD meses à frente
+    oldest = bind.execute(sa.text("SELECT MIN(created_at) FROM document_logs")).scalar()
+    current = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month = (oldest or current).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    partitions = []
+    while month <= _add_months(current, MONTHS_AHEAD):
+        bound = _add_months(month, 1)
+        partitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')")
+        month = bound
+    partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+    op.execute(f"ALTER TABLE document_logs PARTITION BY RANGE COLUMNS(created_at) ({', '.join(partitions)})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute("ALTER TABLE document_logs REMOVE PARTITIONING")
+        op.execute("ALTER TABLE document_logs DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+
+    op.drop_index(op.f('ix_document_log_archive_nodes_node_id'), table_name='document_log_archive_nodes')
+    op.drop_table('document_log_archive_nodes')
+    op.drop_index(op.f('ix_document_log_archives_periodo'), table_name='document_log_archives')
+    op.drop_index(op.f('ix_document_log_archives_id'), table_name='document_log_archives')
+    op.drop_table('document_log_archives')
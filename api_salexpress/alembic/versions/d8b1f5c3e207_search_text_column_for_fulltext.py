@@ -0,0 +1,49 @@
+"""search_text_column_for_fulltext
+
+Revision ID: d8b1f5c3e207
+Revises: c3f8a2e6d914
+Create Date: 2026-04-08 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b1f5c3e207'
+down_revision: Union[str, None] = 'c3f8a2e6d914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # O FULLTEXT do InnoDB trata "_" como letra: indexar o nome com "_" trocado por
+    # espaço para que "contrato" encontre "NF_2024_contrato.pdf" (coluna STORED:
+    # o InnoDB não aceita FULLTEXT em coluna gerada virtual)
+    op.add_column('storage_nodes', sa.Column(
+        'search_text', sa.Text(),
+        sa.Computed("CONCAT_WS(' ', REPLACE(name, '_', ' '), comments)", persisted=True),
+        nullable=True
+    ))
+    op.drop_index('ix_storage_nodes_fulltext', table_name='storage_nodes')
+    op.create_index(
+        'ix_storage_nodes_search_text',
+        'storage_nodes',
+        ['search_text'],
+        unique=False,
+        mysql_prefix='FULLTEXT'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_storage_nodes_search_text', table_name='storage_nodes')
+    op.create_index(
+        'ix_storage_nodes_fulltext',
+        'storage_nodes',
+        ['name', 'comments'],
+        unique=False,
+        mysql_prefix='FULLTEXT'
+    )
+    op.drop_column('storage_nodes', 'search_text')
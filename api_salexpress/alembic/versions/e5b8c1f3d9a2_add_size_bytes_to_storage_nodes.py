@@ -0,0 +1,61 @@
+"""add_size_bytes_to_storage_nodes
+
+Revision ID: e5b8c1f3d9a2
+Revises: d4a9b6e2c8f1
+Create Date: 2026-02-02 10:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c1f3d9a2'
+down_revision: Union[str, None] = 'd4a9b6e2c8f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+MULTIPLIERS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4, 'PB': 1024 ** 5}
+
+
+def _parse_size(size_str):
+    # Cópia congelada de parse_size_to_bytes (migrations não importam o app)
+    size_str = (size_str or '').strip().upper()
+    if size_str.isdigit():
+        return int(size_str)
+    match = re.match(r'^([\d.]+)\s*([KMGTP]?B)?$', size_str)
+    if not match:
+        return 0
+    try:
+        return int(float(match.group(1)) * MULTIPLIERS[match.group(2) or 'B'])
+    except ValueError:
+        return 0
+
+
+def upgrade() -> None:
+    op.add_column('storage_nodes', sa.Column('size_bytes', sa.BigInteger(), nullable=True, comment='Tamanho do arquivo em bytes'))
+
+    # Backfill a partir da string "size" ("1.5 MB"), em lotes por id
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text(
+            "SELECT id, size FROM storage_nodes "
+            "WHERE id > :last_id AND size IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE storage_nodes SET size_bytes = :size_bytes WHERE id = :id"),
+            [{"id": row[0], "size_bytes": _parse_size(row[1])} for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_column('storage_nodes', 'size_bytes')
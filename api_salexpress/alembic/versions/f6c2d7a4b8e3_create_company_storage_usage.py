@@ -0,0 +1,64 @@
+"""create_company_storage_usage
+
+Revision ID: f6c2d7a4b8e3
+Revises: e5b8c1f3d9a2
+Create Date: 2026-02-09 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c2d7a4b8e3'
+down_revision: Union[str, None] = 'e5b8c1f3d9a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'company_storage_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('company_id', sa.Integer(), nullable=False),
+        sa.Column('dimension', sa.String(20), nullable=False),
+        sa.Column('bucket', sa.String(100), nullable=False),
+        sa.Column('items', sa.Integer(), nullable=False, server_default='0', comment='Quantidade de nodes'),
+        sa.Column('bytes', sa.BigInteger(), nullable=False, server_default='0', comment='Soma de size_bytes'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'dimension', 'bucket', name='uq_company_storage_usage_bucket')
+    )
+    op.create_index(op.f('ix_company_storage_usage_id'), 'company_storage_usage', ['id'], unique=False)
+    op.create_index(op.f('ix_company_storage_usage_company_id'), 'company_storage_usage', ['company_id'], unique=False)
+
+    # Carga inicial (mesma regra de reconcile_company_usage): apenas nodes ativos com company_id
+    conn = op.get_bind()
+    active = "FROM storage_nodes WHERE deleted_at IS NULL AND company_id IS NOT NULL"
+    conn.execute(sa.text(
+        "INSERT INTO company_storage_usage (company_id, dimension, bucket, items, bytes) "
+        "SELECT company_id, 'total', type, COUNT(*), "
+        "CASE WHEN type = 'file' THEN COALESCE(SUM(size_bytes), 0) ELSE 0 END "
+        f"{active} GROUP BY company_id, type"
+    ))
+    conn.execute(sa.text(
+        "INSERT INTO company_storage_usage (company_id, dimension, bucket, items, bytes) "
+        "SELECT company_id, 'extension', bucket, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ("
+        "SELECT company_id, size_bytes, COALESCE(NULLIF(extension, ''), 'sem extensão') AS bucket "
+        f"{active} AND type = 'file') t GROUP BY company_id, bucket"
+    ))
+    conn.execute(sa.text(
+        "INSERT INTO company_storage_usage (company_id, dimension, bucket, items, bytes) "
+        "SELECT company_id, 'status', bucket, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM ("
+        "SELECT company_id, size_bytes, "
+        "CASE WHEN status IS NULL OR TRIM(status) = '' THEN 'Sem Status' ELSE status END AS bucket "
+        f"{active} AND type = 'file') t GROUP BY company_id, bucket"
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_company_storage_usage_company_id'), table_name='company_storage_usage')
+    op.drop_index(op.f('ix_company_storage_usage_id'), table_name='company_storage_usage')
+    op.drop_table('company_storage_usage')
@@ -8,15 +8,18 @@ from app.schemas.document_notification import (
     DocumentFollowerResponse,
     DocumentNotificationResponse,
     NotificationStatsResponse,
-    DocumentFollowerByEmailRequest
+    DocumentFollowerByEmailRequest,
+    ModoNotificacaoUpdate
 )
 from app.crud.document_notification import (
     seguir_documento,
     deixar_de_seguir_documento,
     atualizar_configuracoes_seguimento,
+    definir_modo_notificacao_usuario,
     listar_documentos_seguidos,
     listar_notificacoes_usuario,
-    seguir_documento_por_email
+    seguir_documento_por_email,
+    seguir_como_dono_backfill
 )
 from app.services.document_notification_service import verificar_e_notificar_vencimentos
 
@@ -63,7 +66,8 @@ def seguir_documento_por_email_endpoint(
     {
         "email": "usuario@exemplo.com",
         "dias_antes_alerta": 7,
-        "alertar_no_vencimento": true
+        "alertar_no_vencimento": true,
+        "modo_notificacao": "imediato"
     }
     ```
     
@@ -72,13 +76,15 @@ def seguir_documento_por_email_endpoint(
     - **email**: Email do usuário que vai seguir o documento
     - **dias_antes_alerta**: Quantos dias antes do vencimento alertar (0-90, padrão: 7)
     - **alertar_no_vencimento**: Se deve alertar no dia do vencimento (padrão: true)
+    - **modo_notificacao**: imediato (um email por alerta), diario ou semanal (resumo); padrão: preferência do usuário
     """
     return seguir_documento_por_email(
         db=db,
         node_id=node_id,
         email=payload.email,
         dias_antes_alerta=payload.dias_antes_alerta,
-        alertar_no_vencimento=payload.alertar_no_vencimento
+        alertar_no_vencimento=payload.alertar_no_vencimento,
+        modo_notificacao=payload.modo_notificacao
     )
 
 @router.delete("/deixar-de-seguir/{node_id}")
@@ -113,12 +119,30 @@ def atualizar_configuracoes_endpoint(
     ```json
     {
         "dias_antes_alerta": 15,
-        "alertar_no_vencimento": true
+        "alertar_no_vencimento": true,
+        "modo_notificacao": "diario"
     }
     ```
     """
     return atualizar_configuracoes_seguimento(db, node_id, user_id, tipo_usuario, payload)
 
+@router.put("/modo-notificacao")
+def definir_modo_notificacao_endpoint(
+    user_id: int,
+    tipo_usuario: str,
+    payload: ModoNotificacaoUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Definir o modo de notificação do usuário: vale para os documentos já seguidos
+    e para os que ele passar a seguir (inclusive os próprios arquivos novos)
+    
+    - **imediato**: um email para cada alerta de vencimento
+    - **diario**: um único email por dia com todos os alertas do dia
+    - **semanal**: um único email por semana com os alertas dos próximos 7 dias e os documentos vencidos
+    """
+    return definir_modo_notificacao_usuario(db, user_id, tipo_usuario, payload.modo_notificacao)
+
 @router.get("/meus-documentos")
 def listar_meus_documentos_seguidos(
     user_id: int,
@@ -179,6 +203,21 @@ def verificar_vencimentos_endpoint(
         "status": "processing"
     }
 
+@router.post("/seguir-como-dono/backfill")
+def seguir_como_dono_backfill_endpoint(db: Session = Depends(get_db)):
+    """
+    Faz cada dono seguir os próprios arquivos que ainda não segue
+    
+    Arquivos novos já são seguidos pelo dono na criação; este endpoint cobre os
+    arquivos antigos (antes o seguimento era criado ao listar a pasta). Deve ser
+    executado uma vez após o deploy; repetir é seguro. Arquivos que o dono deixou
+    de seguir não voltam a ser seguidos.
+    """
+    return {
+        "message": "Backfill de seguidores concluído",
+        **seguir_como_dono_backfill(db)
+    }
+
 @router.get("/estatisticas")
 def obter_estatisticas_notificacoes(
     user_id: int,
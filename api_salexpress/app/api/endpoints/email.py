@@ -25,6 +25,35 @@ def get_code(data: SaveEmailForValidade, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/outbox/estatisticas")
+def outbox_estatisticas(db: Session = Depends(get_db)):
+    """Quantidade de e-mails na fila por status (pending, sending, sent, failed)"""
+    from app.services.email_outbox import outbox_stats
+    return outbox_stats(db)
+
+
+@router.get("/outbox/{email_id}")
+def outbox_status(email_id: int, db: Session = Depends(get_db)):
+    """Status de entrega de um e-mail enfileirado"""
+    from app.services.email_outbox import get_email_status
+    status = get_email_status(db, email_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="E-mail não encontrado na fila")
+    return status
+
+
+@router.post("/outbox/processar")
+def outbox_processar(limit: int | None = None, db: Session = Depends(get_db)):
+    """
+    Processa um lote da fila de e-mails agora.
+    
+    O worker da API já drena a fila continuamente; este endpoint serve para
+    instâncias com EMAIL_OUTBOX_WORKER_ENABLED=false (via cron) e para reprocessar manualmente.
+    """
+    from app.services.email_outbox import process_outbox
+    return process_outbox(db, limit)
+
+
 @router.post("/verify_code")
 def verify_code(data: SaveEmailForValidade, db: Session = Depends(get_db)):
     try:
@@ -46,7 +46,9 @@ def solicitar_reset_senha(
         email_enviado = set_email(
             destinatarios=reset_data['email'],
             assunto=assunto,
-            mensagem=mensagem
+            mensagem=mensagem,
+            db=db,
+            origem="reset_senha"
         )
         
         if not email_enviado:
@@ -2,9 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.conn import get_db
-from app.schemas.share import ShareCreate, ShareCreateLegacy, ShareResponse
+from app.schemas.share import ShareCreate, ShareCreateLegacy, ShareResponse, ShareSummaryResponse
 from app.models.share import Share
-from app.crud.share import create_share, create_share_legacy, get_shared_nodes, get_shared_root_nodes
+from app.crud.share import create_share, create_share_summary, create_share_legacy, get_shared_nodes, get_shared_root_nodes
 from app.crud.user_business_link import get_user_info_by_email, get_user_basic_info
 from app.schemas.storage import StorageResponse
 
@@ -24,6 +24,24 @@ def share_node(payload: ShareCreate, db: Session = Depends(get_db)):
     """
     return create_share(db, payload)
 
+@router.post("/summary", response_model=ShareSummaryResponse)
+def share_node_summary(payload: ShareCreate, db: Session = Depends(get_db)):
+    """
+    Compartilha um arquivo ou pasta (recursivamente) e retorna apenas as contagens
+    
+    Recomendado para pastas grandes: toda a subárvore é compartilhada em uma
+    única transação, sem devolver cada registro criado.
+    
+    Exemplo de resposta:
+    {
+        "node_id": 123,
+        "total_itens": 2050,
+        "criados": 2048,
+        "atualizados": 2
+    }
+    """
+    return create_share_summary(db, payload)
+
 @router.post("/legacy", response_model=ShareResponse)
 def share_node_legacy(payload: ShareCreateLegacy, db: Session = Depends(get_db)):
     """
@@ -73,25 +91,30 @@ def shared_with_me(user_id: int, type_user: str = None, db: Session = Depends(ge
         seguimento_batch = verificar_seguimento_batch(db, file_node_ids, user_id, type_user)
         dono_batch = verificar_dono_batch(db, nodes, user_id, type_user)
         
-    # Buscar permissões de edição para todos os nós (arquivos e pastas)
-    from app.crud.share import get_share_permissions_batch
-    permissions_batch = get_share_permissions_batch(db, [n.id for n in nodes], user_id)
+    # Compartilhamentos efetivos (diretos ou herdados da pasta ancestral) em uma query:
+    # dão a permissão de edição e quem compartilhou cada nó
+    from app.crud.share import get_effective_shares_batch
+    effective_shares = get_effective_shares_batch(db, nodes, user_id)
+    permissions_batch = {
+        node_id: any(share.allow_editing for share in node_shares)
+        for node_id, node_shares in effective_shares.items()
+    }
     
-    # Batch para Informações do remetente (Quem compartilhou)
+    # Batch para Informações do remetente (Quem compartilhou o ancestral mais próximo)
     sender_info_batch = {}
-    shares = db.query(Share).filter(Share.shared_with_user_id == user_id).all()
+    shares = [(node_id, node_shares[0]) for node_id, node_shares in effective_shares.items()]
     
     # Cache para evitar queries repetidas de usuário
     user_cache = {}
     
-    for share in shares:
+    for node_id, share in shares:
         sender_key = (share.shared_by_user_id, share.type_user_sender)
         
         if sender_key not in user_cache:
             user_info = get_user_basic_info(db, share.shared_by_user_id, share.type_user_sender)
             user_cache[sender_key] = user_info['name']
             
-        sender_info_batch[share.node_id] = user_cache[sender_key]
+        sender_info_batch[node_id] = user_cache[sender_key]
     
     # Montar resultado
     result = []
@@ -182,18 +205,23 @@ def shared_with_me_by_email(email: str, db: Session = Depends(get_db)):
     seguimento_batch = verificar_seguimento_batch(db, file_node_ids, user_id, type_user) if file_node_ids else {}
     dono_batch = verificar_dono_batch(db, nodes, user_id, type_user)
 
-    # Buscar permissões de edição
-    from app.crud.share import get_share_permissions_batch
-    permissions_batch = get_share_permissions_batch(db, [n.id for n in nodes], user_id)
+    # Compartilhamentos efetivos (diretos ou herdados da pasta ancestral) em uma query:
+    # dão a permissão de edição e quem compartilhou cada nó
+    from app.crud.share import get_effective_shares_batch
+    effective_shares = get_effective_shares_batch(db, nodes, user_id)
+    permissions_batch = {
+        node_id: any(share.allow_editing for share in node_shares)
+        for node_id, node_shares in effective_shares.items()
+    }
     
-    # Batch para Informações do remetente (Quem compartilhou)
+    # Batch para Informações do remetente (Quem compartilhou o ancestral mais próximo)
     sender_info_batch = {}
-    shares = db.query(Share).filter(Share.shared_with_user_id == user_id).all()
+    shares = [(node_id, node_shares[0]) for node_id, node_shares in effective_shares.items()]
     
     # Cache para evitar queries repetidas de usuário
     user_cache = {}
     
-    for share in shares:
+    for node_id, share in shares:
         sender_key = (share.shared_by_user_id, share.type_user_sender)
         
         if sender_key not in user_cache:
@@ -204,7 +232,7 @@ def shared_with_me_by_email(email: str, db: Session = Depends(get_db)):
                 print(f"Error fetching user info: {e}")
                 user_cache[sender_key] = "Desconhecido"
             
-        sender_info_batch[share.node_id] = user_cache[sender_key]
+        sender_info_batch[node_id] = user_cache[sender_key]
     
     # Montar resultado
     result = []
@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List, Literal
 from app.core.conn import get_db
 from app.schemas.storage import StorageCreate, StorageUpdate, StorageResponse, DocumentsWithPermissionsResponse, PresignedUploadRequest, PresignedUploadResponse
-from app.services.storage.r2_service import store_image
+from app.schemas.storage import (
+    MultipartInitiateResponse, MultipartPresignPartsRequest, MultipartPresignPartsResponse,
+    MultipartCompleteRequest, MultipartAbortRequest, BatchUploadResponse,
+    BatchPresignedUploadRequest, BatchPresignedUploadResponse, BatchCompleteUploadRequest
+)
+from app.services.storage.r2_service import store_image_dedup, store_images_dedup, store_stream_multipart
+from fastapi.concurrency import run_in_threadpool
 from app.crud.document_notification import (
     obter_seguidores_documento, 
     verificar_se_usuario_segue, 
     verificar_se_usuario_e_dono,
-    seguir_documento,
     obter_compartilhamentos_documento,
     obter_seguidores_batch,
     verificar_seguimento_batch
 )
-from app.schemas.document_notification import DocumentFollowerCreate
 from app.crud.document_log import (
     obter_resumo_rastreabilidade,
     obter_historico_completo_formatado,
@@ -24,8 +28,14 @@ from fastapi.encoders import jsonable_encoder
 DEV_PUBLIC_URL = "https://pub-44038362d56e40da83d1c72eaec658c5.r2.dev"
 import os
 import uuid
-from app.crud.storage import create_node, get_node, update_node, delete_node, list_children
-from app.crud.share import get_shared_nodes
+from app.crud.storage import (
+    create_node, get_node, update_node, delete_node, list_children, list_children_page,
+    build_children_query, create_nodes_batch,
+    descendants_filter, user_can_view_node
+)
+from app.models.storage import StorageNode, NodeType
+from app.utils.json_stream import STREAM_BATCH_SIZE, iter_batches, streaming_json_response
+from app.crud.share import get_shared_nodes, find_share_access
 from app.crud.storage_quota import check_storage_limit
 
 
@@ -84,6 +94,9 @@ def _enrich_nodes_with_followers(db: Session, nodes: List[any], user_id: int, ty
     """
     Enriquece uma lista de nodes com informações de seguidores e permissões em BATCH.
     Evita o problema N+1 de queries.
+    
+    Somente leitura: o dono passa a seguir o arquivo na criação (create_node /
+    create_nodes_batch); arquivos antigos entram pelo backfill de seguidores.
     """
     if not nodes or not user_id or not type_user:
         return nodes
@@ -139,29 +152,6 @@ def _enrich_nodes_with_followers(db: Session, nodes: List[any], user_id: int, ty
                 elif type_user == "freelancer":
                     e_dono = node.business_id == user_id
             node.usuario_e_dono = e_dono
-            
-            # Se for dono e não está seguindo, criar seguimento automático
-            if e_dono and not seguimento_info.get("seguindo"):
-                try:
-                    # Importar aqui para evitar circular
-                    from app.crud.document_notification import seguir_documento 
-                    seguidor_data = DocumentFollowerCreate(
-                        node_id=node.id,
-                        user_id=user_id,
-                        tipo_usuario=type_user,
-                        dias_antes_alerta=7,
-                        alertar_no_vencimento=True
-                    )
-                    seguir_documento(db, seguidor_data)
-                    
-                    # Atualizar visualmente
-                    node.usuario_atual_segue = {
-                        "seguindo": True,
-                        "dias_antes_alerta": 7,
-                        "alertar_no_vencimento": True
-                    }
-                except:
-                    pass
         else:
             # Pastas
             node.seguidores = None
@@ -171,6 +161,74 @@ def _enrich_nodes_with_followers(db: Session, nodes: List[any], user_id: int, ty
             
     return nodes
 
+def _shared_virtual_folder(children: List[dict]) -> dict:
+    """Pasta virtual "Compartilhados comigo" exibida na raiz"""
+    return {
+        "id": -1,
+        "name": "Compartilhados comigo",
+        "type": "folder",
+        "parent_id": None,
+        "business_id": None,
+        "type_user": None,
+        "size": None,
+        "extension": None,
+        "status": None,
+        "comments": None,
+        "url": None,
+        "created_at": None,
+        "updated_at": None,
+        "children": children
+    }
+
+def _stream_node_dicts(query, user_id: int = None, type_user: str = None, search_term: str = None, ordered: bool = False):
+    """
+    Gera os nodes da query já convertidos em dict, lendo do banco em lotes
+    limitados (crud.storage.iter_children_batches / iter_ordered_batches).
+    
+    Args:
+        query: listagem de build_children_query SEM ordenação (keyset na ordem padrão)
+               ou, com ordered=True, qualquer query de StorageNode já ordenada
+    
+    Roda depois que o endpoint retornou, então usa sessões próprias: uma para os
+    lotes e outra para as consultas de enriquecimento de cada lote.
+    """
+    from app.core.conn import SessionLocal
+    from app.crud.storage import iter_children_batches, iter_ordered_batches
+    
+    stream_db = SessionLocal()
+    lookup_db = SessionLocal()
+    try:
+        on_batch = None
+        if user_id and type_user:
+            def on_batch(batch):
+                files = [n for n in batch if getattr(n.type, 'value', n.type) == 'file']
+                _enrich_nodes_with_followers(lookup_db, files, user_id, type_user)
+        
+        query = query.with_session(stream_db)
+        if ordered:
+            batches = iter_ordered_batches(stream_db, query, STREAM_BATCH_SIZE)
+        else:
+            batches = iter_children_batches(stream_db, query, search_term, STREAM_BATCH_SIZE)
+        for node in iter_batches(batches, on_batch=on_batch, session=stream_db):
+            yield _convert_node_to_dict(node)
+    finally:
+        stream_db.close()
+        lookup_db.close()
+
+def _stream_root_nodes(db: Session, query, user_id: int, type_user: str, search_term: str = None):
+    """
+    Streaming da raiz: primeiro a pasta virtual com os nós compartilhados comigo,
+    depois os meus nós, cada parte em lotes na ordem da listagem.
+    Apenas os compartilhados de primeiro nível ficam em memória (filhos da pasta virtual).
+    """
+    is_owner = (StorageNode.business_id == user_id) & (StorageNode.type_user == type_user)
+    
+    shared = list(_stream_node_dicts(query.filter(~is_owner), user_id, type_user, search_term))
+    if shared:
+        yield _shared_virtual_folder(shared)
+    
+    yield from _stream_node_dicts(query.filter(is_owner), user_id, type_user, search_term)
+
 def _parse_parent(parent_raw):
     if parent_raw is None:
         return None
@@ -186,6 +244,61 @@ def _parse_parent(parent_raw):
         return None if parent_raw == 0 else parent_raw
     return None
 
+
+def _check_company_upload_permission(db: Session, company_id: int, company_type: str | None, business_id: int | None, type_user: str | None):
+    """Bloqueia (403) upload em empresa de terceiros sem a permissão manage_files"""
+    # Se for upload para empresa (que não seja a própria PF), verificar permissão
+    # Se business_id == company_id (dono da empresa fazendo upload), ok.
+    # Se não, verificar link ou colaborador.
+    
+    # Nota: business_id vem do form, mas a auth real deve ser verificada via token (user_id/type_user injetado via Depends? Não, aqui não tem Depends(get_current_user))
+    # O backend atual parece confiar nos IDs passados ou validar depois? 
+    # Risco: business_id pode ser spoofado?
+    # Aparentemente create_storage_node recebe business_id e type_user do frontend (Form).
+    # Isso é uma vulnerabilidade existente, mas focarei na permissão assumindo que business_id/type_user identificam o caller.
+    
+    # Melhor seria usar o user do token. Mas por consistência com o código existente:
+    caller_id = business_id
+    caller_type = type_user
+
+    if caller_id and caller_type and (company_id != caller_id or company_type != caller_type):
+        # Buscar permissões
+        from app.models.user_business_link import UserBusinessLink
+        from app.models.collaborator import CompanyCollaborator
+
+        link = db.query(UserBusinessLink).filter(
+            UserBusinessLink.user_id == caller_id,
+            UserBusinessLink.type_user == caller_type,
+            UserBusinessLink.business_id == company_id,
+            UserBusinessLink.status == 1
+        ).first()
+        
+        permissions = []
+        if link:
+            perms = link.permissions
+            if isinstance(perms, str):
+                import json
+                perms = json.loads(perms)
+            permissions = perms or []
+        elif caller_type == 'collaborator':
+             collab = db.query(CompanyCollaborator).filter(
+                 CompanyCollaborator.id == caller_id,
+                 CompanyCollaborator.company_id == company_id
+             ).first()
+             perms = collab.permissions if collab else []
+             if isinstance(perms, str):
+                 import json
+                 perms = json.loads(perms)
+             permissions = perms or []
+        
+        # Se não tem permissão manage_files, bloquear (suporta lista ou dict)
+        has_manage = 'manage_files' in permissions if isinstance(permissions, list) else permissions.get('manage_files')
+        if not has_manage:
+            # Exceção: Se é owner (mas o if checka company_id != caller_id)
+            # Se não for owner e não tiver permissão:
+            raise HTTPException(status_code=403, detail="Sem permissão para criar arquivos nesta empresa (manage_files)")
+
+
 @router.post("/", response_model=StorageResponse, summary="Criar arquivo ou pasta (multipart)")
 async def create_storage_node(
     file: UploadFile | None = File(default=None, description="Arquivo (obrigatório somente quando type=file)"),
@@ -202,57 +315,9 @@ async def create_storage_node(
     db: Session = Depends(get_db)
 ):
     # ✅ PERMISSION CHECK FOR COMPANY UPLOAD
+    # Trabalho de banco (síncrono) roda no threadpool para não travar o event loop
     if company_id and company_id != 0:
-        # Se for upload para empresa (que não seja a própria PF), verificar permissão
-        # Se business_id == company_id (dono da empresa fazendo upload), ok.
-        # Se não, verificar link ou colaborador.
-        
-        # Nota: business_id vem do form, mas a auth real deve ser verificada via token (user_id/type_user injetado via Depends? Não, aqui não tem Depends(get_current_user))
-        # O backend atual parece confiar nos IDs passados ou validar depois? 
-        # Risco: business_id pode ser spoofado?
-        # Aparentemente create_storage_node recebe business_id e type_user do frontend (Form).
-        # Isso é uma vulnerabilidade existente, mas focarei na permissão assumindo que business_id/type_user identificam o caller.
-        
-        # Melhor seria usar o user do token. Mas por consistência com o código existente:
-        caller_id = business_id
-        caller_type = type_user
-
-        if caller_id and caller_type and (company_id != caller_id or company_type != caller_type):
-            # Buscar permissões
-            from app.models.user_business_link import UserBusinessLink
-            from app.models.collaborator import CompanyCollaborator
-
-            link = db.query(UserBusinessLink).filter(
-                UserBusinessLink.user_id == caller_id,
-                UserBusinessLink.type_user == caller_type,
-                UserBusinessLink.business_id == company_id,
-                UserBusinessLink.status == 1
-            ).first()
-            
-            permissions = []
-            if link:
-                perms = link.permissions
-                if isinstance(perms, str):
-                    import json
-                    perms = json.loads(perms)
-                permissions = perms or []
-            elif caller_type == 'collaborator':
-                 collab = db.query(CompanyCollaborator).filter(
-                     CompanyCollaborator.id == caller_id,
-                     CompanyCollaborator.company_id == company_id
-                 ).first()
-                 perms = collab.permissions if collab else []
-                 if isinstance(perms, str):
-                     import json
-                     perms = json.loads(perms)
-                 permissions = perms or []
-            
-            # Se não tem permissão manage_files, bloquear (suporta lista ou dict)
-            has_manage = 'manage_files' in permissions if isinstance(permissions, list) else permissions.get('manage_files')
-            if not has_manage:
-                # Exceção: Se é owner (mas o if checka company_id != caller_id)
-                # Se não for owner e não tiver permissão:
-                raise HTTPException(status_code=403, detail="Sem permissão para criar arquivos nesta empresa (manage_files)")
+        await run_in_threadpool(_check_company_upload_permission, db, company_id, company_type, business_id, type_user)
 
     parent_parsed = _parse_parent(parent_id)
     
@@ -281,12 +346,15 @@ async def create_storage_node(
         # ✅ VALIDAR COTA DE ARMAZENAMENTO ANTES DO UPLOAD
         if company_id and company_type and size_bytes:
             try:
-                check_storage_limit(db, company_id, company_type, size_bytes)
+                await run_in_threadpool(check_storage_limit, db, company_id, company_type, size_bytes)
             except HTTPException as e:
                 # Re-lançar o erro de cota excedida
                 raise e
         
-        upload_result = store_image(
+        # OTIMIZADO: transferência no executor de uploads (não bloqueia o event loop)
+        # e conteúdo já armazenado não é enviado de novo (deduplicação)
+        upload_result = await store_image_dedup(
+            db,
             file_obj=file.file,
             original_filename=file.filename,
             folder=None,
@@ -306,13 +374,16 @@ async def create_storage_node(
             company_id=company_id,        # ID da empresa responsável
             company_type=company_type,    # Tipo da empresa
             size=size_str,
+            size_bytes=size_bytes,
             extension=ext or None,
             status=status,
             comments=comments,
             url=public_url,
             data_validade=data_validade_parsed
         )
-        return create_node(db, payload)
+        return await run_in_threadpool(
+            create_node, db, payload, upload_result.get("content_hash"), upload_result.get("deduplicated", False)
+        )
     else:
         payload = StorageCreate(
             name=name,
@@ -329,7 +400,7 @@ async def create_storage_node(
             url=None,
             data_validade=None
         )
-        return create_node(db, payload)
+        return await run_in_threadpool(create_node, db, payload)
 
 # (Opcional) rota antiga via JSON puro, caso necessário manter compatibilidade
 @router.post("/json", response_model=StorageResponse, include_in_schema=False)
@@ -411,10 +482,12 @@ def restore_from_trash(
     """
     from app.crud.storage import restore_node
     
-    node = restore_node(db, node_id, restore_to_parent, user_id, tipo_usuario)
+    result = restore_node(db, node_id, restore_to_parent, user_id, tipo_usuario)
+    node = result["node"]
     
     return {
         "message": "Item restaurado com sucesso",
+        "total_itens": result["total_itens"],
         "node": {
             "id": node.id,
             "name": node.name,
@@ -427,16 +500,22 @@ def restore_from_trash(
 @router.delete("/trash/{node_id}/permanent", summary="Deletar permanentemente")
 def permanent_delete_from_trash(
     node_id: int,
+    user_id: Optional[int] = None,
+    tipo_usuario: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Deleta permanentemente um arquivo ou pasta da lixeira
     ⚠️ ATENÇÃO: Esta ação não pode ser desfeita!
     Se for pasta, deleta recursivamente todos os arquivos dentro
+    
+    - **user_id** / **tipo_usuario**: Opcionais, registram quem fez a deleção no histórico
+    
+    Retorna os totais removidos (itens, compartilhamentos e seguidores)
     """
     from app.crud.storage import permanent_delete_node
     
-    return permanent_delete_node(db, node_id)
+    return permanent_delete_node(db, node_id, user_id, tipo_usuario)
 
 
 @router.post("/trash/empty", summary="Esvaziar lixeira")
@@ -489,27 +568,6 @@ def get_storage_node(
             # Verificar se é dono
             e_dono = verificar_se_usuario_e_dono(db, node_id, user_id, tipo_usuario)
             node.usuario_e_dono = e_dono
-            
-            # Se for dono e não está seguindo, criar seguimento automático
-            if e_dono and not seguimento_info.get("seguindo"):
-                try:
-                    seguidor_data = DocumentFollowerCreate(
-                        node_id=node_id,
-                        user_id=user_id,
-                        tipo_usuario=tipo_usuario,
-                        dias_antes_alerta=7,  # Padrão: 7 dias antes
-                        alertar_no_vencimento=True
-                    )
-                    seguir_documento(db, seguidor_data)
-                    # Atualizar informação
-                    seguimento_info = verificar_se_usuario_segue(db, node_id, user_id, tipo_usuario)
-                    node.usuario_atual_segue = seguimento_info
-                    # Recarregar seguidores
-                    seguidores = obter_seguidores_documento(db, node_id)
-                    node.seguidores = seguidores
-                    node.total_seguidores = len(seguidores)
-                except:
-                    pass  # Se falhar, continua sem seguir
         else:
             node.usuario_atual_segue = {"seguindo": False}
             node.usuario_e_dono = False
@@ -532,26 +590,63 @@ def list_storage_nodes(
     status: Optional[str] = None,
     file_type: Optional[str] = None,
     search_term: Optional[str] = None,
-    limit: Optional[int] = None,      # Opcional para paginação
-    offset: Optional[int] = None,     # Opcional para paginação
+    limit: Optional[int] = None,      # Opcional para paginação (tamanho da página)
+    offset: Optional[int] = None,     # Mantido por compatibilidade; use cursor
+    cursor: Optional[str] = None,     # Cursor devolvido em X-Next-Cursor pela página anterior
+    include_total: bool = False,      # Calcular total (COUNT extra) em X-Total-Count
+    stream: Optional[Literal['json', 'ndjson']] = None,  # Resposta em streaming (lista completa)
+    response: Response = None,
     db: Session = Depends(get_db)
 ):
     """
     Lista arquivos que o usuário pode ver
-    Paginação opcional via limit/offset.
+    
+    Paginação opcional por cursor (keyset), ordenada por (type desc, name asc, id):
+    - envie limit (e o cursor recebido na página anterior)
+    - o cursor da próxima página vem no header X-Next-Cursor (ausente na última página)
+    - com include_total=true o total vem no header X-Total-Count
+    Sem limit/cursor retorna a lista completa, como antes.
+    
+    Com stream=json|ndjson a lista completa é lida do banco em batches e escrita
+    incrementalmente (memória constante, independente do tamanho da pasta).
+    Nesse modo limit/cursor são ignorados.
     """
     if not user_id or not tipo_usuario:
         raise HTTPException(status_code=400, detail="user_id e tipo_usuario são obrigatórios")
     
-    # Buscar nodes filhos (passando limit/offset se implementado no CRUD)
     # ATENÇÃO: Mudança v3 - list_children agora lida com tudo (filhos, shared, filtros)
-    nodes = list_children(
-        db, parent_id, user_id, tipo_usuario, 
-        company_id=company_id,
-        status=status,
-        file_type=file_type,
-        search_term=search_term
-    )
+    filters = dict(status=status, file_type=file_type, search_term=search_term)
+    if stream:
+        # Acesso e filtros resolvidos agora; as linhas são lidas durante o envio
+        query = build_children_query(db, parent_id, user_id, tipo_usuario, company_id=company_id, **filters)
+        if query is None:
+            items = iter(())
+        elif parent_id is None:
+            items = _stream_root_nodes(db, query, user_id, tipo_usuario, search_term)
+        else:
+            items = _stream_node_dicts(query, user_id, tipo_usuario, search_term)
+        return streaming_json_response(items, stream)
+    
+    if limit or cursor:
+        page = list_children_page(
+            db, parent_id, user_id, tipo_usuario,
+            company_id=company_id,
+            limit=limit or 100,
+            cursor=cursor,
+            include_total=include_total,
+            **filters
+        )
+        nodes = page["items"]
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        if page["total"] is not None:
+            response.headers["X-Total-Count"] = str(page["total"])
+    else:
+        nodes = list_children(
+            db, parent_id, user_id, tipo_usuario, 
+            company_id=company_id,
+            **filters
+        )
 
     # Não precisamos mais chamar get_shared_nodes separadamente na raiz, 
     # pois list_children já faz o UNION se parent_id for None.
@@ -598,24 +693,8 @@ def list_storage_nodes(
         if shared_nodes_detected:
             shared_nodes_dict = [_convert_node_to_dict(sn) for sn in shared_nodes_detected]
             
-            shared_folder = {
-                "id": -1,
-                "name": "Compartilhados comigo",
-                "type": "folder",
-                "parent_id": None,
-                "business_id": None,
-                "type_user": None,
-                "size": None,
-                "extension": None,
-                "status": None,
-                "comments": None,
-                "url": None,
-                "created_at": None,
-                "updated_at": None,
-                "children": shared_nodes_dict
-            }
             # Adiciona a pasta virtual no início
-            nodes_result.insert(0, shared_folder)
+            nodes_result.insert(0, _shared_virtual_folder(shared_nodes_dict))
     else:
         # Se não for raiz, não separa, retorna tudo (dentro de pasta)
         nodes_result = list(nodes)
@@ -624,23 +703,14 @@ def list_storage_nodes(
     return [_convert_node_to_dict(node) if not isinstance(node, dict) else node for node in nodes_result]
 
 
-@router.put("/{node_id}", response_model=StorageResponse)
-async def update_storage_node(
-    node_id: int,
-    file: UploadFile | None = File(default=None),
-    name: str | None = Form(default=None),
-    parent_id: int | None = Form(default=None),
-    business_id: int | None = Form(default=None),
-    type_user: str | None = Form(default=None),
-    comments: str | None = Form(default=None),
-    status: str | None = Form(default=None),
-    data_validade: str | None = Form(default=None, description="Data de validade (formato: YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
-):
+def _authorize_node_update(db: Session, node_id: int, business_id: int | None, type_user: str | None):
+    """
+    Verifica se o autor (business_id do form) pode editar o node (403 se não puder).
+    Retorna (node, is_company_admin, is_creator).
+    """
     node = get_node(db, node_id)
     
     # --- VERIFICAÇÃO DE PERMISSÕES ---
-    from app.models.share import Share
     
     # Identificar quem está fazendo a requisição
     # Assumimos que o business_id enviado no form é o usuário atual
@@ -668,11 +738,7 @@ async def update_storage_node(
          allow_edit = True
     if actor_id is not None:
         # Verificar permissão explícita de edição via compartilhamento
-        share_perm = db.query(Share).filter(
-            Share.node_id == node_id,
-            Share.shared_with_user_id == actor_id,
-            Share.allow_editing == True
-        ).first()
+        share_perm = find_share_access(db, node, actor_id, require_editing=True)
         if share_perm:
             allow_edit = True
             
@@ -714,6 +780,28 @@ async def update_storage_node(
         raise HTTPException(status_code=403, detail="Sem permissão para editar este arquivo.")
     # ----------------------------------
 
+    return node, is_company_admin, is_creator
+
+
+@router.put("/{node_id}", response_model=StorageResponse)
+async def update_storage_node(
+    node_id: int,
+    file: UploadFile | None = File(default=None),
+    name: str | None = Form(default=None),
+    parent_id: int | None = Form(default=None),
+    business_id: int | None = Form(default=None),
+    type_user: str | None = Form(default=None),
+    comments: str | None = Form(default=None),
+    status: str | None = Form(default=None),
+    data_validade: str | None = Form(default=None, description="Data de validade (formato: YYYY-MM-DD)"),
+    db: Session = Depends(get_db)
+):
+    # Trabalho de banco (síncrono) roda no threadpool para não travar o event loop
+    node, is_company_admin, is_creator = await run_in_threadpool(
+        _authorize_node_update, db, node_id, business_id, type_user
+    )
+    actor_id = business_id
+
     update_data = {}
     if name is not None:
         update_data['name'] = name
@@ -746,11 +834,12 @@ async def update_storage_node(
     
     # Se for arquivo novo, faz upload e atualiza url, extension, size
     if file is not None and getattr(node, 'type', None) == 'file':
-        from app.services.storage.r2_service import store_image
         file.file.seek(0, os.SEEK_END)
         size_bytes = file.file.tell()
         file.file.seek(0)
-        upload_result = store_image(
+        # OTIMIZADO: transferência no executor de uploads (não bloqueia o event loop)
+        upload_result = await store_image_dedup(
+            db,
             file_obj=file.file,
             original_filename=file.filename,
             folder=None,
@@ -765,9 +854,14 @@ async def update_storage_node(
         update_data['url'] = f"{DEV_PUBLIC_URL}/{upload_result['key']}"
         update_data['extension'] = ext or None
         update_data['size'] = size_str
+        update_data['size_bytes'] = size_bytes
     from app.schemas.storage import StorageUpdate
     payload = StorageUpdate(**update_data)
-    return update_node(db, node_id, payload, user_id=actor_id, type_user=type_user)
+    blob = upload_result if 'url' in update_data else {}
+    return await run_in_threadpool(
+        update_node, db, node_id, payload, user_id=actor_id, type_user=type_user,
+        content_hash=blob.get("content_hash"), reused_blob=blob.get("deduplicated", False)
+    )
 
 
 @router.patch("/{node_id}/move", summary="Mover arquivo ou pasta")
@@ -790,7 +884,6 @@ def move_storage_node(
     - Não pode mover uma pasta para dentro de suas próprias subpastas (prevenção de ciclos)
     """
     from app.crud.storage import move_node, get_node
-    from app.models.share import Share
     
     if not user_id or not tipo_usuario:
         # Para compatibilidade, se não for enviado, vamos tentar sem validação (com risco)
@@ -820,11 +913,7 @@ def move_storage_node(
         allow_move = True
     else:
         # Verificar permissão de edição (que inclui mover)
-        share_perm = db.query(Share).filter(
-            Share.node_id == node_id,
-            Share.shared_with_user_id == user_id,
-            Share.allow_editing == True
-        ).first()
+        share_perm = find_share_access(db, node, user_id, require_editing=True)
         if share_perm:
             allow_move = True
             
@@ -892,7 +981,6 @@ def delete_storage_node(
     
     # --- VERIFICAÇÃO DE PERMISSÕES ---
     from app.crud.storage import get_node
-    from app.models.share import Share
     
     node = get_node(db, node_id)
     if not node:
@@ -915,11 +1003,7 @@ def delete_storage_node(
         allow_delete = True
     else:
         # Verificar permissão explícita de edição via compartilhamento
-        share_perm = db.query(Share).filter(
-            Share.node_id == node_id,
-            Share.shared_with_user_id == user_id,
-            Share.allow_editing == True
-        ).first()
+        share_perm = find_share_access(db, node, user_id, require_editing=True)
         
         if share_perm:
             allow_delete = True
@@ -953,8 +1037,8 @@ def delete_storage_node(
         raise HTTPException(status_code=403, detail="Sem permissão para deletar este arquivo.")
     # ----------------------------------
     
-    soft_delete_node(db, node_id, user_id, tipo_usuario)
-    return {"message": "Item movido para a lixeira"}
+    result = soft_delete_node(db, node_id, user_id, tipo_usuario)
+    return {"message": "Item movido para a lixeira", "total_itens": result["total_itens"]}
 
 
 @router.post("/upload/presigned", response_model=PresignedUploadResponse)
@@ -1001,6 +1085,179 @@ def complete_upload_endpoint(
     return create_node(db, payload)
 
 
+# ==========================================
+# UPLOAD MULTIPART (ARQUIVOS GRANDES)
+# ==========================================
+#
+# Fluxo do navegador (extensão do /upload/presigned):
+#   1. POST /upload/multipart/initiate      -> key, upload_id, part_size, part_count
+#   2. POST /upload/multipart/presign-parts -> URLs PUT por parte (enviadas em paralelo direto ao R2)
+#   3. GET  /upload/multipart/parts         -> partes já recebidas (retomar após falha/refresh)
+#   4. POST /upload/multipart/complete      -> monta o objeto no R2
+#   5. POST /upload/complete                -> cria o registro (igual ao fluxo presignado simples)
+#   (POST /upload/multipart/abort descarta as partes de um upload desistido)
+
+MAX_PRESIGN_PARTS_PER_REQUEST = 1000
+
+
+@router.post("/upload/multipart/initiate", response_model=MultipartInitiateResponse)
+def initiate_multipart_upload_endpoint(
+    payload: PresignedUploadRequest,
+    db: Session = Depends(get_db)
+):
+    from app.utils.cloudflare_r2 import create_multipart_upload, multipart_part_size, new_object_key
+
+    if payload.company_id and payload.company_type:
+        check_storage_limit(db, payload.company_id, payload.company_type, payload.size_bytes)
+
+    key = new_object_key(payload.filename)
+    upload_id = create_multipart_upload(key, payload.content_type)
+    if not upload_id:
+        raise HTTPException(status_code=500, detail="Erro ao iniciar upload multipart")
+
+    part_size = multipart_part_size(payload.size_bytes)
+    return {
+        "key": key,
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "part_count": max(1, -(-payload.size_bytes // part_size)),
+        "public_url": f"{DEV_PUBLIC_URL}/{key}",
+        "filename": payload.filename
+    }
+
+
+@router.post("/upload/multipart/presign-parts", response_model=MultipartPresignPartsResponse)
+def presign_multipart_parts_endpoint(payload: MultipartPresignPartsRequest):
+    from app.utils.cloudflare_r2 import MAX_PARTS, generate_presigned_part_urls
+
+    if not payload.part_numbers or len(payload.part_numbers) > MAX_PRESIGN_PARTS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {MAX_PRESIGN_PARTS_PER_REQUEST} partes por requisição")
+    if any(n < 1 or n > MAX_PARTS for n in payload.part_numbers):
+        raise HTTPException(status_code=400, detail=f"Número de parte deve estar entre 1 e {MAX_PARTS}")
+
+    urls = generate_presigned_part_urls(payload.key, payload.upload_id, sorted(set(payload.part_numbers)))
+    return {"parts": [{"part_number": n, "url": url} for n, url in urls.items()]}
+
+
+@router.get("/upload/multipart/parts", summary="Partes já enviadas (retomar upload multipart)")
+def list_multipart_parts_endpoint(
+    key: str = Query(...),
+    upload_id: str = Query(...)
+):
+    from app.utils.cloudflare_r2 import list_multipart_parts
+
+    parts = list_multipart_parts(key, upload_id)
+    if parts is None:
+        raise HTTPException(status_code=404, detail="Upload multipart não encontrado (concluído ou abortado)")
+    return {
+        "parts": [
+            {"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]}
+            for p in parts
+        ]
+    }
+
+
+@router.post("/upload/multipart/complete", summary="Concluir upload multipart no R2")
+def complete_multipart_upload_endpoint(payload: MultipartCompleteRequest):
+    from app.utils.cloudflare_r2 import complete_multipart_upload, list_multipart_parts
+
+    if payload.parts:
+        parts = [{"PartNumber": p.part_number, "ETag": p.etag} for p in payload.parts]
+    else:
+        # ETag nem sempre é legível no navegador (CORS): usar o que o R2 registrou
+        parts = list_multipart_parts(payload.key, payload.upload_id)
+        if parts is None:
+            raise HTTPException(status_code=404, detail="Upload multipart não encontrado (concluído ou abortado)")
+    if not parts:
+        raise HTTPException(status_code=400, detail="Nenhuma parte enviada")
+
+    result = complete_multipart_upload(payload.key, payload.upload_id, parts)
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Falha ao concluir upload multipart"))
+    return {"key": payload.key, "public_url": f"{DEV_PUBLIC_URL}/{payload.key}"}
+
+
+@router.post("/upload/multipart/abort", summary="Abortar upload multipart")
+def abort_multipart_upload_endpoint(payload: MultipartAbortRequest):
+    from app.utils.cloudflare_r2 import abort_multipart_upload
+
+    result = abort_multipart_upload(payload.key, payload.upload_id)
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Falha ao abortar upload multipart"))
+    return {"success": True, "key": payload.key}
+
+
+@router.post("/upload/stream", response_model=StorageResponse, summary="Upload em streaming (multipart paralelo para o R2)")
+async def upload_stream_storage_node(
+    request: Request,
+    filename: str = Query(..., description="Nome original do arquivo"),
+    name: Optional[str] = Query(None),
+    parent_id: Optional[int] = Query(None),
+    business_id: Optional[int] = Query(None, description="ID do usuário dono (quem faz upload)"),
+    type_user: Optional[str] = Query(None, description="Tipo do usuário dono"),
+    company_id: Optional[int] = Query(None, description="ID da empresa responsável"),
+    company_type: Optional[str] = Query(None, description="Tipo da empresa (pf/pj/freelancer)"),
+    comments: Optional[str] = Query(None),
+    status: Optional[str] = Query("Válido"),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload de arquivos grandes pelo servidor: o corpo da requisição é o conteúdo
+    bruto do arquivo (não multipart/form-data), com o Content-Type do arquivo.
+
+    OTIMIZADO: o corpo é repassado ao R2 em partes paralelas conforme chega,
+    sem gravar o arquivo inteiro em disco/memória (ao contrário de UploadFile).
+    """
+    if company_id and company_id != 0:
+        await run_in_threadpool(_check_company_upload_permission, db, company_id, company_type, business_id, type_user)
+
+    content_length = request.headers.get("content-length")
+    content_length = int(content_length) if content_length and content_length.isdigit() else None
+    if content_length == 0:
+        raise HTTPException(status_code=400, detail="Arquivo vazio")
+
+    # ✅ VALIDAR COTA DE ARMAZENAMENTO ANTES DO UPLOAD (quando o tamanho é conhecido)
+    if company_id and company_type and content_length:
+        await run_in_threadpool(check_storage_limit, db, company_id, company_type, content_length)
+
+    upload_result = await store_stream_multipart(
+        request.stream(),
+        original_filename=filename,
+        content_type=request.headers.get("content-type"),
+        total_size=content_length
+    )
+    if not upload_result.get("success"):
+        raise HTTPException(status_code=500, detail=upload_result.get("error", "Falha no upload"))
+    size_bytes = upload_result["size_bytes"]
+
+    # Sem Content-Length (chunked) a cota só pode ser validada depois do envio
+    if company_id and company_type and content_length is None:
+        try:
+            await run_in_threadpool(check_storage_limit, db, company_id, company_type, size_bytes)
+        except HTTPException:
+            from app.services.storage.r2_service import remove_image
+            await run_in_threadpool(remove_image, upload_result["key"])
+            raise
+
+    ext = os.path.splitext(filename)[1].lower()
+    payload = StorageCreate(
+        name=name or os.path.splitext(filename)[0],
+        type='file',
+        parent_id=parent_id,
+        business_id=business_id,
+        type_user=type_user,
+        company_id=company_id,
+        company_type=company_type,
+        size=_human_size(size_bytes),
+        size_bytes=size_bytes,
+        extension=ext or None,
+        status=status,
+        comments=comments,
+        url=f"{DEV_PUBLIC_URL}/{upload_result['key']}",
+    )
+    return await run_in_threadpool(create_node, db, payload, upload_result.get("content_hash"))
+
+
 @router.post("/upload", response_model=StorageResponse)
 async def upload_and_create_storage_node(
     file: UploadFile = File(...),
@@ -1023,13 +1280,14 @@ async def upload_and_create_storage_node(
     # ✅ VALIDAR COTA DE ARMAZENAMENTO ANTES DO UPLOAD
     if business_id and type_user and size_bytes:
         try:
-            check_storage_limit(db, business_id, type_user, size_bytes)
+            await run_in_threadpool(check_storage_limit, db, business_id, type_user, size_bytes)
         except HTTPException as e:
             # Re-lançar o erro de cota excedida
             raise e
 
-    # Upload para R2
-    upload_result = store_image(
+    # Upload para R2 (no executor de uploads, sem bloquear o event loop)
+    upload_result = await store_image_dedup(
+        db,
         file_obj=file.file,
         original_filename=file.filename,
         folder=None,
@@ -1050,12 +1308,219 @@ async def upload_and_create_storage_node(
         business_id=business_id,
         type_user=type_user,
         size=size_str,
+        size_bytes=size_bytes,
         extension=ext or None,
         status=status,
         comments=comments,
         url=upload_result["url"],
     )
-    return create_node(db, payload)
+    return await run_in_threadpool(
+        create_node, db, payload, upload_result.get("content_hash"), upload_result.get("deduplicated", False)
+    )
+
+# ==========================================
+# UPLOAD EM LOTE
+# ==========================================
+
+MAX_BATCH_FILES = 1000
+
+
+def _split_relative_path(relative_path: str) -> tuple:
+    """ "Contratos/2024/a.pdf" -> (["Contratos", "2024"], "a.pdf"); rejeita ".." """
+    parts = [p.strip() for p in relative_path.replace("\\", "/").split("/")]
+    parts = [p for p in parts if p and p != "."]
+    if not parts or ".." in parts:
+        raise HTTPException(status_code=400, detail=f"Caminho relativo inválido: {relative_path}")
+    return parts[:-1], parts[-1]
+
+
+@router.post("/batch", response_model=BatchUploadResponse, summary="Upload em lote (vários arquivos / pasta com subpastas)")
+async def batch_upload_storage_nodes(
+    files: List[UploadFile] = File(..., description="Arquivos"),
+    paths: Optional[List[str]] = Form(default=None, description="Caminho relativo de cada arquivo, na ordem de files (ex: Contratos/2024/a.pdf)"),
+    manifest: Optional[str] = Form(default=None, description='JSON na ordem de files: [{"path", "name", "status", "comments", "data_validade"}]'),
+    parent_id: str | None = Form(default=None),
+    business_id: int | None = Form(default=None, description="ID do usuário dono (quem faz upload)"),
+    type_user: str | None = Form(default=None, description="Tipo do usuário dono"),
+    company_id: int | None = Form(default=None, description="ID da empresa responsável"),
+    company_type: str | None = Form(default=None, description="Tipo da empresa (pf/pj/freelancer)"),
+    comments: str | None = Form(default=None),
+    status: str | None = Form(default="Válido"),
+    db: Session = Depends(get_db)
+):
+    """
+    Envia vários arquivos em uma requisição. Caminhos relativos com pastas
+    (webkitRelativePath ao soltar uma pasta) criam as pastas que faltarem
+    dentro de parent_id; pastas de mesmo nome já existentes são reaproveitadas.
+
+    OTIMIZADO: uma validação de cota para o total, uploads ao R2 em paralelo
+    (limitados pelo executor de uploads) e todos os registros (nodes, pastas,
+    compartilhamentos herdados e logs) criados em lote numa única transação.
+    """
+    import asyncio
+    import json
+    from datetime import datetime
+    from app.services.storage.r2_service import remove_image
+
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BATCH_FILES} arquivos por lote")
+
+    if manifest:
+        try:
+            items = json.loads(manifest)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="manifest deve ser um JSON válido")
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise HTTPException(status_code=400, detail="manifest deve ser uma lista de objetos")
+    elif paths:
+        items = [{"path": p} for p in paths]
+    else:
+        items = [{"path": f.filename} for f in files]
+    if len(items) != len(files):
+        raise HTTPException(status_code=400, detail="Informe um caminho/item do manifest para cada arquivo")
+
+    if company_id and company_id != 0:
+        await run_in_threadpool(_check_company_upload_permission, db, company_id, company_type, business_id, type_user)
+
+    entries = []
+    total_bytes = 0
+    for file, item in zip(files, items):
+        folders, filename = _split_relative_path(item.get("path") or file.filename or "")
+        file.file.seek(0, os.SEEK_END)
+        size_bytes = file.file.tell()
+        file.file.seek(0)
+        total_bytes += size_bytes
+
+        data_validade = item.get("data_validade")
+        if data_validade:
+            try:
+                data_validade = datetime.strptime(data_validade, "%Y-%m-%d").date()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Formato de data inválido. Use YYYY-MM-DD")
+
+        ext = os.path.splitext(filename)[1].lower()
+        entries.append({
+            "folders": folders,
+            "node": {
+                "name": item.get("name") or os.path.splitext(filename)[0],
+                "size": _human_size(size_bytes),
+                "size_bytes": size_bytes,
+                "extension": ext or None,
+                "status": item.get("status") or status,
+                "comments": item.get("comments") or comments,
+                "data_validade": data_validade or None,
+            },
+        })
+
+    # ✅ VALIDAR COTA UMA VEZ PARA O LOTE INTEIRO
+    if company_id and company_type and total_bytes:
+        await run_in_threadpool(check_storage_limit, db, company_id, company_type, total_bytes)
+
+    results = await store_images_dedup(db, [(f.file, f.filename, f.content_type) for f in files])
+    succeeded = [r for r in results if isinstance(r, dict) and r.get("success")]
+    # Objetos reaproveitados (deduplicação) pertencem a outros nodes: nunca descartar
+    uploaded_keys = [r["key"] for r in succeeded if not r.get("deduplicated")]
+
+    async def discard_uploads():
+        await asyncio.gather(*(run_in_threadpool(remove_image, key) for key in uploaded_keys), return_exceptions=True)
+
+    if len(succeeded) != len(files):
+        await discard_uploads()
+        failed = next(r for r in results if not (isinstance(r, dict) and r.get("success")))
+        error = failed.get("error") if isinstance(failed, dict) else str(failed)
+        raise HTTPException(status_code=500, detail=error or "Falha no upload")
+
+    for entry, result in zip(entries, results):
+        entry["node"]["url"] = f"{DEV_PUBLIC_URL}/{result['key']}"
+        if result.get("content_hash"):
+            entry["node"]["content_hash"] = result["content_hash"]
+            entry["reused_blob"] = result.get("deduplicated", False)
+
+    try:
+        created = await run_in_threadpool(
+            create_nodes_batch, db, entries, _parse_parent(parent_id),
+            business_id, type_user, company_id, company_type
+        )
+    except Exception:
+        db.rollback()
+        await discard_uploads()
+        raise
+
+    return {
+        "total_arquivos": len(created["files"]),
+        "total_pastas_criadas": len(created["folders"]),
+        "files": created["files"],
+        "folders": created["folders"],
+    }
+
+
+@router.post("/upload/presigned/batch", response_model=BatchPresignedUploadResponse)
+def get_presigned_upload_urls_batch_endpoint(
+    payload: BatchPresignedUploadRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    URLs presignadas (PUT) para vários arquivos de uma vez.
+
+    OTIMIZADO: uma validação de cota para o tamanho total e assinatura local
+    (PresignSigner) de todas as URLs, sem uma requisição por arquivo.
+    """
+    from app.utils.cloudflare_r2 import new_object_key
+    from app.services.storage.r2_service import get_presigned_upload_url
+
+    if not payload.files or len(payload.files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {MAX_BATCH_FILES} arquivos por lote")
+
+    total_bytes = sum(f.size_bytes for f in payload.files)
+    if payload.company_id and payload.company_type:
+        check_storage_limit(db, payload.company_id, payload.company_type, total_bytes)
+
+    uploads = []
+    for f in payload.files:
+        key = new_object_key(f.filename)
+        uploads.append({
+            "upload_url": get_presigned_upload_url(key, f.content_type),
+            "key": key,
+            "public_url": f"{DEV_PUBLIC_URL}/{key}",
+            "filename": f.filename
+        })
+    return {"total_bytes": total_bytes, "uploads": uploads}
+
+
+@router.post("/upload/complete/batch", response_model=BatchUploadResponse)
+def complete_upload_batch_endpoint(
+    payload: BatchCompleteUploadRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Registra de uma vez vários arquivos já enviados ao R2 pelas URLs presignadas
+    (equivalente em lote do /upload/complete). Caminhos relativos em path criam as pastas.
+    """
+    if not payload.items or len(payload.items) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Informe de 1 a {MAX_BATCH_FILES} arquivos por lote")
+
+    if payload.company_id and payload.company_id != 0:
+        _check_company_upload_permission(db, payload.company_id, payload.company_type, payload.business_id, payload.type_user)
+
+    entries = []
+    for item in payload.items:
+        folders = _split_relative_path(item.path)[0] if item.path else []
+        node = item.dict(exclude={"path"})
+        if node.get("size") is None and node.get("size_bytes") is not None:
+            node["size"] = _human_size(node["size_bytes"])
+        entries.append({"folders": folders, "node": node})
+
+    created = create_nodes_batch(
+        db, entries, payload.parent_id,
+        payload.business_id, payload.type_user, payload.company_id, payload.company_type
+    )
+    return {
+        "total_arquivos": len(created["files"]),
+        "total_pastas_criadas": len(created["folders"]),
+        "files": created["files"],
+        "folders": created["folders"],
+    }
+
 
 @router.get("/documents/by-business-status", response_model=List[StorageResponse])
 def get_documents_by_business_status(
@@ -1128,6 +1593,7 @@ def get_documents_with_permissions_info(
     user_email: str,
     status: str,
     business_email: Optional[str] = None,
+    stream: Optional[Literal['json', 'ndjson']] = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -1137,17 +1603,42 @@ def get_documents_with_permissions_info(
         user_email: Email do usuário
         status: Status dos documentos
         business_email: Email da empresa específica (opcional)
+        stream: json|ndjson para escrever os documentos incrementalmente
+                (total_documents vai no final do JSON)
     
     Returns:
         Documentos com informações de permissões
     """
-    from app.crud.storage import get_documents_by_business_and_status, get_user_accessible_documents_by_status
+    from app.crud.storage import (
+        get_documents_by_business_and_status, get_user_accessible_documents_by_status,
+        documents_by_business_and_status_query, user_accessible_documents_query
+    )
     from app.crud.permission import get_user_permissions_by_email
     from app.crud.user_business_link import get_user_info_by_email
     
     # Busca permissões do usuário
     user_permissions = get_user_permissions_by_email(db, user_email)
     
+    if stream:
+        if business_email:
+            query = documents_by_business_and_status_query(db, user_email, business_email, status)
+        else:
+            query = user_accessible_documents_query(db, user_email, status)
+        
+        try:
+            user_info = get_user_info_by_email(db, user_email)
+            items = _stream_node_dicts(query, user_info['user_id'], user_info['type_user'], ordered=True)
+        except:
+            items = _stream_node_dicts(query, ordered=True)
+        
+        envelope = {
+            "user_email": user_email,
+            "business_email": business_email,
+            "status_filter": status,
+            "user_permissions": user_permissions["permissions"]
+        }
+        return streaming_json_response(items, stream, envelope, items_key="documents", count_key="total_documents")
+    
     if business_email:
         # Busca documentos de empresa específica
         documents = get_documents_by_business_and_status(db, user_email, business_email, status)
@@ -1180,6 +1671,7 @@ def get_documents_with_permissions_info(
 def list_files_for_collaborator(
     collaborator_id: int,
     parent_id: Optional[int] = None,
+    stream: Optional[Literal['json', 'ndjson']] = None,
     db: Session = Depends(get_db)
 ):
     """
@@ -1194,10 +1686,13 @@ def list_files_for_collaborator(
     - Lista de arquivos/pastas
     - Informações do colaborador
     - Permissões aplicadas
+    
+    Com stream=json|ndjson os itens são lidos em batches e escritos
+    incrementalmente (total_items vai no final do JSON).
     """
     from app.crud.collaborator import get_collaborator, get_collaborator_permissions
     from app.crud.storage import list_children
-    from app.crud.share import get_shared_nodes
+    from app.crud.share import get_shared_nodes, shared_nodes_query
     
     # Buscar colaborador
     collaborator = get_collaborator(db, collaborator_id)
@@ -1211,23 +1706,39 @@ def list_files_for_collaborator(
     permissions = get_collaborator_permissions(collaborator)
     
     # Determinar o que o colaborador pode ver
+    # (no modo stream monta apenas a query; as linhas são lidas durante o envio)
+    query = None
     if permissions.get("manage_files") or permissions.get("view_only"):
         # Vê TODOS os arquivos da empresa
-        nodes = list_children(
-            db, 
-            parent_id, 
-            collaborator.company_id,  # Usar company_id como user_id
-            collaborator.company_type,
-            collaborator.company_id
-        )
+        if stream:
+            query = build_children_query(
+                db,
+                parent_id,
+                collaborator.company_id,  # Usar company_id como user_id
+                collaborator.company_type,
+                collaborator.company_id
+            )
+        else:
+            nodes = list_children(
+                db, 
+                parent_id, 
+                collaborator.company_id,  # Usar company_id como user_id
+                collaborator.company_type,
+                collaborator.company_id
+            )
         access_type = "todos_arquivos_empresa"
         
     elif permissions.get("view_shared"):
         # Vê APENAS compartilhados
         if parent_id is None:
             # Na raiz, mostrar apenas pasta de compartilhados
-            shared_nodes = get_shared_nodes(db, collaborator_id, "colaborador")
-            nodes = shared_nodes
+            if stream:
+                query = shared_nodes_query(db, collaborator_id, "colaborador").order_by(
+                    StorageNode.parent_id, StorageNode.name
+                )
+            else:
+                shared_nodes = get_shared_nodes(db, collaborator_id, "colaborador")
+                nodes = shared_nodes
             access_type = "apenas_compartilhados"
         else:
             # Dentro de uma pasta, verificar se tem acesso
@@ -1240,10 +1751,7 @@ def list_files_for_collaborator(
             detail="Colaborador não tem permissão para ver arquivos"
         )
     
-    # Converter nodes para dicts
-    nodes_dict = [_convert_node_to_dict(node) if not isinstance(node, dict) else node for node in nodes]
-    
-    return {
+    envelope = {
         "collaborator": {
             "id": collaborator.id,
             "name": collaborator.name,
@@ -1253,12 +1761,142 @@ def list_files_for_collaborator(
         },
         "permissions": permissions,
         "access_type": access_type,
-        "parent_id": parent_id,
+        "parent_id": parent_id
+    }
+    
+    if stream:
+        # Compartilhados da raiz vêm com ordenação própria; os demais, na ordem da listagem
+        items = _stream_node_dicts(query, ordered=access_type == "apenas_compartilhados") if query is not None else iter(())
+        return streaming_json_response(items, stream, envelope, items_key="items", count_key="total_items")
+    
+    # Converter nodes para dicts
+    nodes_dict = [_convert_node_to_dict(node) if not isinstance(node, dict) else node for node in nodes]
+    
+    return {
+        **envelope,
         "total_items": len(nodes_dict),
         "items": nodes_dict
     }
 
 
+# ==========================================
+# DOWNLOAD DE PASTA (ZIP)
+# ==========================================
+
+def _zip_safe_name(name: Optional[str], fallback: str) -> str:
+    name = (name or "").replace("/", "_").replace("\\", "_").strip()
+    return name or fallback
+
+
+def _zip_entries(db: Session, root: StorageNode) -> tuple:
+    """
+    Entradas do ZIP para a subárvore ativa do node: pastas (inclusive vazias) e
+    arquivos com o caminho relativo a partir do próprio node; nomes repetidos
+    na mesma pasta ganham sufixo " (2)", " (3)"...
+    Arquivos sem objeto no R2 (url vazia ou inválida) ficam fora do ZIP e são
+    listados em ERROS_DOWNLOAD.txt.
+
+    Returns:
+        (entries, erros, total_arquivos, total_bytes)
+    """
+    from app.utils.cloudflare_r2 import key_from_url
+    from app.utils.zip_stream import ZipEntry
+
+    rows = db.query(
+        StorageNode.id, StorageNode.parent_id, StorageNode.name, StorageNode.type,
+        StorageNode.extension, StorageNode.url, StorageNode.size_bytes,
+        StorageNode.updated_at, StorageNode.path
+    ).filter(
+        descendants_filter(root, include_self=True),
+        StorageNode.deleted_at.is_(None)
+    ).all()
+    # Pais antes dos filhos (profundidade do path), ordem estável por nome
+    rows.sort(key=lambda r: ((r.path or "").count("/"), r.name or "", r.id))
+
+    folder_arcs = {}
+    used_names = {}
+    entries = []
+    errors = []
+    total_files = 0
+    total_bytes = 0
+    for row in rows:
+        parent_arc = folder_arcs.get(row.parent_id, "") if row.id != root.id else ""
+        is_folder = row.type == NodeType.folder
+        name = _zip_safe_name(row.name, f"sem_nome_{row.id}")
+        if not is_folder and row.extension and not name.lower().endswith(row.extension.lower()):
+            name += row.extension
+
+        taken = used_names.setdefault(parent_arc, set())
+        base, ext = (name, "") if is_folder else os.path.splitext(name)
+        counter = 2
+        while name.lower() in taken:
+            name = f"{base} ({counter}){ext}"
+            counter += 1
+        taken.add(name.lower())
+
+        if is_folder:
+            folder_arcs[row.id] = f"{parent_arc}{name}/"
+            entries.append(ZipEntry(folder_arcs[row.id], row.updated_at))
+        else:
+            key = key_from_url(row.url)
+            if key is None:
+                # Sem source o ZipEntry seria gravado como pasta
+                errors.append(f"{parent_arc}{name}: arquivo sem objeto no armazenamento")
+                continue
+            entries.append(ZipEntry(f"{parent_arc}{name}", row.updated_at, key))
+            total_files += 1
+            total_bytes += row.size_bytes or 0
+    return entries, errors, total_files, total_bytes
+
+
+@router.get("/{node_id}/download.zip", summary="Baixar pasta (ou arquivo) como ZIP")
+def download_node_zip(
+    node_id: int,
+    user_id: int = Query(..., description="ID do usuário que está baixando"),
+    tipo_usuario: str = Query(..., description="Tipo do usuário"),
+    db: Session = Depends(get_db)
+):
+    """
+    Baixa a subárvore do node como um ZIP gerado sob demanda.
+
+    OTIMIZADO: o ZIP (ZIP64) é montado enquanto é enviado, lendo cada objeto do
+    R2 em pedaços e abrindo os próximos arquivos em paralelo (janela limitada);
+    nenhum arquivo é guardado inteiro em memória ou disco.
+    """
+    from urllib.parse import quote
+    from fastapi.responses import StreamingResponse
+    from app.utils.cloudflare_r2 import open_object
+    from app.utils.zip_stream import zip_stream
+
+    node = get_node(db, node_id)
+    if node.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="Node não encontrado")
+    if not user_can_view_node(db, node, user_id, tipo_usuario):
+        raise HTTPException(status_code=403, detail="Sem permissão para baixar este item")
+
+    entries, errors, total_files, total_bytes = _zip_entries(db, node)
+
+    # LOG: um registro por ZIP (não por arquivo)
+    try:
+        criar_log_documento(
+            db=db,
+            node_id=node.id,
+            action=DocumentAction.DOWNLOADED,
+            user_id=user_id,
+            user_type=tipo_usuario,
+            details={"formato": "zip", "arquivos": total_files, "bytes": total_bytes}
+        )
+    except Exception as e:
+        print(f"Erro ao criar log de download: {e}")
+
+    filename = f"{_zip_safe_name(node.name, f'download_{node.id}')}.zip"
+    return StreamingResponse(
+        zip_stream(entries, open_object, errors=errors),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+    )
+
+
 @router.get("/{node_id}/compartilhamentos", summary="Listar com quem o documento está compartilhado")
 def listar_compartilhamentos_documento(
     node_id: int,
@@ -1381,6 +2019,7 @@ def obter_rastreabilidade(
 def obter_historico(
     node_id: int,
     limit: int = 100,
+    incluir_arquivado: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -1389,6 +2028,7 @@ def obter_historico(
     **Parâmetros:**
     - `node_id`: ID do documento/pasta
     - `limit`: Limite de registros (padrão 100, máximo 500)
+    - `incluir_arquivado`: Incluir logs de meses já arquivados no R2 (mais lento: baixa os arquivos do documento)
     
     **Exemplo de response:**
     ```json
@@ -1443,7 +2083,7 @@ def obter_historico(
         raise HTTPException(status_code=404, detail="Documento não encontrado")
     
     # Obter histórico completo formatado
-    historico = obter_historico_completo_formatado(db, node_id, limit)
+    historico = obter_historico_completo_formatado(db, node_id, limit, incluir_arquivado)
     
     return {
         "node_id": node_id,
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.core.conn import get_db
 from app.crud.storage_quota import (
@@ -154,3 +155,102 @@ def check_upload_limit(
         "file_size_bytes": file_size_bytes,
         "can_upload": True
     }
+
+
+@router.post("/reconcile")
+def reconcile_storage_usage(
+    business_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Reconstrói os contadores de uso (company_storage_usage) a partir de storage_nodes
+    
+    **Deve ser chamado periodicamente via cron job** (ex: diariamente) para corrigir
+    qualquer divergência dos contadores mantidos a cada upload/delete/restore.
+    
+    Parâmetros:
+    - **business_id**: Reconstruir apenas esta empresa (padrão: todas)
+    
+    Exemplo:
+    ```
+    POST /api/v1/storage-quota/reconcile?business_id=10
+    ```
+    """
+    from app.crud.storage_usage import reconcile_company_usage
+    
+    return {
+        "message": "Contadores de armazenamento reconstruídos",
+        **reconcile_company_usage(db, business_id)
+    }
+
+
+@router.post("/gc")
+def collect_orphan_objects(
+    dry_run: bool = True,
+    prefix: str = "",
+    max_deletes: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Coleta de lixo do R2: apaga objetos que nenhum node, blob, versão (dentro da
+    retenção) ou foto referencia mais
+    
+    **Deve ser chamado periodicamente via cron job** (ex: semanalmente), primeiro
+    com dry_run=true para conferir o relatório.
+    
+    Parâmetros:
+    - **dry_run**: Apenas relatar o que seria apagado (padrão: true)
+    - **prefix**: Restringir a coleta a um prefixo do bucket
+    - **max_deletes**: Limite de objetos apagados nesta execução
+    
+    Objetos mais novos que R2_GC_MIN_AGE_HOURS e os prefixos em
+    R2_GC_PROTECTED_PREFIXES nunca são apagados.
+    
+    Exemplo:
+    ```
+    POST /api/v1/storage-quota/gc?dry_run=false&max_deletes=10000
+    ```
+    """
+    from app.services.storage.r2_gc import run_gc
+    
+    try:
+        report = run_gc(db, dry_run=dry_run, prefix=prefix, max_deletes=max_deletes)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": "Coleta de objetos órfãos concluída", **report}
+
+
+@router.post("/logs/arquivar")
+def archive_document_logs(
+    dry_run: bool = True,
+    retention_months: Optional[int] = None,
+    max_months: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Arquiva no R2 (JSONL + gzip) os meses de document_logs fora da retenção e
+    os remove do banco (DROP PARTITION no MySQL particionado)
+    
+    **Deve ser chamado periodicamente via cron job** (ex: todo dia 1º). Também cria
+    as partições mensais dos próximos DOCUMENT_LOGS_PARTITIONS_AHEAD meses.
+    
+    Parâmetros:
+    - **dry_run**: Apenas contar os logs que seriam arquivados (padrão: true)
+    - **retention_months**: Meses mantidos no banco além do atual (padrão: DOCUMENT_LOGS_RETENTION_MONTHS)
+    - **max_months**: Limite de meses arquivados nesta execução
+    
+    O histórico arquivado continua disponível em
+    GET /nodes/{node_id}/historico?incluir_arquivado=true
+    
+    Exemplo:
+    ```
+    POST /api/v1/storage-quota/logs/arquivar?dry_run=false
+    ```
+    """
+    from app.services.document_log_archive import run_archive
+    
+    try:
+        report = run_archive(db, retention_months=retention_months, max_months=max_months, dry_run=dry_run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"message": "Arquivamento de logs concluído", **report}
@@ -11,6 +11,67 @@ class Settings(BaseSettings):
     r2_access_key: str
     r2_secret_key: str
 
+    # Cliente R2/S3 compartilhado pelo processo (pool HTTP reaproveitado entre requisições)
+    r2_max_pool_connections: int = 50
+    r2_connect_timeout: float = 5.0
+    r2_read_timeout: float = 60.0
+    r2_max_attempts: int = 3
+    r2_tcp_keepalive: bool = True
+    # Uploads simultâneos para o R2 por processo (demais aguardam na fila do executor)
+    r2_upload_max_workers: int = 8
+    # Multipart: arquivos a partir do limite são enviados em partes paralelas
+    r2_multipart_threshold_mb: int = 64
+    r2_multipart_part_size_mb: int = 16
+    r2_multipart_concurrency: int = 4
+
+    # Deduplicação por conteúdo (SHA-256): arquivos idênticos compartilham um objeto no R2
+    storage_dedup_enabled: bool = False
+
+    # Coleta de objetos órfãos no R2 (POST /storage-quota/gc)
+    # Objetos mais novos que o limite nunca são apagados (uploads em andamento / ainda não registrados)
+    r2_gc_min_age_hours: int = 24
+    # Versões substituídas (logs version_uploaded) ficam protegidas por N dias; None = para sempre
+    r2_gc_version_retention_days: int | None = None
+    # Prefixos de keys que a coleta nunca toca (JSON na variável de ambiente)
+    r2_gc_protected_prefixes: list[str] = []
+    # Vazão máxima de objetos apagados por segundo
+    r2_gc_deletes_per_second: float = 500.0
+
+    # Fila de e-mails (email_outbox): endpoints só enfileiram, o worker envia
+    email_api_url: str = "https://Salexpress-email.vercel.app/email"
+    email_connect_timeout: float = 5.0
+    email_read_timeout: float = 30.0
+    email_outbox_worker_enabled: bool = True   # Worker em thread no processo da API
+    email_outbox_concurrency: int = 8          # Envios simultâneos (pool HTTP do mesmo tamanho)
+    email_outbox_batch_size: int = 100         # Mensagens reservadas por rodada
+    email_outbox_max_recipients: int = 50      # Destinatários por envio ao agrupar mensagens idênticas
+    email_outbox_max_attempts: int = 6
+    email_outbox_backoff_seconds: int = 30     # 30s, 60s, 120s, ... entre tentativas
+    email_outbox_poll_seconds: float = 5.0
+    notificacao_resumo_dia_semana: int = 0     # Dia do resumo semanal de vencimentos (0 = segunda)
+
+    # Log de auditoria (document_logs) com escrita em lote
+    audit_log_buffer_enabled: bool = True
+    audit_log_batch_size: int = 200            # Linhas por INSERT / flush ao atingir
+    audit_log_flush_seconds: float = 2.0       # Flush periódico
+    audit_log_max_pending: int = 10000         # Tamanho máximo do buffer
+    audit_log_overflow: str = "flush"          # Buffer cheio: "flush" (produtor grava) ou "drop" (descarta)
+
+    # Arquivamento de document_logs (POST /storage-quota/logs/arquivar)
+    document_logs_retention_months: int = 12          # Meses mantidos no banco; os anteriores vão para o R2
+    document_logs_partitions_ahead: int = 3           # Partições mensais criadas à frente (MySQL)
+    document_logs_archive_prefix: str = "arquivo/document_logs/"
+
+    # Cache de nome/email de usuários (logs, compartilhamentos, seguidores)
+    user_identity_cache_size: int = 5000
+    user_identity_cache_ttl_seconds: float = 300.0
+
+    # Compartilhamento de pasta cobre a subárvore pela ancestralidade (sem copiar Share por filho).
+    # Só controla a escrita: a leitura sempre resolve pela ancestralidade, então desligar não
+    # revoga o acesso às subárvores cujas cópias a migration c7d2e8f4a1b6 removeu (mão única;
+    # para voltar às cópias em todo o banco, rodar o downgrade dela)
+    implicit_share_inheritance: bool = True
+
     class Config:
         env_file = ".env"  # Carrega variáveis de ambiente do arquivo .env
 
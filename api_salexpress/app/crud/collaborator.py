@@ -7,6 +7,7 @@ from app.models.share import Share
 from sqlalchemy import or_
 from app.schemas.collaborator import CollaboratorCreate, CollaboratorUpdate, CollaboratorPermissions
 from app.utils.security import hash_password, verify_password
+from app.services.user_identity import invalidate_user
 from typing import Optional
 
 def create_collaborator(db: Session, data: CollaboratorCreate) -> CompanyCollaborator:
@@ -95,6 +96,7 @@ def update_collaborator(
     
     db.commit()
     db.refresh(collaborator)
+    invalidate_user(collaborator.id, "collaborator")
     
     return collaborator
 
@@ -126,6 +128,7 @@ def delete_collaborator(db: Session, collaborator_id: int) -> dict:
     # 3. Deletar o Colaborador
     db.delete(collaborator)
     db.commit()
+    invalidate_user(collaborator_id, "collaborator")
     
     return {"message": "Colaborador e seus arquivos excluídos permanentemente"}
 
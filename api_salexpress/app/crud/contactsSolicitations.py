@@ -131,9 +131,10 @@ def enviar_email_notificacao_contato(destinatario_email: str, nome_solicitante:
         set_email(
             destinatarios=[destinatario_email],
             assunto="Nova Solicitação de Contato - Salexpress",
-            mensagem=html
+            mensagem=html,
+            origem="solicitacao_contato"
         )
-        logger.info(f"Email de notificação enviado para {destinatario_email}")
+        logger.info(f"Email de notificação enfileirado para {destinatario_email}")
         return True
     except Exception as e:
         logger.error(f"Erro ao enviar email de notificação: {e}")
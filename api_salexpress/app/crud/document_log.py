@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 from app.models.document_log import DocumentLog, DocumentAction
+from app.services.audit_log import audit_sink, flush_audit_log
 
 
 def criar_log_documento(
@@ -14,11 +15,17 @@ def criar_log_documento(
     user_email: Optional[str] = None,
     details: Optional[Dict[str, Any]] = None,
     ip_address: Optional[str] = None,
-    user_agent: Optional[str] = None
-) -> DocumentLog:
+    user_agent: Optional[str] = None,
+    na_transacao: bool = False
+) -> Optional[DocumentLog]:
     """
     Cria um registro de log para uma ação em documento/pasta.
     
+    OTIMIZADO: sem commit próprio. Com na_transacao=True o log entra na transação
+    do chamador (gravado no commit dele); senão vai para o buffer de auditoria
+    (app/services/audit_log.py), gravado em lote por uma thread. Sem o buffer
+    ativo (scripts, worker desligado) o log é gravado na hora, como antes.
+    
     Args:
         db: Sessão do banco
         node_id: ID do documento/pasta
@@ -30,25 +37,33 @@ def criar_log_documento(
         details: Detalhes adicionais da ação em JSON
         ip_address: IP do usuário
         user_agent: User agent do navegador
+        na_transacao: Gravar junto com o commit do chamador
     
     Returns:
-        DocumentLog criado
+        DocumentLog criado (None quando enviado ao buffer)
     """
-    log = DocumentLog(
-        node_id=node_id,
-        action=action,
-        user_id=user_id,
-        user_type=user_type,
-        user_name=user_name,
-        user_email=user_email,
-        details=details or {},
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
+    row = {
+        "node_id": node_id,
+        "action": action,
+        "user_id": user_id,
+        "user_type": user_type,
+        "user_name": user_name,
+        "user_email": user_email,
+        "details": details or {},
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": datetime.now()  # Hora do evento, não a do flush
+    }
     
+    sink = audit_sink()
+    if not na_transacao and sink is not None:
+        sink.emit(row)
+        return None
+    
+    log = DocumentLog(**row)
     db.add(log)
-    db.commit()
-    db.refresh(log)
+    if not na_transacao:
+        db.commit()
     
     return log
 
@@ -57,7 +72,8 @@ def obter_historico_documento(
     db: Session,
     node_id: int,
     limit: Optional[int] = 100,
-    action_filter: Optional[str] = None
+    action_filter: Optional[str] = None,
+    incluir_arquivado: bool = False
 ) -> List[DocumentLog]:
     """
     Obtém o histórico completo de ações de um documento/pasta.
@@ -67,16 +83,31 @@ def obter_historico_documento(
         node_id: ID do documento/pasta
         limit: Limite de registros (padrão 100)
         action_filter: Filtrar por tipo de ação específica
+        incluir_arquivado: Completar com os logs já arquivados no R2 (meses fora
+                           da retenção, ver app/services/document_log_archive.py)
     
     Returns:
         Lista de logs ordenados por data (mais recente primeiro)
     """
+    flush_audit_log()  # Eventos ainda no buffer deste processo entram no histórico
+    
     query = db.query(DocumentLog).filter(DocumentLog.node_id == node_id)
     
     if action_filter:
         query = query.filter(DocumentLog.action == action_filter)
     
-    return query.order_by(DocumentLog.created_at.desc()).limit(limit).all()
+    logs = query.order_by(DocumentLog.created_at.desc()).limit(limit).all()
+    
+    # Arquivados são sempre mais antigos que os do banco: só buscar se faltar registro
+    if incluir_arquivado and (limit is None or len(logs) < limit):
+        from app.services.document_log_archive import archived_history
+        
+        ids = {log.id for log in logs}
+        arquivados = archived_history(db, node_id, limit, action_filter)
+        logs += [log for log in arquivados if log.id not in ids]
+        logs = logs if limit is None else logs[:limit]
+    
+    return logs
 
 
 def obter_logs_usuario(
@@ -97,19 +128,81 @@ def obter_logs_usuario(
     Returns:
         Lista de logs do usuário
     """
+    flush_audit_log()
+    
     return db.query(DocumentLog).filter(
         DocumentLog.user_id == user_id,
         DocumentLog.user_type == user_type
     ).order_by(DocumentLog.created_at.desc()).limit(limit).all()
 
 
+def obter_ultimas_acoes_e_totais(
+    db: Session,
+    node_id: int,
+    actions: List[str],
+    incluir_arquivado: bool = True
+) -> Dict[str, Tuple[Optional[DocumentLog], int]]:
+    """
+    Obtém a última ocorrência e o total de cada tipo de ação em uma única query.
+    
+    OTIMIZADO: uma query com funções de janela sobre (node_id, action) (índice
+    idx_node_action) ao invés de uma query por ação + um COUNT por ação:
+    ROW_NUMBER() escolhe o log mais recente de cada ação e COUNT(*) OVER dá o total.
+    Os meses já arquivados entram pelo resumo gravado no arquivamento (mais uma
+    query, sem baixar arquivos; ver archived_summary).
+    
+    Args:
+        db: Sessão do banco
+        node_id: ID do documento/pasta
+        actions: Lista de ações para buscar (ex: ['created', 'moved', 'edited'])
+        incluir_arquivado: Somar os meses arquivados no R2
+    
+    Returns:
+        {action: (último DocumentLog ou None, total)}
+    """
+    from sqlalchemy import func
+    from sqlalchemy.orm import aliased
+    
+    flush_audit_log()
+    resultado = {action: (None, 0) for action in actions}
+    if not actions:
+        return resultado
+    
+    ranked = db.query(
+        DocumentLog,
+        func.row_number().over(
+            partition_by=DocumentLog.action,
+            order_by=(DocumentLog.created_at.desc(), DocumentLog.id.desc())
+        ).label("posicao"),
+        func.count().over(partition_by=DocumentLog.action).label("total")
+    ).filter(
+        DocumentLog.node_id == node_id,
+        DocumentLog.action.in_(actions)
+    ).subquery()
+    
+    ultimo_log = aliased(DocumentLog, ranked)
+    for log, total in db.query(ultimo_log, ranked.c.total).filter(ranked.c.posicao == 1):
+        resultado[log.action] = (log, total)
+    
+    if incluir_arquivado:
+        from app.services.document_log_archive import archived_summary
+        
+        # Arquivados são sempre mais antigos que os do banco: o último só vale sem log no banco
+        for action, (arquivado, total_arquivado) in archived_summary(db, node_id, actions).items():
+            log, total = resultado[action]
+            resultado[action] = (log or arquivado, total + total_arquivado)
+    
+    return resultado
+
+
 def obter_ultimas_acoes(
     db: Session,
     node_id: int,
     actions: List[str]
 ) -> Dict[str, Optional[DocumentLog]]:
     """
-    Obtém a última ocorrência de cada tipo de ação específica.
+    Obtém a última ocorrência de cada tipo de ação específica (uma única query,
+    ver obter_ultimas_acoes_e_totais).
     
     Args:
         db: Sessão do banco
@@ -120,17 +213,10 @@ def obter_ultimas_acoes(
         Dicionário com a última ocorrência de cada ação
         Ex: {'created': DocumentLog, 'moved': DocumentLog, 'edited': None}
     """
-    resultado = {}
-    
-    for action in actions:
-        log = db.query(DocumentLog).filter(
-            DocumentLog.node_id == node_id,
-            DocumentLog.action == action
-        ).order_by(DocumentLog.created_at.desc()).first()
-        
-        resultado[action] = log
-    
-    return resultado
+    return {
+        action: log
+        for action, (log, _) in obter_ultimas_acoes_e_totais(db, node_id, actions).items()
+    }
 
 
 def obter_resumo_rastreabilidade(
@@ -157,16 +243,10 @@ def obter_resumo_rastreabilidade(
         DocumentAction.SHARED
     ]
     
-    ultimas_acoes = obter_ultimas_acoes(db, node_id, acoes_importantes)
-    
-    # Contar total de cada tipo de ação
-    contagem_acoes = {}
-    for action in acoes_importantes:
-        count = db.query(DocumentLog).filter(
-            DocumentLog.node_id == node_id,
-            DocumentLog.action == action
-        ).count()
-        contagem_acoes[action] = count
+    # Última ocorrência e total de cada ação: uma única query
+    acoes = obter_ultimas_acoes_e_totais(db, node_id, acoes_importantes)
+    ultimas_acoes = {action: log for action, (log, _) in acoes.items()}
+    contagem_acoes = {action: total for action, (_, total) in acoes.items()}
     
     # Montar resumo
     resumo = {
@@ -249,7 +329,8 @@ def obter_resumo_rastreabilidade(
 def obter_historico_completo_formatado(
     db: Session,
     node_id: int,
-    limit: int = 100
+    limit: int = 100,
+    incluir_arquivado: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Obtém o histórico completo formatado para exibição no frontend.
@@ -258,11 +339,12 @@ def obter_historico_completo_formatado(
         db: Sessão do banco
         node_id: ID do documento/pasta
         limit: Limite de registros
+        incluir_arquivado: Incluir logs arquivados no R2
     
     Returns:
         Lista de logs formatados
     """
-    logs = obter_historico_documento(db, node_id, limit)
+    logs = obter_historico_documento(db, node_id, limit, incluir_arquivado=incluir_arquivado)
     
     # Mapear ações para mensagens legíveis em português
     acoes_pt = {
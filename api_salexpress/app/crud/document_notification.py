@@ -1,18 +1,29 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from fastapi import HTTPException
-from app.models.document_notification import DocumentFollower, DocumentNotification
-from app.models.storage import StorageNode
+from app.models.document_notification import DocumentFollower, DocumentNotification, NotificationPreference
+from app.models.storage import StorageNode, NodeType
 from app.models.user import UserPF, UserPJ, UserFreelancer
-from app.models.collaborator import CompanyCollaborator
 from app.models.share import Share
 from app.schemas.document_notification import DocumentFollowerCreate, DocumentFollowerUpdate
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
+MODO_PADRAO = "imediato"
+
+
+def obter_modo_notificacao(db: Session, user_id: int, tipo_usuario: str) -> str:
+    """Modo de notificação preferido do usuário (PUT /modo-notificacao), padrão imediato"""
+    modo = db.query(NotificationPreference.modo_notificacao).filter(
+        NotificationPreference.user_id == user_id,
+        NotificationPreference.tipo_usuario == tipo_usuario
+    ).scalar()
+    return modo or MODO_PADRAO
+
+
 def seguir_documento(db: Session, data: DocumentFollowerCreate) -> DocumentFollower:
     """
-    Faz um usuário seguir um documento
+    Faz um usuário seguir um documento (sem modo_notificacao, vale a preferência do usuário)
     """
     # Verificar se o documento existe
     documento = db.query(StorageNode).filter(StorageNode.id == data.node_id).first()
@@ -31,12 +42,15 @@ def seguir_documento(db: Session, data: DocumentFollowerCreate) -> DocumentFollo
         )
     ).first()
     
+    modo_notificacao = data.modo_notificacao or obter_modo_notificacao(db, data.user_id, data.tipo_usuario)
+    
     if seguidor_existente:
         # Reativar se estava desativado
         if not seguidor_existente.ativo:
             seguidor_existente.ativo = True
             seguidor_existente.dias_antes_alerta = data.dias_antes_alerta
             seguidor_existente.alertar_no_vencimento = data.alertar_no_vencimento
+            seguidor_existente.modo_notificacao = modo_notificacao
             db.commit()
             db.refresh(seguidor_existente)
             return seguidor_existente
@@ -49,6 +63,7 @@ def seguir_documento(db: Session, data: DocumentFollowerCreate) -> DocumentFollo
         tipo_usuario=data.tipo_usuario,
         dias_antes_alerta=data.dias_antes_alerta,
         alertar_no_vencimento=data.alertar_no_vencimento,
+        modo_notificacao=modo_notificacao,
         ativo=True
     )
     
@@ -58,6 +73,87 @@ def seguir_documento(db: Session, data: DocumentFollowerCreate) -> DocumentFollo
     
     return seguidor
 
+TIPOS_DONO = ("pf", "pj", "freelancer")
+SEGUIR_DONO_LOTE = 5000
+
+
+def _inserir_seguidores_dono(db: Session, filtro, commit: bool) -> int:
+    """INSERT ... SELECT dos arquivos em `filtro` que o dono ainda não segue (no modo preferido dele)"""
+    from sqlalchemy import exists, func, insert, literal, select
+
+    ja_segue = exists().where(
+        DocumentFollower.node_id == StorageNode.id,
+        DocumentFollower.user_id == StorageNode.business_id,
+        DocumentFollower.tipo_usuario == StorageNode.type_user
+    )
+    modo_preferido = select(NotificationPreference.modo_notificacao).where(
+        NotificationPreference.user_id == StorageNode.business_id,
+        NotificationPreference.tipo_usuario == StorageNode.type_user
+    ).scalar_subquery()
+    arquivos = select(
+        StorageNode.id,
+        StorageNode.business_id,
+        StorageNode.type_user,
+        literal(7),
+        literal(True),
+        func.coalesce(modo_preferido, MODO_PADRAO),
+        literal(True)
+    ).where(
+        filtro,
+        StorageNode.type == NodeType.file,
+        StorageNode.deleted_at.is_(None),
+        StorageNode.business_id.isnot(None),
+        StorageNode.type_user.in_(TIPOS_DONO),
+        ~ja_segue
+    )
+    result = db.execute(insert(DocumentFollower).from_select(
+        ["node_id", "user_id", "tipo_usuario", "dias_antes_alerta", "alertar_no_vencimento", "modo_notificacao", "ativo"],
+        arquivos
+    ))
+    if commit:
+        db.commit()
+    return max(result.rowcount or 0, 0)
+
+
+def seguir_como_dono(db: Session, node_ids: List[int], commit: bool = True) -> int:
+    """
+    Faz o dono (business_id/type_user) seguir os próprios arquivos.
+
+    OTIMIZADO: um único INSERT ... SELECT com NOT EXISTS, ao invés de
+    seguir_documento (SELECT + INSERT + commit) por arquivo. Arquivos que o dono
+    deixou de seguir (seguidor inativo) não voltam a ser seguidos.
+
+    Args:
+        node_ids: arquivos recém-criados (pastas e arquivos de outros donos são ignorados)
+        commit: False para gravar na transação do chamador (ex: create_node)
+
+    Returns:
+        Quantidade de seguidores criados
+    """
+    if not node_ids:
+        return 0
+    return _inserir_seguidores_dono(db, StorageNode.id.in_(node_ids), commit)
+
+
+def seguir_como_dono_backfill(db: Session, lote: int = SEGUIR_DONO_LOTE) -> Dict[str, int]:
+    """
+    Backfill: seguidor do dono para os arquivos antigos, criados antes do
+    seguimento automático na criação. Percorre storage_nodes por faixas de id,
+    com um commit por faixa (transações curtas; pode ser interrompido e repetido).
+    """
+    from sqlalchemy import func
+
+    maior_id = db.query(func.max(StorageNode.id)).scalar() or 0
+    criados = 0
+    faixas = 0
+    for inicio in range(0, maior_id, lote):
+        criados += _inserir_seguidores_dono(
+            db, and_(StorageNode.id > inicio, StorageNode.id <= inicio + lote), commit=True
+        )
+        faixas += 1
+    return {"seguidores_criados": criados, "faixas": faixas}
+
+
 def deixar_de_seguir_documento(db: Session, node_id: int, user_id: int, tipo_usuario: str) -> Dict[str, str]:
     """
     Remove o seguimento de um documento
@@ -107,6 +203,8 @@ def atualizar_configuracoes_seguimento(
         seguidor.dias_antes_alerta = data.dias_antes_alerta
     if data.alertar_no_vencimento is not None:
         seguidor.alertar_no_vencimento = data.alertar_no_vencimento
+    if data.modo_notificacao is not None:
+        seguidor.modo_notificacao = data.modo_notificacao
     if data.ativo is not None:
         seguidor.ativo = data.ativo
     
@@ -115,6 +213,33 @@ def atualizar_configuracoes_seguimento(
     
     return seguidor
 
+def definir_modo_notificacao_usuario(db: Session, user_id: int, tipo_usuario: str, modo_notificacao: str) -> Dict[str, Any]:
+    """
+    Define o modo de notificação (imediato, diario, semanal) do usuário: grava a
+    preferência (usada nos documentos que ele passar a seguir, inclusive o
+    seguimento automático dos próprios arquivos) e atualiza os já seguidos com um
+    único UPDATE
+    """
+    preferencia = db.query(NotificationPreference).filter(
+        NotificationPreference.user_id == user_id,
+        NotificationPreference.tipo_usuario == tipo_usuario
+    ).first()
+    if preferencia:
+        preferencia.modo_notificacao = modo_notificacao
+    else:
+        db.add(NotificationPreference(user_id=user_id, tipo_usuario=tipo_usuario, modo_notificacao=modo_notificacao))
+    
+    atualizados = db.query(DocumentFollower).filter(
+        and_(
+            DocumentFollower.user_id == user_id,
+            DocumentFollower.tipo_usuario == tipo_usuario,
+            DocumentFollower.ativo == True
+        )
+    ).update({DocumentFollower.modo_notificacao: modo_notificacao}, synchronize_session=False)
+    db.commit()
+    
+    return {"modo_notificacao": modo_notificacao, "documentos_atualizados": atualizados}
+
 def listar_documentos_seguidos(db: Session, user_id: int, tipo_usuario: str) -> List[Dict[str, Any]]:
     """
     Lista todos os documentos que o usuário está seguindo
@@ -156,6 +281,7 @@ def listar_documentos_seguidos(db: Session, user_id: int, tipo_usuario: str) ->
             "status_vencimento": status_vencimento,
             "dias_antes_alerta": seguidor.dias_antes_alerta,
             "alertar_no_vencimento": seguidor.alertar_no_vencimento,
+            "modo_notificacao": seguidor.modo_notificacao,
             "seguindo_desde": seguidor.created_at
         })
     
@@ -191,6 +317,39 @@ def obter_email_usuario(db: Session, user_id: int, tipo_usuario: str) -> str:
     return None
 
 
+def obter_emails_usuarios_batch(db: Session, usuarios: List[tuple]) -> Dict[tuple, str]:
+    """
+    Versão em lote de obter_email_usuario.
+    OTIMIZADO: no máximo uma query por tipo de usuário (PJ resolvido com JOIN no PF responsável).
+
+    Args:
+        usuarios: [(user_id, tipo_usuario)]
+
+    Returns:
+        {(user_id, tipo_usuario): email} (usuários sem email ficam de fora)
+    """
+    ids_por_tipo = {"pf": set(), "pj": set(), "freelancer": set()}
+    for user_id, tipo_usuario in usuarios:
+        if tipo_usuario in ids_por_tipo:
+            ids_por_tipo[tipo_usuario].add(user_id)
+
+    emails = {}
+    if ids_por_tipo["pf"]:
+        rows = db.query(UserPF.id, UserPF.email).filter(UserPF.id.in_(ids_por_tipo["pf"])).all()
+        emails.update({(r.id, "pf"): r.email for r in rows if r.email})
+    if ids_por_tipo["pj"]:
+        rows = db.query(UserPJ.id, UserPF.email).join(
+            UserPF, UserPF.id == UserPJ.id_user_pf
+        ).filter(UserPJ.id.in_(ids_por_tipo["pj"])).all()
+        emails.update({(r.id, "pj"): r.email for r in rows if r.email})
+    if ids_por_tipo["freelancer"]:
+        rows = db.query(UserFreelancer.id, UserFreelancer.email).filter(
+            UserFreelancer.id.in_(ids_por_tipo["freelancer"])
+        ).all()
+        emails.update({(r.id, "freelancer"): r.email for r in rows if r.email})
+    return emails
+
+
 # ==========================================
 # FUNÇÕES BATCH OTIMIZADAS
 # ==========================================
@@ -378,7 +537,10 @@ def verificar_dono_batch(db: Session, nodes: List, user_id: int, tipo_usuario: s
 def obter_seguidores_documento(db: Session, node_id: int) -> List[Dict[str, Any]]:
     """
     Retorna todos os seguidores ativos de um documento com informações do usuário
+    OTIMIZADO: nomes/emails resolvidos em lote (com cache) ao invés de 1-3 queries por seguidor.
     """
+    from app.services.user_identity import resolve_many
+    
     seguidores = db.query(DocumentFollower).filter(
         and_(
             DocumentFollower.node_id == node_id,
@@ -386,45 +548,13 @@ def obter_seguidores_documento(db: Session, node_id: int) -> List[Dict[str, Any]
         )
     ).all()
     
+    usuarios = resolve_many(db, [
+        (s.user_id, s.tipo_usuario) for s in seguidores if s.tipo_usuario in ("pf", "pj", "freelancer")
+    ])
+    
     resultado = []
     for seguidor in seguidores:
-        # Buscar informações do usuário
-        user_info = None
-        email = obter_email_usuario(db, seguidor.user_id, seguidor.tipo_usuario)
-        
-        if seguidor.tipo_usuario == "pf":
-            user = db.query(UserPF).filter(UserPF.id == seguidor.user_id).first()
-            if user:
-                user_info = {
-                    "id": user.id,
-                    "nome": user.nome,
-                    "email": user.email,
-                    "tipo": "pf"
-                }
-        elif seguidor.tipo_usuario == "pj":
-            user = db.query(UserPJ).filter(UserPJ.id == seguidor.user_id).first()
-            if user:
-                # Buscar email do UserPF vinculado
-                email_pj = None
-                if user.id_user_pf:
-                    user_pf = db.query(UserPF).filter(UserPF.id == user.id_user_pf).first()
-                    email_pj = user_pf.email if user_pf else None
-                user_info = {
-                    "id": user.id,
-                    "nome": user.razao_social,
-                    "email": email_pj,
-                    "tipo": "pj"
-                }
-        elif seguidor.tipo_usuario == "freelancer":
-            user = db.query(UserFreelancer).filter(UserFreelancer.id == seguidor.user_id).first()
-            if user:
-                user_info = {
-                    "id": user.id,
-                    "nome": user.nome,
-                    "email": user.email,
-                    "tipo": "freelancer"
-                }
-        
+        user_info = usuarios.get((seguidor.user_id, seguidor.tipo_usuario))
         if user_info:
             resultado.append({
                 "seguidor_id": seguidor.id,
@@ -505,11 +635,13 @@ def seguir_documento_por_email(
     node_id: int, 
     email: str,
     dias_antes_alerta: int = 7,
-    alertar_no_vencimento: bool = True
+    alertar_no_vencimento: bool = True,
+    modo_notificacao: Optional[str] = None
 ) -> DocumentFollower:
     """
     Faz um usuário seguir um documento automaticamente usando apenas o email
     Busca o usuário em todas as tabelas (PF, PJ, Freelancer) pelo email
+    (sem modo_notificacao, vale a preferência do usuário)
     """
     # Verificar se o documento existe
     documento = db.query(StorageNode).filter(StorageNode.id == node_id).first()
@@ -543,6 +675,8 @@ def seguir_documento_por_email(
             detail=f"Nenhum usuário encontrado com o email {email}"
         )
     
+    modo_notificacao = modo_notificacao or obter_modo_notificacao(db, user_id, tipo_usuario)
+    
     # Verificar se já está seguindo
     seguidor_existente = db.query(DocumentFollower).filter(
         and_(
@@ -558,6 +692,7 @@ def seguir_documento_por_email(
             seguidor_existente.ativo = True
             seguidor_existente.dias_antes_alerta = dias_antes_alerta
             seguidor_existente.alertar_no_vencimento = alertar_no_vencimento
+            seguidor_existente.modo_notificacao = modo_notificacao
             db.commit()
             db.refresh(seguidor_existente)
             return seguidor_existente
@@ -572,6 +707,7 @@ def seguir_documento_por_email(
         tipo_usuario=tipo_usuario,
         dias_antes_alerta=dias_antes_alerta,
         alertar_no_vencimento=alertar_no_vencimento,
+        modo_notificacao=modo_notificacao,
         ativo=True
     )
     
@@ -586,112 +722,38 @@ def obter_compartilhamentos_documento(db: Session, node_id: int) -> List[Dict[st
     """
     Retorna todos os usuários com quem um documento está compartilhado
     Similar à função de seguidores, mas para compartilhamentos
+    
+    Inclui os compartilhamentos herdados das pastas ancestrais (campo "herdado").
+    OTIMIZADO: quem recebeu e quem compartilhou são resolvidos em um único lote (com cache).
     """
-    compartilhamentos = db.query(Share).filter(Share.node_id == node_id).all()
+    from app.crud.share import get_access_node_ids
+    from app.services.user_identity import resolve_many
+    
+    node = db.query(StorageNode).filter(StorageNode.id == node_id).first()
+    access_ids = get_access_node_ids(node) if node else [node_id]
+    compartilhamentos = db.query(Share).filter(Share.node_id.in_(access_ids)).all()
+    
+    usuarios = resolve_many(db, [
+        key
+        for share in compartilhamentos
+        for key in (
+            (share.shared_with_user_id, share.type_user_receiver),
+            (share.shared_by_user_id, share.type_user_sender)
+        )
+    ])
     
     resultado = []
     for share in compartilhamentos:
-        # Buscar informações do usuário que RECEBEU o compartilhamento
-        user_info = None
-        tipo_usuario = share.type_user_receiver
-        
-        if tipo_usuario == "pf":
-            user = db.query(UserPF).filter(UserPF.id == share.shared_with_user_id).first()
-            if user:
-                user_info = {
-                    "id": user.id,
-                    "nome": user.nome,
-                    "email": user.email,
-                    "tipo": "pf"
-                }
-        elif tipo_usuario == "pj":
-            user = db.query(UserPJ).filter(UserPJ.id == share.shared_with_user_id).first()
-            if user:
-                # Buscar email do UserPF vinculado
-                email_pj = None
-                if user.id_user_pf:
-                    user_pf = db.query(UserPF).filter(UserPF.id == user.id_user_pf).first()
-                    email_pj = user_pf.email if user_pf else None
-                user_info = {
-                    "id": user.id,
-                    "nome": user.razao_social,
-                    "email": email_pj,
-                    "tipo": "pj"
-                }
-        elif tipo_usuario == "freelancer":
-            user = db.query(UserFreelancer).filter(UserFreelancer.id == share.shared_with_user_id).first()
-            if user:
-                user_info = {
-                    "id": user.id,
-                    "nome": user.nome,
-                    "email": user.email,
-                    "tipo": "freelancer"
-                }
-        elif tipo_usuario == "collaborator":
-            user = db.query(CompanyCollaborator).filter(CompanyCollaborator.id == share.shared_with_user_id).first()
-            if user:
-                user_info = {
-                    "id": user.id,
-                    "nome": user.name,
-                    "email": user.email,
-                    "tipo": "collaborator",
-                    "company_id": user.company_id,
-                    "company_type": user.company_type
-                }
-        
-        # Buscar informações do usuário que COMPARTILHOU
-        shared_by_info = None
-        tipo_usuario_sender = share.type_user_sender
-        
-        if tipo_usuario_sender == "pf":
-            sender = db.query(UserPF).filter(UserPF.id == share.shared_by_user_id).first()
-            if sender:
-                shared_by_info = {
-                    "id": sender.id,
-                    "nome": sender.nome,
-                    "email": sender.email,
-                    "tipo": "pf"
-                }
-        elif tipo_usuario_sender == "pj":
-            sender = db.query(UserPJ).filter(UserPJ.id == share.shared_by_user_id).first()
-            if sender:
-                # Buscar email do UserPF vinculado
-                email_sender = None
-                if sender.id_user_pf:
-                    user_pf_sender = db.query(UserPF).filter(UserPF.id == sender.id_user_pf).first()
-                    email_sender = user_pf_sender.email if user_pf_sender else None
-                shared_by_info = {
-                    "id": sender.id,
-                    "nome": sender.razao_social,
-                    "email": email_sender,
-                    "tipo": "pj"
-                }
-        elif tipo_usuario_sender == "freelancer":
-            sender = db.query(UserFreelancer).filter(UserFreelancer.id == share.shared_by_user_id).first()
-            if sender:
-                shared_by_info = {
-                    "id": sender.id,
-                    "nome": sender.nome,
-                    "email": sender.email,
-                    "tipo": "freelancer"
-                }
-        elif tipo_usuario_sender == "collaborator":
-            sender = db.query(CompanyCollaborator).filter(CompanyCollaborator.id == share.shared_by_user_id).first()
-            if sender:
-                shared_by_info = {
-                    "id": sender.id,
-                    "nome": sender.name,
-                    "email": sender.email,
-                    "tipo": "collaborator",
-                    "company_id": sender.company_id,
-                    "company_type": sender.company_type
-                }
+        # Usuário que RECEBEU e usuário que COMPARTILHOU
+        user_info = usuarios.get((share.shared_with_user_id, share.type_user_receiver))
+        shared_by_info = usuarios.get((share.shared_by_user_id, share.type_user_sender))
         
         if user_info:
             resultado.append({
                 "share_id": share.id,
                 "compartilhado_com": user_info,
                 "compartilhado_por": shared_by_info,
+                "herdado": share.node_id != node_id,
                 "created_at": share.created_at
             })
     
@@ -95,95 +95,88 @@ def _get_status_color(status_name: str, used_colors: set):
     return color
 
 
-def _parse_size(size_str: str) -> int:
-    """Converte string de tamanho (ex: '1.5 MB') para bytes"""
-    if not size_str:
-        return 0
+def _storage_metrics(db: Session, where: str, params: dict):
+    """
+    Armazenamento, totais e status dos nodes que atendem ao filtro `where`.
     
-    # Se for apenas dígitos, converte direto
-    if size_str.isdigit():
-        return int(size_str)
-        
-    try:
-        parts = size_str.split(' ')
-        if len(parts) < 2:
-            # Tenta converter o que der
-             return int(float(size_str))
-             
-        value = float(parts[0])
-        unit = parts[1].upper()
-        
-        multipliers = {
-            'B': 1,
-            'KB': 1024,
-            'MB': 1024**2,
-            'GB': 1024**3,
-            'TB': 1024**4,
-            'PB': 1024**5
-        }
-        
-        return int(value * multipliers.get(unit, 1))
-    except Exception:
-        return 0
+    OTIMIZADO: duas agregações no SQL (SUM/COUNT por tipo e COUNT por status)
+    usando size_bytes, ao invés de carregar e converter o tamanho de cada arquivo.
+    """
+    # 1 + 2. ARMAZENAMENTO E CONTAGENS (uma linha por tipo)
+    totals_by_type = db.execute(text(
+        f"SELECT type, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM storage_nodes "
+        f"WHERE {where} GROUP BY type"
+    ), params).fetchall()
+    
+    files_count = folders_count = total_bytes = 0
+    for node_type, count, size_bytes in totals_by_type:
+        if node_type == 'file':
+            files_count = count
+            total_bytes = int(size_bytes)
+        elif node_type == 'folder':
+            folders_count = count
+    
+    # 3. STATUS - contagem agrupada no banco
+    status_rows = db.execute(text(
+        f"SELECT status, COUNT(*) FROM storage_nodes "
+        f"WHERE {where} AND type = 'file' GROUP BY status"
+    ), params).fetchall()
+    
+    # Unificar status vazios/nulos
+    status_dict = {}
+    for st, total in status_rows:
+        st = st if st and st.strip() else "Sem Status"
+        status_dict[st] = status_dict.get(st, 0) + total
+    
+    return _format_storage_metrics(total_bytes, files_count, folders_count, status_dict)
+
+def _format_storage_metrics(total_bytes: int, files_count: int, folders_count: int, status_dict: dict):
+    """Monta a resposta de métricas (armazenamento, totais e status com cores)"""
+    total_mb = round(total_bytes / (1024 * 1024), 2)
+    total_gb = round(total_bytes / (1024 * 1024 * 1024), 2)
+    
+    # Montar array de status
+    status_counts = []
+    used_colors = set()
+    
+    for st_name, total in sorted(status_dict.items(), key=lambda x: x[1], reverse=True):
+        color = _get_status_color(st_name, used_colors)
+        
+        status_counts.append({
+            "status_name": st_name,
+            "status_color": color,
+            "total": total
+        })
+    
+    return {
+        "armazenamento": {
+            "total_bytes": total_bytes,
+            "total_mb": total_mb,
+            "total_gb": total_gb
+        },
+        "totais": {
+            "arquivos": files_count,
+            "pastas": folders_count,
+            "total": files_count + folders_count
+        },
+        "status": status_counts
+    }
 
 def get_company_metrics(db: Session, company_id: int, tipo_usuario: str):
-    """Retorna métricas da empresa"""
+    """
+    Retorna métricas da empresa (arquivos ativos)
+    
+    OTIMIZADO: lê os contadores de company_storage_usage, sem varrer storage_nodes
+    """
     try:
-        # 1. ARMAZENAMENTO - buscar tamanhos
-        sizes_result = db.execute(text(
-            "SELECT size FROM storage_nodes WHERE company_id = :cid AND type = 'file'"
-        ), {"cid": company_id}).fetchall()
-        
-        total_bytes = sum(_parse_size(row[0]) for row in sizes_result if row[0])
-        total_mb = round(total_bytes / (1024 * 1024), 2)
-        total_gb = round(total_bytes / (1024 * 1024 * 1024), 2)
-        
-        # 2. CONTAGENS
-        files_count = db.execute(text(
-            "SELECT COUNT(*) FROM storage_nodes WHERE company_id = :cid AND type = 'file'"
-        ), {"cid": company_id}).scalar() or 0
-        
-        folders_count = db.execute(text(
-            "SELECT COUNT(*) FROM storage_nodes WHERE company_id = :cid AND type = 'folder'"
-        ), {"cid": company_id}).scalar() or 0
-        
-        # 3. STATUS - Pegar TODOS os arquivos e contar status
-        all_files = db.execute(text(
-            "SELECT status FROM storage_nodes WHERE company_id = :cid AND type = 'file'"
-        ), {"cid": company_id}).fetchall()
-        
-        # Contar manualmente status iguais
-        status_dict = {}
-        for row in all_files:
-            st = row[0] if row[0] and row[0].strip() else "Sem Status"
-            status_dict[st] = status_dict.get(st, 0) + 1
-        
-        # Montar array de status
-        status_counts = []
-        used_colors = set()
-        
-        for st_name, total in sorted(status_dict.items(), key=lambda x: x[1], reverse=True):
-            color = _get_status_color(st_name, used_colors)
-            
-            status_counts.append({
-                "status_name": st_name,
-                "status_color": color,
-                "total": total
-            })
-        
-        return {
-            "armazenamento": {
-                "total_bytes": total_bytes,
-                "total_mb": total_mb,
-                "total_gb": total_gb
-            },
-            "totais": {
-                "arquivos": files_count,
-                "pastas": folders_count,
-                "total": files_count + folders_count
-            },
-            "status": status_counts
-        }
+        from app.crud.storage_usage import get_company_usage
+        usage = get_company_usage(db, company_id)
+        return _format_storage_metrics(
+            usage["total_bytes"],
+            usage["total_files"],
+            usage["total_folders"],
+            usage["by_status"]
+        )
     except Exception as e:
         return {
             "error": str(e),
@@ -196,61 +189,11 @@ def get_company_metrics(db: Session, company_id: int, tipo_usuario: str):
 def get_user_metrics(db: Session, user_id: int, tipo_usuario: str):
     """Retorna métricas do usuário"""
     try:
-        # 1. ARMAZENAMENTO
-        sizes_result = db.execute(text(
-            "SELECT size FROM storage_nodes WHERE business_id = :uid AND type_user = :tu AND type = 'file'"
-        ), {"uid": user_id, "tu": tipo_usuario}).fetchall()
-        
-        total_bytes = sum(_parse_size(row[0]) for row in sizes_result if row[0])
-        total_mb = round(total_bytes / (1024 * 1024), 2)
-        total_gb = round(total_bytes / (1024 * 1024 * 1024), 2)
-        
-        # 2. CONTAGENS
-        files_count = db.execute(text(
-            "SELECT COUNT(*) FROM storage_nodes WHERE business_id = :uid AND type_user = :tu AND type = 'file'"
-        ), {"uid": user_id, "tu": tipo_usuario}).scalar() or 0
-        
-        folders_count = db.execute(text(
-            "SELECT COUNT(*) FROM storage_nodes WHERE business_id = :uid AND type_user = :tu AND type = 'folder'"
-        ), {"uid": user_id, "tu": tipo_usuario}).scalar() or 0
-        
-        # 3. STATUS - Pegar TODOS os arquivos e contar status
-        all_files = db.execute(text(
-            "SELECT status FROM storage_nodes WHERE business_id = :uid AND type_user = :tu AND type = 'file'"
-        ), {"uid": user_id, "tu": tipo_usuario}).fetchall()
-        
-        # Contar manualmente status iguais
-        status_dict = {}
-        for row in all_files:
-            st = row[0] if row[0] and row[0].strip() else "Sem Status"
-            status_dict[st] = status_dict.get(st, 0) + 1
-        
-        # Montar array de status
-        status_counts = []
-        used_colors = set()
-        
-        for st_name, total in sorted(status_dict.items(), key=lambda x: x[1], reverse=True):
-            color = _get_status_color(st_name, used_colors)
-            
-            status_counts.append({
-                "status_name": st_name,
-                "status_color": color,
-                "total": total
-            })
-        
-        return {
-            "armazenamento": {
-                "total_bytes": total_bytes,
-                "total_mb": total_mb,
-                "total_gb": total_gb
-            },
-            "totais": {
-                "arquivos": files_count,
-                "pastas": folders_count,
-                "total": files_count + folders_count
-            },
-            "status": status_counts
-        }
+        return _storage_metrics(
+            db,
+            "business_id = :uid AND type_user = :tu",
+            {"uid": user_id, "tu": tipo_usuario}
+        )
     except Exception as e:
         return {
             "error": str(e),
@@ -0,0 +1,86 @@
+import re
+from typing import Optional
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from app.models.storage import StorageNode
+
+
+# ==========================================
+# BUSCA FULLTEXT (NOME + COMENTÁRIOS)
+# ==========================================
+#
+# Usa o índice FULLTEXT ix_storage_nodes_search_text do MySQL sobre a coluna
+# gerada search_text (nome com "_" trocado por espaço + comentários), mantida
+# pelo próprio banco em create/update/rename. A collation utf8mb4 *_ci já ignora
+# maiúsculas e acentos ("relatorio" encontra "Relatório").
+#
+# Diferente do antigo ILIKE '%termo%', cada palavra casa pelo INÍCIO de uma
+# palavra do nome: "contrato" e "2024" encontram "NF_2024_contrato.pdf", mas
+# "trato" não encontra "contrato".
+#
+# Termos que o índice não consegue atender (tokens menores que
+# innodb_ft_min_token_size ou só stopwords) e outros bancos caem no ILIKE antigo.
+
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+# Stopwords padrão do InnoDB: exigir uma delas (+de*) zeraria o resultado
+INNODB_STOPWORDS = {
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for",
+    "from", "how", "i", "in", "is", "it", "la", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "who", "will", "with", "und", "www",
+}
+
+
+def build_fulltext_query(search_term: str) -> Optional[str]:
+    """
+    Converte o texto digitado em uma query BOOLEAN MODE com prefixo:
+    "contrato soc" -> "+contrato* +soc*" (todas as palavras, cada uma como prefixo).
+
+    Retorna None quando alguma palavra não pode ser atendida pelo índice
+    (curta demais), para que a busca use o ILIKE.
+    """
+    # "_" separa palavras, como em search_text ("NF_2024" -> "NF", "2024")
+    tokens = [t for t in re.findall(r"[^\W_]+", search_term or "", re.UNICODE)]
+    tokens = [t for t in tokens if t.lower() not in INNODB_STOPWORDS]
+    if not tokens or any(len(t) < FULLTEXT_MIN_TOKEN_SIZE for t in tokens):
+        return None
+    return " ".join(f"+{t}*" for t in tokens)
+
+
+def supports_fulltext(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+
+def _fulltext_match(fulltext_query: str):
+    return match(StorageNode.search_text, against=fulltext_query).in_boolean_mode()
+
+
+def search_filter(db: Session, search_term: str):
+    """
+    Filtro de busca por nome/comentários.
+
+    OTIMIZADO: MATCH ... AGAINST no índice FULLTEXT ao invés de
+    ILIKE '%termo%' (que varre todos os nodes visíveis a cada busca).
+    """
+    fulltext_query = build_fulltext_query(search_term)
+    if fulltext_query and supports_fulltext(db):
+        return _fulltext_match(fulltext_query) > 0
+
+    term = f"%{search_term}%"
+    return or_(
+        StorageNode.name.ilike(term),
+        StorageNode.comments.ilike(term)
+    )
+
+
+def search_relevance(db: Session, search_term: Optional[str]):
+    """Expressão de relevância (maior = melhor) para ordenar a busca, ou None sem FULLTEXT"""
+    if not search_term:
+        return None
+    fulltext_query = build_fulltext_query(search_term)
+    if fulltext_query and supports_fulltext(db):
+        return _fulltext_match(fulltext_query)
+    return None
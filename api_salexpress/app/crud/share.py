@@ -1,14 +1,20 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import insert
 from fastapi import HTTPException
 from app.models.share import Share
 from app.schemas.share import ShareCreate, ShareCreateLegacy
 from app.models.storage import StorageNode
 from app.crud.user_business_link import get_user_info_by_email
-from typing import List
+from app.core.config import settings
+from sqlalchemy import func
+from typing import List, Dict, Optional
 
 def get_all_children_recursively(db: Session, parent_id: int) -> List[StorageNode]:
     """
-    Busca recursivamente todos os filhos de uma pasta (arquivos e subpastas)
+    Busca todos os filhos de uma pasta (arquivos e subpastas, em qualquer nível)
+    
+    OTIMIZADO: Usa o path materializado (uma query indexada) ao invés de
+    uma query por pasta da árvore
     
     Args:
         db: Sessão do banco de dados
@@ -17,20 +23,76 @@ def get_all_children_recursively(db: Session, parent_id: int) -> List[StorageNod
     Returns:
         Lista com todos os nós filhos (recursivamente)
     """
-    all_children = []
+    from app.crud.storage import get_descendants
     
-    # Busca filhos diretos
-    direct_children = db.query(StorageNode).filter(StorageNode.parent_id == parent_id).all()
+    return get_descendants(db, parent_id)
+
+def get_access_node_ids(node: StorageNode) -> List[int]:
+    """IDs que podem conceder acesso ao node: o próprio node e todas as pastas ancestrais"""
+    from app.crud.storage import get_ancestor_ids
     
-    for child in direct_children:
-        all_children.append(child)
-        
-        # Se o filho é uma pasta, busca recursivamente seus filhos
-        if getattr(child, "type", None) == "folder":
-            grandchildren = get_all_children_recursively(db, child.id)
-            all_children.extend(grandchildren)
+    return [node.id] + get_ancestor_ids(node)
+
+def find_share_access(
+    db: Session,
+    node: StorageNode,
+    user_id: int,
+    type_user: Optional[str] = None,
+    require_editing: bool = False
+) -> Optional[Share]:
+    """
+    Retorna um compartilhamento que dá acesso ao node para o usuário, seja
+    direto no node ou herdado de qualquer pasta ancestral (uma única query).
     
-    return all_children
+    Args:
+        require_editing: Considerar apenas compartilhamentos com allow_editing
+    """
+    query = db.query(Share).filter(
+        Share.node_id.in_(get_access_node_ids(node)),
+        Share.shared_with_user_id == user_id
+    )
+    if type_user:
+        query = query.filter(Share.type_user_receiver == type_user)
+    if require_editing:
+        query = query.filter(Share.allow_editing == True)
+    return query.first()
+
+def get_effective_shares_batch(
+    db: Session,
+    nodes: List[StorageNode],
+    user_id: int,
+    type_user: Optional[str] = None
+) -> Dict[int, List[Share]]:
+    """
+    Resolve, em uma única query, os compartilhamentos que valem para cada node
+    (diretos ou herdados das pastas ancestrais).
+    
+    Returns:
+        {node_id: [Share, ...]} ordenados do mais próximo (o próprio node) ao mais distante
+    """
+    if not nodes:
+        return {}
+    
+    chains = {node.id: list(reversed(get_access_node_ids(node))) for node in nodes}
+    all_ids = {node_id for chain in chains.values() for node_id in chain}
+    
+    query = db.query(Share).filter(
+        Share.node_id.in_(all_ids),
+        Share.shared_with_user_id == user_id
+    )
+    if type_user:
+        query = query.filter(Share.type_user_receiver == type_user)
+    
+    shares_by_node = {}
+    for share in query.all():
+        shares_by_node.setdefault(share.node_id, []).append(share)
+    
+    result = {}
+    for node_id, chain in chains.items():
+        effective = [share for ancestor_id in chain for share in shares_by_node.get(ancestor_id, [])]
+        if effective:
+            result[node_id] = effective
+    return result
 
 def create_share_for_node(db: Session, node_id: int, receiver_info: dict, sender_info: dict, allow_editing: bool = False) -> Share:
     """
@@ -73,11 +135,78 @@ def create_share_for_node(db: Session, node_id: int, receiver_info: dict, sender
     db.add(share)
     return share
 
-def create_share(db: Session, data: ShareCreate) -> Share:
+def share_subtree(db: Session, node: StorageNode, receiver_info: dict, sender_info: dict, allow_editing: bool = False) -> dict:
     """
-    Cria um compartilhamento usando emails para identificar usuários.
-    Se for uma pasta, compartilha RECURSIVAMENTE todo o conteúdo (arquivos e subpastas).
+    Compartilha um nó e, se for pasta, toda a sua subárvore em lote.
+    
+    Com herança implícita (settings.implicit_share_inheritance) apenas o próprio
+    nó recebe um Share: o acesso aos filhos é resolvido pela ancestralidade.
+    
+    OTIMIZADO: número fixo de queries, independente do tamanho da pasta:
+    1 SELECT para resolver a subárvore (path materializado), 1 SELECT para os
+    compartilhamentos já existentes, 1 UPDATE para a permissão de edição e
+    1 INSERT multi-linha para os novos. O commit fica a cargo do chamador.
+    
+    Returns:
+        Dict com totais (itens, criados, atualizados)
     """
+    from app.crud.storage import get_subtree_ids, descendants_filter
+    
+    is_folder = getattr(node, "type", None) == "folder"
+    if is_folder and not settings.implicit_share_inheritance:
+        node_ids = get_subtree_ids(db, node)
+    else:
+        # Herança implícita: o Share na pasta já cobre toda a subárvore
+        node_ids = [node.id]
+    
+    same_pair = (
+        (Share.shared_with_user_id == receiver_info["user_id"]) &
+        (Share.shared_by_user_id == sender_info["user_id"])
+    )
+    
+    # Triplas (node_id, shared_with_user_id, shared_by_user_id) já existentes
+    existing_ids = {
+        row.node_id for row in db.query(Share.node_id).filter(
+            Share.node_id.in_(node_ids),
+            same_pair
+        ).all()
+    }
+    
+    # Existentes: apenas atualiza a permissão de edição
+    if existing_ids:
+        db.query(Share).filter(
+            Share.node_id.in_(existing_ids),
+            same_pair
+        ).update({Share.allow_editing: allow_editing}, synchronize_session=False)
+    
+    # Novos: INSERT multi-linha
+    new_rows = [
+        {
+            "node_id": node_id,
+            "shared_with_user_id": receiver_info["user_id"],
+            "shared_by_user_id": sender_info["user_id"],
+            "type_user_sender": sender_info["type_user"],
+            "type_user_receiver": receiver_info["type_user"],
+            "allow_editing": allow_editing
+        }
+        for node_id in node_ids if node_id not in existing_ids
+    ]
+    if new_rows:
+        db.execute(insert(Share), new_rows)
+    
+    total_itens = len(node_ids)
+    if is_folder and settings.implicit_share_inheritance:
+        total_itens = db.query(func.count(StorageNode.id)).filter(descendants_filter(node, include_self=True)).scalar()
+    
+    return {
+        "node_id": node.id,
+        "total_itens": total_itens,
+        "criados": len(new_rows),
+        "atualizados": len(existing_ids)
+    }
+
+def _share_from_emails(db: Session, data: ShareCreate) -> dict:
+    """Resolve os usuários por email e compartilha a subárvore em uma transação"""
     # Busca informações do usuário que vai receber o compartilhamento
     receiver_info = get_user_info_by_email(db, data.shared_with_email)
     
@@ -89,46 +218,46 @@ def create_share(db: Session, data: ShareCreate) -> Share:
     if not node:
         raise HTTPException(status_code=404, detail="Arquivo/pasta não encontrado")
     
-    # Lista para armazenar todos os compartilhamentos criados
-    created_shares = []
-    
-    # Compartilha o nó principal (pasta ou arquivo)
-    main_share = create_share_for_node(db, data.node_id, receiver_info, sender_info, data.allow_editing)
-    created_shares.append(main_share)
-    
-    # Se for uma pasta, compartilha recursivamente todo o conteúdo
-    if getattr(node, "type", None) == "folder":
-        print(f"📂 Compartilhando pasta '{node.name}' e todo seu conteúdo...")
-        
-        # Busca todos os filhos recursivamente
-        all_children = get_all_children_recursively(db, data.node_id)
-        
-        print(f"🔍 Encontrados {len(all_children)} itens para compartilhar recursivamente")
-        
-        # Compartilha cada filho
-        for child in all_children:
-            # Filhos herdam a permissão de edição do pai
-            child_share = create_share_for_node(db, child.id, receiver_info, sender_info, data.allow_editing)
-            if child_share:
-                created_shares.append(child_share)
-                child_type = "📁" if getattr(child, "type", None) == "folder" else "📄"
-                print(f"   {child_type} Compartilhado: {child.name} (ID: {child.id})")
-    
-    # Commit de todos os compartilhamentos de uma vez
     try:
+        summary = share_subtree(db, node, receiver_info, sender_info, data.allow_editing)
         db.commit()
-        print(f"✅ Total de {len(created_shares)} compartilhamentos criados com sucesso!")
-        
-        # Refresh do compartilhamento principal para retornar
-        if main_share:
-            db.refresh(main_share)
-        
-        return main_share
-        
     except Exception as e:
         db.rollback()
         print(f"❌ Erro ao criar compartilhamentos: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao criar compartilhamentos: {str(e)}")
+    
+    print(f"✅ Compartilhamento de '{node.name}': {summary['criados']} criados, {summary['atualizados']} atualizados")
+    summary["receiver_info"] = receiver_info
+    summary["sender_info"] = sender_info
+    return summary
+
+def create_share(db: Session, data: ShareCreate) -> Share:
+    """
+    Cria um compartilhamento usando emails para identificar usuários.
+    Se for uma pasta, compartilha RECURSIVAMENTE todo o conteúdo (arquivos e subpastas).
+    
+    Retorna o compartilhamento do nó principal.
+    """
+    summary = _share_from_emails(db, data)
+    
+    return db.query(Share).filter(
+        Share.node_id == data.node_id,
+        Share.shared_with_user_id == summary["receiver_info"]["user_id"],
+        Share.shared_by_user_id == summary["sender_info"]["user_id"]
+    ).first()
+
+def create_share_summary(db: Session, data: ShareCreate) -> dict:
+    """
+    Igual a create_share, mas retorna apenas a contagem de itens compartilhados
+    (útil para pastas grandes, onde o frontend não precisa de cada registro).
+    """
+    summary = _share_from_emails(db, data)
+    return {
+        "node_id": summary["node_id"],
+        "total_itens": summary["total_itens"],
+        "criados": summary["criados"],
+        "atualizados": summary["atualizados"]
+    }
 
 def create_share_legacy(db: Session, data: ShareCreateLegacy) -> Share:
     """
@@ -144,24 +273,29 @@ def create_share_legacy(db: Session, data: ShareCreateLegacy) -> Share:
 def get_shared_with_user(db: Session, user_id: int) -> List[Share]:
     return db.query(Share).filter(Share.shared_with_user_id == user_id).all()
 
-def get_shared_nodes(db: Session, user_id: int, type_user: str = None) -> List[StorageNode]:
+def shared_nodes_query(db: Session, user_id: int, type_user: str = None):
     """
-    Busca todos os nós (arquivos e pastas) compartilhados com um usuário
+    Query (não executada, sem ordenação) de todos os nós compartilhados com um usuário,
+    incluindo o conteúdo das pastas compartilhadas (herança implícita)
     
     OTIMIZADO: Usa JOIN ao invés de N queries separadas
     """
-    # Query otimizada com JOIN - 1 query ao invés de N
-    query = db.query(StorageNode).join(
-        Share, StorageNode.id == Share.node_id
-    ).filter(
-        Share.shared_with_user_id == user_id
-    )
+    from app.crud.storage import shared_roots, subtrees_filter
     
-    if type_user:
-        query = query.filter(Share.type_user_receiver == type_user)
+    # Nó compartilhado explicitamente + toda a sua subárvore (path materializado):
+    # os nós compartilhados saem de uma consulta indexada em Share e viram prefixos literais
+    roots = shared_roots(db, user_id, type_user)
+    query = db.query(StorageNode).filter(subtrees_filter([path for _, path in roots]))
     
-    # distinct() para evitar duplicatas quando há múltiplos compartilhamentos
-    nodes = query.distinct().all()
+    # Subárvores sobrepostas (pasta e subpasta compartilhadas) caem no mesmo OR: sem duplicatas
+    return query
+
+def get_shared_nodes(db: Session, user_id: int, type_user: str = None) -> List[StorageNode]:
+    """
+    Busca todos os nós (arquivos e pastas) compartilhados com um usuário,
+    incluindo o conteúdo das pastas compartilhadas (herança implícita)
+    """
+    nodes = shared_nodes_query(db, user_id, type_user).all()
     
     # Ordena por hierarquia: pastas pai primeiro, depois filhos
     nodes.sort(key=lambda node: (node.parent_id or 0, node.name))
@@ -187,12 +321,15 @@ def get_shared_root_nodes(db: Session, user_id: int, type_user: str = None) -> L
     
     all_shared_nodes = query.distinct().all()
     
-    # Filtra apenas os nós que são "raiz" (não têm um pai que também foi compartilhado)
+    # Filtra apenas os nós que são "raiz" (nenhum ancestral também foi compartilhado)
+    from app.crud.storage import get_ancestor_ids
+    
     shared_node_ids = {node.id for node in all_shared_nodes}
     
     root_nodes = [
         node for node in all_shared_nodes
-        if node.parent_id is None or node.parent_id not in shared_node_ids
+        if not set(get_ancestor_ids(node)) & shared_node_ids
+        and (node.parent_id is None or node.parent_id not in shared_node_ids)
     ]
     
     # Ordena por hierarquia
@@ -204,13 +341,17 @@ def get_shared_root_nodes(db: Session, user_id: int, type_user: str = None) -> L
 def get_share_permissions_batch(db: Session, node_ids: List[int], user_id: int) -> dict:
     """
     Retorna um dicionário {node_id: allow_editing} para uma lista de nós e um usuário
+    
+    Considera compartilhamentos diretos e herdados de pastas ancestrais:
+    o nó é editável se qualquer compartilhamento aplicável permitir edição.
     """
     if not node_ids:
         return {}
-        
-    shares = db.query(Share.node_id, Share.allow_editing).filter(
-        Share.node_id.in_(node_ids),
-        Share.shared_with_user_id == user_id
-    ).all()
     
-    return {share.node_id: share.allow_editing for share in shares}
+    nodes = db.query(StorageNode.id, StorageNode.path).filter(StorageNode.id.in_(node_ids)).all()
+    effective = get_effective_shares_batch(db, nodes, user_id)
+    
+    return {
+        node_id: any(share.allow_editing for share in shares)
+        for node_id, shares in effective.items()
+    }
@@ -1,16 +1,138 @@
 from sqlalchemy.orm import Session, aliased
-from sqlalchemy import or_, exists
+from sqlalchemy import or_, exists, false, func
+import base64
+import json
 from fastapi import HTTPException
 from app.models.storage import StorageNode, NodeType
 from app.models.share import Share
 from app.schemas.storage import StorageCreate, StorageUpdate
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from app.crud.document_log import criar_log_documento
+from app.services.user_identity import resolve_name
 from app.models.document_log import DocumentAction
+from app.core.config import settings
+from app.crud.search import search_filter, search_relevance
+from app.crud.storage_quota import parse_size_to_bytes
+from app.crud.storage_usage import track_node_usage, track_nodes_usage
+from app.crud.storage_blob import acquire_blobs, release_blobs, release_blob_refs, delete_blob_objects
 
 from app.models.user_business_link import UserBusinessLink
 from app.models.collaborator import CompanyCollaborator
 
+
+# ==========================================
+# ÍNDICE DE ANCESTRALIDADE (PATH MATERIALIZADO)
+# ==========================================
+
+def build_node_path(parent_path: Optional[str], node_id: int) -> str:
+    """
+    Monta o path materializado de um node a partir do path do pai.
+    Ex: pai "/1/5/" + node 23 -> "/1/5/23/"
+    """
+    return f"{parent_path or '/'}{node_id}/"
+
+
+def get_ancestor_ids(node: StorageNode) -> List[int]:
+    """
+    Retorna os IDs dos ancestrais do node (da raiz até o pai imediato),
+    lidos diretamente do path, sem nenhuma query.
+    """
+    if not node.path:
+        return []
+    ids = [int(part) for part in node.path.strip("/").split("/") if part]
+    return ids[:-1]
+
+
+def descendants_filter(node: StorageNode, include_self: bool = False):
+    """
+    Filtro SQL para todos os descendentes de um node (subárvore inteira).
+    Usa o índice de path com LIKE de prefixo: uma única query indexada.
+    """
+    clause = StorageNode.path.like(f"{node.path}%")
+    if not include_self:
+        clause = clause & (StorageNode.id != node.id)
+    return clause
+
+
+def shared_roots(db: Session, user_id: int, type_user: Optional[str] = None) -> List[tuple]:
+    """
+    (id, path) dos nós compartilhados explicitamente com o usuário (índices de Share).
+    Resolvidos antes da consulta principal para que a herança use prefixos literais.
+    """
+    query = db.query(StorageNode.id, StorageNode.path).join(
+        Share, Share.node_id == StorageNode.id
+    ).filter(Share.shared_with_user_id == user_id)
+    if type_user:
+        query = query.filter(Share.type_user_receiver == type_user)
+    return [(row.id, row.path) for row in query.distinct() if row.path]
+
+
+def subtrees_filter(paths: List[str]):
+    """
+    Filtro SQL para as subárvores de vários nodes (inclusive eles mesmos).
+    LIKE com prefixo literal, como descendants_filter: usa o índice de path
+    (um padrão calculado por linha, LIKE CONCAT(path, '%'), não usaria).
+    """
+    if not paths:
+        return false()
+    return or_(*[StorageNode.path.like(f"{path}%") for path in paths])
+
+
+def get_descendants(db: Session, node_id: int, include_self: bool = False) -> List[StorageNode]:
+    """Busca todos os descendentes de um node (inclusive deletados) em uma query"""
+    node = get_node(db, node_id)
+    return db.query(StorageNode).filter(descendants_filter(node, include_self)).all()
+
+
+def get_subtree_ids(db: Session, node: StorageNode, include_self: bool = True) -> List[int]:
+    """Retorna os IDs de toda a subárvore do node em uma única query"""
+    rows = db.query(StorageNode.id).filter(descendants_filter(node, include_self)).all()
+    return [row.id for row in rows]
+
+
+def _set_node_parent(db: Session, node: StorageNode, new_parent_id: Optional[int]) -> None:
+    """
+    Altera o pai de um node mantendo o índice de path consistente.
+    O path do node e de toda a sua subárvore é reescrito com um único UPDATE.
+    O commit fica a cargo do chamador.
+    
+    Raises:
+        HTTPException: Se o destino for o próprio node, não for uma pasta ou estiver
+                      dentro da subárvore do node (o path viraria um prefixo de si mesmo)
+    """
+    if new_parent_id is not None and new_parent_id == node.id:
+        raise HTTPException(status_code=400, detail="Não é possível mover um item para dentro dele mesmo")
+    
+    parent_path = None
+    if new_parent_id is not None:
+        parent_node = get_node(db, new_parent_id)
+        if parent_node.type != NodeType.folder:
+            raise HTTPException(status_code=400, detail="O destino deve ser uma pasta")
+        
+        # Validar que não está criando um ciclo (mover pasta para dentro de si mesma)
+        if node.type == NodeType.folder and _is_descendant(db, node.id, new_parent_id, parent_node):
+            raise HTTPException(
+                status_code=400, 
+                detail="Não é possível mover uma pasta para dentro dela mesma ou de suas subpastas"
+            )
+        parent_path = parent_node.path
+
+    old_path = node.path
+    new_path = build_node_path(parent_path, node.id)
+
+    node.parent_id = new_parent_id
+    node.path = new_path
+
+    if old_path and old_path != new_path and node.type == NodeType.folder:
+        db.query(StorageNode).filter(
+            StorageNode.path.like(f"{old_path}%"),
+            StorageNode.id != node.id
+        ).update(
+            {StorageNode.path: func.concat(new_path, func.substr(StorageNode.path, len(old_path) + 1))},
+            synchronize_session=False
+        )
+
+
 def inherit_parent_shares(db: Session, node_id: int, parent_id: int) -> None:
     """
     Herda todos os compartilhamentos da pasta pai para o novo node.
@@ -52,18 +174,62 @@ def inherit_parent_shares(db: Session, node_id: int, parent_id: int) -> None:
         db.commit()
         # print(f"   📝 {len(new_shares)} compartilhamentos criados em batch")
 
-def create_node(db: Session, data: StorageCreate) -> StorageNode:
+def _blob_key(url: Optional[str]) -> Optional[str]:
+    from app.utils.cloudflare_r2 import key_from_url
+    return key_from_url(url)
+
+
+def _reference_node_blob(db: Session, node: StorageNode, content_hash: str, reused_blob: bool) -> List[str]:
+    """
+    Registra a referência do node ao blob do conteúdo (deduplicação) e aponta a
+    url para o objeto canônico. Retorna as keys que sobraram no R2 (apagar após o commit).
+    """
+    key = _blob_key(node.url)
+    moved = acquire_blobs(db, [(content_hash, key, node.size_bytes, reused_blob)])
+    node.content_hash = content_hash
+    if key in moved:
+        node.url = node.url.replace(key, moved[key])
+    return list(moved)
+
+
+def create_node(db: Session, data: StorageCreate, content_hash: Optional[str] = None, reused_blob: bool = False) -> StorageNode:
     """
     Cria um novo node (arquivo ou pasta).
-    Se o node tem um parent_id, herda automaticamente os compartilhamentos da pasta pai.
+    Com herança implícita de compartilhamentos, o acesso da pasta pai já cobre o
+    novo node (pelo path); caso contrário, copia os compartilhamentos da pasta pai.
+    
+    Args:
+        content_hash: SHA-256 do arquivo enviado com deduplicação (ver crud.storage_blob)
+        reused_blob: o upload foi pulado e a url já aponta para o blob existente
     """
     node = StorageNode(**data.dict())
+    if node.size_bytes is None and node.size:
+        # Clientes que enviam apenas o tamanho formatado (ex: "1.5 MB")
+        node.size_bytes = parse_size_to_bytes(node.size)
+    duplicate_keys = []
+    if content_hash and node.url:
+        duplicate_keys = _reference_node_blob(db, node, content_hash, reused_blob)
     db.add(node)
+    db.flush()  # Gera o ID para montar o path
+
+    parent_path = None
+    if node.parent_id:
+        parent_path = db.query(StorageNode.path).filter(StorageNode.id == node.parent_id).scalar()
+    node.path = build_node_path(parent_path, node.id)
+
+    # Contadores de uso da empresa (mesma transação)
+    track_node_usage(db, node)
+
+    # Dono segue o próprio arquivo desde a criação (antes era criado na listagem)
+    from app.crud.document_notification import seguir_como_dono
+    seguir_como_dono(db, [node.id], commit=False)
+
     db.commit()
     db.refresh(node)
+    delete_blob_objects(duplicate_keys)
     
-    # Se tem pasta pai, herdar compartilhamentos
-    if node.parent_id:
+    # Se tem pasta pai e a herança não é implícita, copiar compartilhamentos
+    if node.parent_id and not settings.implicit_share_inheritance:
         inherit_parent_shares(db, node.id, node.parent_id)
     
     # LOG: Criação
@@ -85,12 +251,337 @@ def create_node(db: Session, data: StorageCreate) -> StorageNode:
 
     return node
 
+# ==========================================
+# CRIAÇÃO EM LOTE (UPLOAD DE VÁRIOS ARQUIVOS / PASTAS)
+# ==========================================
+
+def _insert_marked_nodes(db: Session, rows: List[dict]) -> List[tuple]:
+    """
+    INSERT em lote (executemany) e retorna (id, parent_id, name) das linhas criadas.
+    As linhas entram com um path provisório único para serem recuperadas sem
+    depender da sequência de auto-incremento; o path real é gravado depois.
+    """
+    import uuid
+    from sqlalchemy import insert
+
+    marker = f"~{uuid.uuid4().hex}/"
+    db.execute(insert(StorageNode), [{**row, "path": marker} for row in rows])
+    return db.query(StorageNode.id, StorageNode.parent_id, StorageNode.name).filter(
+        StorageNode.path == marker
+    ).order_by(StorageNode.id).all()
+
+
+def _folder_key(name: str) -> str:
+    """Chave de comparação de nomes de pasta equivalente à collation *_ci (PAD SPACE) do MySQL."""
+    return name.rstrip(" ").lower()
+
+
+def create_nodes_batch(
+    db: Session,
+    entries: List[dict],
+    parent_id: Optional[int] = None,
+    business_id: Optional[int] = None,
+    type_user: Optional[str] = None,
+    company_id: Optional[int] = None,
+    company_type: Optional[str] = None
+) -> dict:
+    """
+    Cria vários arquivos de uma vez, criando as pastas dos caminhos relativos.
+
+    Args:
+        entries: [{"folders": ["Contratos", "2024"], "node": {name, size, size_bytes,
+                  extension, url, status, comments, data_validade, content_hash},
+                  "reused_blob": bool}]
+                 folders é o caminho relativo (a partir de parent_id) da pasta do arquivo;
+                 pastas que já existem (mesmo nome, não deletadas) são reaproveitadas.
+                 content_hash/reused_blob: arquivos enviados com deduplicação (opcionais).
+
+    OTIMIZADO: uma única transação com INSERTs em lote (pastas por nível, arquivos,
+    compartilhamentos herdados e logs) ao invés de create_node por arquivo
+    (commit + refresh + herança + log com commit para cada um).
+
+    Returns:
+        {"files": [StorageNode], "folders": [StorageNode criadas]}
+    """
+    from sqlalchemy import insert, update
+    from app.models.document_log import DocumentLog
+
+    owner = {
+        "business_id": business_id,
+        "type_user": type_user,
+        "company_id": company_id,
+        "company_type": company_type,
+    }
+
+    base_path = None
+    if parent_id:
+        base_path = db.query(StorageNode.path).filter(StorageNode.id == parent_id).scalar()
+
+    # Pasta (tupla do caminho relativo) -> id, path e pasta pré-existente mais próxima
+    # (de onde vêm os compartilhamentos herdados quando a herança não é implícita)
+    folder_ids = {(): parent_id}
+    folder_paths = {(): base_path}
+    anchors = {(): parent_id}
+    new_folder_ids = []
+
+    # Nomes que só diferem em maiúsculas/espaços finais são a mesma pasta (collation *_ci):
+    # a primeira grafia encontrada no lote vale para todas
+    canonical = {(): ()}
+    entry_folders = []
+    for entry in entries:
+        folders = tuple(entry["folders"])
+        norm = ()
+        for name in folders:
+            parent_norm, norm = norm, norm + (_folder_key(name),)
+            canonical.setdefault(norm, canonical[parent_norm] + (name,))
+        entry_folders.append(canonical[norm])
+    all_folders = {f for f in canonical.values() if f}
+
+    max_depth = max((len(f) for f in all_folders), default=0)
+    for depth in range(1, max_depth + 1):
+        level = sorted(f for f in all_folders if len(f) == depth)
+        parents = {folder_ids[f[:-1]] for f in level}
+
+        # Reaproveitar pastas existentes com o mesmo nome no mesmo pai
+        existing_q = db.query(StorageNode.id, StorageNode.parent_id, StorageNode.name, StorageNode.path).filter(
+            StorageNode.type == NodeType.folder,
+            StorageNode.deleted_at.is_(None),
+            StorageNode.name.in_([f[-1] for f in level])
+        )
+        non_root = [p for p in parents if p is not None]
+        conditions = []
+        if non_root:
+            conditions.append(StorageNode.parent_id.in_(non_root))
+        if None in parents:
+            conditions.append(
+                (StorageNode.parent_id.is_(None))
+                & (StorageNode.business_id == business_id)
+                & (StorageNode.type_user == type_user)
+            )
+        existing = {
+            (row.parent_id, _folder_key(row.name)): row
+            for row in existing_q.filter(or_(*conditions)).order_by(StorageNode.id.desc())
+        }
+
+        to_create = []
+        for folder in level:
+            pid = folder_ids[folder[:-1]]
+            row = existing.get((pid, _folder_key(folder[-1])))
+            if row:
+                folder_ids[folder] = row.id
+                folder_paths[folder] = row.path
+                anchors[folder] = row.id
+            else:
+                to_create.append(folder)
+
+        if to_create:
+            created = _insert_marked_nodes(db, [
+                {"name": f[-1], "type": NodeType.folder, "parent_id": folder_ids[f[:-1]], **owner}
+                for f in to_create
+            ])
+            by_key = {(row.parent_id, row.name): row.id for row in created}
+            for folder in to_create:
+                node_id = by_key[(folder_ids[folder[:-1]], folder[-1])]
+                folder_ids[folder] = node_id
+                folder_paths[folder] = build_node_path(folder_paths[folder[:-1]], node_id)
+                anchors[folder] = anchors[folder[:-1]]
+                new_folder_ids.append(node_id)
+
+    # Arquivos: um único INSERT em lote
+    file_rows = []
+    blob_refs = []
+    for entry, folder in zip(entries, entry_folders):
+        node_data = dict(entry["node"])
+        if node_data.get("size_bytes") is None and node_data.get("size"):
+            node_data["size_bytes"] = parse_size_to_bytes(node_data["size"])
+        if node_data.get("content_hash") and node_data.get("url"):
+            blob_refs.append((
+                node_data["content_hash"], _blob_key(node_data["url"]),
+                node_data.get("size_bytes"), entry.get("reused_blob", False)
+            ))
+        file_rows.append({**node_data, "type": NodeType.file, "parent_id": folder_ids[folder], **owner})
+
+    # Deduplicação: referências aos blobs e url do objeto canônico (antes do INSERT)
+    duplicate_keys = []
+    if blob_refs:
+        moved = acquire_blobs(db, blob_refs)
+        for row in file_rows:
+            key = _blob_key(row.get("url")) if row.get("content_hash") else None
+            if key in moved:
+                row["url"] = row["url"].replace(key, moved[key])
+        duplicate_keys = list(moved)
+    created_files = _insert_marked_nodes(db, file_rows) if file_rows else []
+
+    # Paths definitivos (UPDATE em lote por chave primária)
+    paths_by_parent = {folder_ids[f]: folder_paths[f] for f in folder_ids}
+    new_folder_set = set(new_folder_ids)
+    path_updates = [
+        {"id": folder_ids[f], "path": folder_paths[f]}
+        for f in folder_ids if folder_ids[f] in new_folder_set
+    ]
+    path_updates += [
+        {"id": row.id, "path": build_node_path(paths_by_parent[row.parent_id], row.id)}
+        for row in created_files
+    ]
+    if path_updates:
+        db.execute(update(StorageNode), path_updates)
+
+    new_ids = new_folder_ids + [row.id for row in created_files]
+
+    # Compartilhamentos herdados (só quando a herança não é implícita pelo path)
+    if new_ids and not settings.implicit_share_inheritance:
+        anchor_by_parent = {folder_ids[f]: anchors[f] for f in folder_ids}
+        node_anchor = {folder_ids[f]: anchors[f[:-1]] for f in folder_ids if folder_ids[f] in new_folder_set}
+        node_anchor.update({row.id: anchor_by_parent[row.parent_id] for row in created_files})
+        anchor_ids = {a for a in node_anchor.values() if a is not None}
+        if anchor_ids:
+            shares_by_anchor = {}
+            for share in db.query(Share).filter(Share.node_id.in_(anchor_ids)):
+                shares_by_anchor.setdefault(share.node_id, []).append(share)
+            share_rows = [
+                {
+                    "node_id": node_id,
+                    "shared_with_user_id": share.shared_with_user_id,
+                    "shared_by_user_id": share.shared_by_user_id,
+                    "type_user_sender": share.type_user_sender,
+                    "type_user_receiver": share.type_user_receiver,
+                }
+                for node_id, anchor in node_anchor.items()
+                for share in shares_by_anchor.get(anchor, [])
+            ]
+            if share_rows:
+                db.execute(insert(Share), share_rows)
+
+    # Contadores de uso da empresa (mesma transação)
+    if new_ids:
+        track_nodes_usage(db, StorageNode.id.in_(new_ids))
+
+    # Dono segue os arquivos criados (um INSERT ... SELECT)
+    if created_files:
+        from app.crud.document_notification import seguir_como_dono
+        seguir_como_dono(db, [row.id for row in created_files], commit=False)
+
+    # LOG: Criação (um INSERT em lote)
+    if new_ids and business_id is not None and type_user:
+        created = [(folder_ids[f], f[-1], "folder") for f in folder_ids if folder_ids[f] in new_folder_set]
+        created += [(row.id, row.name, "file") for row in created_files]
+        db.execute(insert(DocumentLog), [
+            {
+                "node_id": node_id,
+                "action": DocumentAction.CREATED,
+                "user_id": business_id,
+                "user_type": type_user,
+                "details": {"name": name, "type": node_type, "batch": True},
+            }
+            for node_id, name, node_type in created
+        ])
+
+    db.commit()
+    delete_blob_objects(duplicate_keys)
+
+    def load(ids):
+        if not ids:
+            return []
+        return db.query(StorageNode).filter(StorageNode.id.in_(ids)).order_by(StorageNode.id).all()
+
+    return {"files": load([row.id for row in created_files]), "folders": load(new_folder_ids)}
+
 def get_node(db: Session, node_id: int) -> StorageNode:
     node = db.query(StorageNode).filter(StorageNode.id == node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node não encontrado")
     return node
 
+CHILDREN_ORDER_BY = (StorageNode.type.desc(), StorageNode.name.asc(), StorageNode.id.asc())
+MAX_PAGE_SIZE = 1000
+
+
+def order_children_query(db: Session, query, search_term: Optional[str] = None):
+    """
+    Aplica a ordenação da listagem: relevância da busca FULLTEXT primeiro (se houver),
+    depois a padrão (type desc, name asc, id).
+    """
+    relevance = search_relevance(db, search_term)
+    if relevance is None:
+        return query.order_by(*CHILDREN_ORDER_BY)
+    # MATCH() não é adaptado para a subquery do UNION: reaplica sobre os IDs visíveis
+    visible_ids = query.with_entities(StorageNode.id).scalar_subquery()
+    return db.query(StorageNode).filter(
+        StorageNode.id.in_(visible_ids)
+    ).order_by(relevance.desc(), *CHILDREN_ORDER_BY)
+
+
+def encode_node_cursor(node: StorageNode) -> str:
+    """Cursor opaco com a chave de ordenação (type, name, id) do último item da página"""
+    node_type = node.type.value if hasattr(node.type, "value") else str(node.type)
+    raw = json.dumps([node_type, node.name, node.id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_node_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        node_type, name, node_id = json.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+        return node_type, name, int(node_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+
+def _after_cursor_filter(cursor: str):
+    """
+    Keyset: itens estritamente depois do cursor na ordem (type desc, name asc, id asc).
+    Usa apenas comparações na chave de ordenação, então a página N custa o mesmo que a 1.
+    """
+    return _after_key_filter(*decode_node_cursor(cursor))
+
+
+def _after_key_filter(node_type: str, name: str, node_id: int):
+    return or_(
+        StorageNode.type < node_type,
+        (StorageNode.type == node_type) & (StorageNode.name > name),
+        (StorageNode.type == node_type) & (StorageNode.name == name) & (StorageNode.id > node_id)
+    )
+
+
+def iter_children_batches(db: Session, query, search_term: Optional[str] = None, batch_size: int = 500) -> Iterator[List[StorageNode]]:
+    """
+    Percorre a listagem (query de build_children_query, sem ordenação) em lotes
+    de batch_size, cada lote com uma consulta própria.
+    
+    O driver (mysqlconnector) não tem cursor do lado do servidor: yield_per traria
+    o resultado inteiro para o cliente no execute. Aqui a memória fica em um lote:
+    - ordem padrão: keyset em (type, name, id), como list_children_page;
+    - busca (ordem por relevância, sem chave estável): ver iter_ordered_batches.
+    """
+    if search_relevance(db, search_term) is not None:
+        yield from iter_ordered_batches(db, order_children_query(db, query, search_term), batch_size)
+        return
+    
+    last_key = None
+    while True:
+        page = query if last_key is None else query.filter(_after_key_filter(*last_key))
+        rows = page.order_by(*CHILDREN_ORDER_BY).limit(batch_size).all()
+        if not rows:
+            return
+        last = rows[-1]
+        last_key = (last.type.value if hasattr(last.type, "value") else str(last.type), last.name, last.id)
+        yield rows
+        if len(rows) < batch_size:
+            return
+
+
+def iter_ordered_batches(db: Session, ordered_query, batch_size: int = 500) -> Iterator[List[StorageNode]]:
+    """
+    Lotes de uma query de StorageNode já ordenada, sem chave de keyset: lê só os
+    IDs na ordem da query (uma coluna) e carrega os nodes em lotes por ID.
+    """
+    ordered_ids = [node_id for (node_id,) in ordered_query.with_entities(StorageNode.id)]
+    for start in range(0, len(ordered_ids), batch_size):
+        chunk = ordered_ids[start:start + batch_size]
+        by_id = {node.id: node for node in db.query(StorageNode).filter(StorageNode.id.in_(chunk))}
+        yield [by_id[node_id] for node_id in chunk if node_id in by_id]
+
+
 def list_children(
     db: Session, 
     parent_id: Optional[int], 
@@ -100,7 +591,110 @@ def list_children(
     **kwargs
 ) -> List[StorageNode]:
     """
-    Lista arquivos que o usuário pode ver.
+    Lista arquivos que o usuário pode ver (lista completa, sem paginação).
+    Veja build_children_query para as regras de visibilidade.
+    Com search_term, os resultados vêm ordenados por relevância.
+    """
+    query = build_children_query(db, parent_id, user_id, user_type, company_id, **kwargs)
+    if query is None:
+        return []
+    return order_children_query(db, query, kwargs.get('search_term')).all()
+
+
+def list_children_page(
+    db: Session,
+    parent_id: Optional[int],
+    user_id: int,
+    user_type: str,
+    company_id: Optional[int] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    **kwargs
+) -> dict:
+    """
+    Página de list_children com paginação por cursor (keyset).
+    Sempre na ordem (type desc, name asc, id), mesmo com busca: a relevância
+    não é estável entre páginas para servir de chave do cursor.
+    
+    OTIMIZADO: busca limit + 1 linhas a partir do cursor (sem OFFSET), apenas
+    para saber se existe próxima página. O total é opcional (COUNT separado).
+    
+    Returns:
+        {"items": [...], "next_cursor": str | None, "total": int | None}
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = build_children_query(db, parent_id, user_id, user_type, company_id, **kwargs)
+    if query is None:
+        return {"items": [], "next_cursor": None, "total": 0 if include_total else None}
+    
+    total = query.order_by(None).count() if include_total else None
+    
+    if cursor:
+        query = query.filter(_after_cursor_filter(cursor))
+    items = query.order_by(*CHILDREN_ORDER_BY).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_node_cursor(items[-1])
+    
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+def _permission_granted(permissions, name: str) -> bool:
+    """Permissões de link/colaborador podem vir como dict, lista ou JSON em string"""
+    if isinstance(permissions, str):
+        permissions = json.loads(permissions or "{}")
+    if isinstance(permissions, list):
+        return name in permissions
+    return bool((permissions or {}).get(name))
+
+
+def user_can_view_node(db: Session, node: StorageNode, user_id: int, user_type: str) -> bool:
+    """
+    Verifica se o usuário pode ver o node (e, por consequência, a subárvore):
+    dono, dono da empresa, compartilhamento no node ou em uma pasta ancestral,
+    ou vínculo/colaborador da empresa com manage_files/view_only.
+    """
+    if node.business_id == user_id and node.type_user == user_type:
+        return True
+    if node.company_id and node.company_id == user_id and node.company_type == user_type:
+        return True
+
+    from app.crud.share import find_share_access
+    if find_share_access(db, node, user_id, user_type):
+        return True
+
+    if not node.company_id:
+        return False
+    link = db.query(UserBusinessLink).filter(
+        UserBusinessLink.user_id == user_id,
+        UserBusinessLink.type_user == user_type,
+        UserBusinessLink.business_id == node.company_id,
+        UserBusinessLink.status == 1
+    ).first()
+    permissions = link.permissions if link else None
+    if not link and user_type == 'collaborator':
+        collaborator = db.query(CompanyCollaborator).filter(
+            CompanyCollaborator.id == user_id,
+            CompanyCollaborator.company_id == node.company_id
+        ).first()
+        permissions = collaborator.permissions if collaborator else None
+    return _permission_granted(permissions, 'manage_files') or _permission_granted(permissions, 'view_only')
+
+
+def build_children_query(
+    db: Session, 
+    parent_id: Optional[int], 
+    user_id: int,
+    user_type: str,
+    company_id: Optional[int] = None,
+    **kwargs
+):
+    """
+    Monta a query (sem ordenação) dos arquivos que o usuário pode ver.
+    Retorna None quando o usuário não tem acesso a nada.
     
     OTIMIZADO v2 (Critical Performance fix):
     - Se parent_id for fornecido, verifica acesso à PASTA PAI primeiro.
@@ -110,6 +704,7 @@ def list_children(
     
     FILTROS V3:
     - filtering (status, type, search) applied server-side.
+    - search usa o índice FULLTEXT (name, comments) com prefixo.
     """
     
     # --- Helper para aplicar filtros comuns ---
@@ -125,11 +720,8 @@ def list_children(
                 base_query = base_query.filter(StorageNode.type == file_type)
         
         if search_term:
-            term = f"%{search_term}%"
-            base_query = base_query.filter(or_(
-                StorageNode.name.ilike(term),
-                StorageNode.comments.ilike(term)
-            ))
+            # FULLTEXT com prefixo no MySQL (fallback ILIKE), ver app/crud/search.py
+            base_query = base_query.filter(search_filter(db, search_term))
         return base_query
     # ------------------------------------------
 
@@ -147,7 +739,7 @@ def list_children(
         ).first()
         
         if not parent:
-            return [] # Pasta não existe ou deletada
+            return None # Pasta não existe ou deletada
             
         has_access = False
         
@@ -155,14 +747,10 @@ def list_children(
         if parent.business_id == user_id and parent.type_user == user_type:
             has_access = True
         
-        # Check 2: Compartilhada (se não for dono)
+        # Check 2: Compartilhada diretamente ou por alguma pasta ancestral (se não for dono)
         if not has_access:
-            share_exists = db.query(Share.id).filter(
-                Share.node_id == parent_id,
-                Share.shared_with_user_id == user_id,
-                Share.type_user_receiver == user_type
-            ).first()
-            if share_exists:
+            from app.crud.share import find_share_access
+            if find_share_access(db, parent, user_id, user_type):
                 has_access = True
                 
         if has_access:
@@ -176,7 +764,7 @@ def list_children(
             # Aplicar filtros
             query = apply_filters(query, kwargs.get('status'), kwargs.get('file_type'), kwargs.get('search_term'))
             
-            return query.order_by(StorageNode.type.desc(), StorageNode.name.asc()).all()
+            return query
     
     # ESTRATÉGIA 2: Listagem RAIZ ou Fallback (Complexa)
     # Se estamos na raiz (parent_id is None) OU (teoricamente) se não tiver acesso à pasta pai mas tiver a filhos soltos (raro em estrutura de pasta, mas possível)
@@ -254,7 +842,7 @@ def list_children(
                 pass 
             else:
                 # Sem permissão de visualização
-                return [] 
+                return None
 
         else:
              # Se enviou company_id mas não tem acesso, ignora (ou poderia dar erro 403)
@@ -316,13 +904,22 @@ def list_children(
     # Ou arquivos compartilhados NO GERAL?
     # Vamos manter a lógica padrão: Mostra o que foi compartilhado COM O USUÁRIO LOGADO.
     
-    q_shared = db.query(StorageNode).join(
-        Share, StorageNode.id == Share.node_id
-    ).filter(
-        StorageNode.deleted_at.is_(None),
-        Share.shared_with_user_id == user_id,
-        Share.type_user_receiver == user_type
-    )
+    # Na raiz sem busca bastam os nós compartilhados explicitamente; na busca global
+    # entram também os descendentes das pastas compartilhadas (herança pelo path)
+    if parent_id is None and flatten_results:
+        roots = shared_roots(db, user_id, user_type)
+        q_shared = db.query(StorageNode).filter(
+            StorageNode.deleted_at.is_(None),
+            subtrees_filter([path for _, path in roots])
+        )
+    else:
+        q_shared = db.query(StorageNode).join(
+            Share, StorageNode.id == Share.node_id
+        ).filter(
+            StorageNode.deleted_at.is_(None),
+            Share.shared_with_user_id == user_id,
+            Share.type_user_receiver == user_type
+        )
     
     if is_project_view:
         # Se estou no projeto, talvez queira ver APENAS compartilhados que pertencem a esse projeto?
@@ -332,22 +929,36 @@ def list_children(
     if parent_id is not None:
          q_shared = q_shared.filter(StorageNode.parent_id == parent_id)
     elif not flatten_results:
-        parent_shared_subquery = db.query(Share.node_id).filter(
-            Share.shared_with_user_id == user_id,
-            Share.type_user_receiver == user_type
-        )
-        q_shared = q_shared.filter(
-            StorageNode.parent_id.notin_(parent_shared_subquery)
-        )
+        # Só mostra na raiz se nenhuma pasta ancestral também estiver compartilhada
+        # (resolvido em memória sobre os nós compartilhados, poucos por usuário)
+        roots = shared_roots(db, user_id, user_type)
+        nested_ids = [
+            node_id for node_id, path in roots
+            if any(other_id != node_id and path.startswith(other_path) for other_id, other_path in roots)
+        ]
+        if nested_ids:
+            q_shared = q_shared.filter(StorageNode.id.notin_(nested_ids))
         
     q_shared = apply_filters(q_shared, kwargs.get('status'), kwargs.get('file_type'), kwargs.get('search_term'))
     
     # Unir e Executar
-    final_query = q_main.union(q_shared)
-    return final_query.order_by(StorageNode.type.desc(), StorageNode.name.asc()).all()
+    return q_main.union(q_shared)
 
 
-def update_node(db: Session, node_id: int, data: StorageUpdate, user_id: int = None, type_user: str = None) -> StorageNode:
+def update_node(
+    db: Session,
+    node_id: int,
+    data: StorageUpdate,
+    user_id: int = None,
+    type_user: str = None,
+    content_hash: Optional[str] = None,
+    reused_blob: bool = False
+) -> StorageNode:
+    """
+    Atualiza um node. content_hash/reused_blob acompanham uma nova versão enviada
+    com deduplicação (a referência ao blob anterior é liberada; o objeto continua
+    no histórico de versões até a coleta de órfãos, ver crud.storage_blob).
+    """
     node = get_node(db, node_id)
     
     # 1. Capturar estado anterior para log detalhado
@@ -364,11 +975,40 @@ def update_node(db: Session, node_id: int, data: StorageUpdate, user_id: int = N
     
     # 2. Atualizar campos
     update_dict = data.dict(exclude_unset=True)
+    new_parent_id = update_dict.pop("parent_id", node.parent_id)
+    # Mudança de pai validada antes de alterar qualquer campo (destino e ciclos, como move_node)
+    if new_parent_id != node.parent_id:
+        _set_node_parent(db, node, new_parent_id)
+    if "size" in update_dict and update_dict.get("size_bytes") is None:
+        update_dict["size_bytes"] = parse_size_to_bytes(update_dict["size"]) if update_dict["size"] else None
+    
+    # Nova versão / mudança de extensão ou status: trocar a contribuição do node nos contadores
+    # (somada de volta depois de trocar o content_hash, que entra no uso físico)
+    affects_usage = bool({"size_bytes", "extension", "status", "url"} & update_dict.keys())
+    if affects_usage:
+        track_node_usage(db, node, sign=-1)
     for k, v in update_dict.items():
         setattr(node, k, v)
     
+    duplicate_keys = []
+    if "url" in update_dict:
+        # Nova versão: sem hash o arquivo volta a ter objeto próprio
+        old_hash = node.content_hash
+        node.content_hash = None
+        if content_hash and node.url:
+            duplicate_keys = _reference_node_blob(db, node, content_hash, reused_blob)
+        if old_hash:
+            # Referência nova antes de soltar a antiga (mesmo conteúdo reenviado).
+            # O objeto da versão anterior não é apagado aqui: segue no log
+            # version_uploaded e a coleta de órfãos respeita a retenção de versões.
+            release_blob_refs(db, {old_hash: 1})
+    
+    if affects_usage:
+        track_node_usage(db, node)
+    
     db.commit()
     db.refresh(node)
+    delete_blob_objects(duplicate_keys)
     
     # 3. LOG: Detecção Inteligente de Mudanças
     if user_id and type_user:
@@ -434,23 +1074,7 @@ def update_node(db: Session, node_id: int, data: StorageUpdate, user_id: int = N
                     details["changes"] = changes
                 
             
-            # Buscar nome do usuário se não passado
-            from app.models.user import UserPF, UserPJ, UserFreelancer
-            from app.models.collaborator import CompanyCollaborator
-            
-            final_user_name = None
-            if type_user == 'pf':
-                u = db.query(UserPF).filter(UserPF.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'pj':
-                u = db.query(UserPJ).filter(UserPJ.id == user_id).first()
-                if u: final_user_name = u.razao_social
-            elif type_user == 'freelancer':
-                u = db.query(UserFreelancer).filter(UserFreelancer.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'collaborator':
-                u = db.query(CompanyCollaborator).filter(CompanyCollaborator.id == user_id).first()
-                if u: final_user_name = u.name
+            final_user_name = resolve_name(db, user_id, type_user)
 
             # Só cria log se houve alguma mudança relevante ou se é edit genérico
             # No caso, update_node sempre altera algo se veio no dict.
@@ -486,27 +1110,9 @@ def move_node(db: Session, node_id: int, new_parent_id: Optional[int], user_id:
     # Validar que o node existe
     node = get_node(db, node_id)
     
-    # Validar que não está tentando mover para si mesmo
-    if node_id == new_parent_id:
-        raise HTTPException(status_code=400, detail="Não é possível mover um item para dentro dele mesmo")
-    
-    # Se new_parent_id não for None, validar que o destino existe e é uma pasta
-    if new_parent_id is not None:
-        parent_node = get_node(db, new_parent_id)
-        if parent_node.type != NodeType.folder:
-            raise HTTPException(status_code=400, detail="O destino deve ser uma pasta")
-        
-        # Validar que não está criando um ciclo (mover pasta para dentro de si mesma)
-        if node.type == NodeType.folder:
-            if _is_descendant(db, node_id, new_parent_id):
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Não é possível mover uma pasta para dentro dela mesma ou de suas subpastas"
-                )
-    
-    # Mover o node
+    # Mover o node (e reescrever o path de toda a subárvore); destino validado em _set_node_parent
     old_parent_id = node.parent_id
-    node.parent_id = new_parent_id
+    _set_node_parent(db, node, new_parent_id)
     db.commit()
     db.refresh(node)
     
@@ -524,24 +1130,7 @@ def move_node(db: Session, node_id: int, new_parent_id: Optional[int], user_id:
                 new_p = db.query(StorageNode).filter(StorageNode.id == new_parent_id).first()
                 if new_p: new_folder_name = new_p.name
 
-            # Buscar nome do usuário se não passado
-            # Importar os models de usuário necessários para buscar nome
-            from app.models.user import UserPF, UserPJ, UserFreelancer
-            from app.models.collaborator import CompanyCollaborator
-            
-            final_user_name = None
-            if type_user == 'pf':
-                u = db.query(UserPF).filter(UserPF.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'pj':
-                u = db.query(UserPJ).filter(UserPJ.id == user_id).first()
-                if u: final_user_name = u.razao_social
-            elif type_user == 'freelancer':
-                u = db.query(UserFreelancer).filter(UserFreelancer.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'collaborator':
-                u = db.query(CompanyCollaborator).filter(CompanyCollaborator.id == user_id).first()
-                if u: final_user_name = u.name
+            final_user_name = resolve_name(db, user_id, type_user)
 
             criar_log_documento(
                 db=db,
@@ -562,44 +1151,46 @@ def move_node(db: Session, node_id: int, new_parent_id: Optional[int], user_id:
             
     return node
 
-def _is_descendant(db: Session, ancestor_id: int, potential_descendant_id: int) -> bool:
+def _is_descendant(db: Session, ancestor_id: int, potential_descendant_id: int, potential_descendant: Optional[StorageNode] = None) -> bool:
     """
     Verifica se potential_descendant_id é descendente de ancestor_id
     Usado para prevenir ciclos ao mover pastas
+
+    Usa o path materializado: no máximo uma query (nenhuma se o node já foi carregado)
     """
-    current = db.query(StorageNode).filter(StorageNode.id == potential_descendant_id).first()
-    
-    while current and current.parent_id is not None:
-        if current.parent_id == ancestor_id:
-            return True
-        current = db.query(StorageNode).filter(StorageNode.id == current.parent_id).first()
-    
-    return False
+    current = potential_descendant
+    if current is None:
+        current = db.query(StorageNode).filter(StorageNode.id == potential_descendant_id).first()
+
+    if not current:
+        return False
+
+    return ancestor_id in get_ancestor_ids(current)
 
 def delete_node(db: Session, node_id: int):
     node = get_node(db, node_id)
-    # Se for pasta, deletar recursivamente filhos
+    track_nodes_usage(db, descendants_filter(node, include_self=True) & StorageNode.deleted_at.is_(None), sign=-1)
+    # Se for pasta, deletar a subárvore inteira de uma vez
     if node.type == NodeType.folder:
-        _delete_children(db, node.id)
+        _delete_children(db, node)
     db.delete(node)
     db.commit()
     return {"message": "Node deletado"}
 
-def _delete_children(db: Session, parent_id: int):
-    children = db.query(StorageNode).filter(StorageNode.parent_id == parent_id).all()
-    for c in children:
-        if c.type == NodeType.folder:
-            _delete_children(db, c.id)
-        db.delete(c)
+def _delete_children(db: Session, parent: StorageNode):
+    subtree = descendants_filter(parent)
+    # Desfaz a auto-referência antes do DELETE em massa (evita violar a FK parent_id)
+    db.query(StorageNode).filter(subtree).update({StorageNode.parent_id: None}, synchronize_session=False)
+    db.query(StorageNode).filter(subtree).delete(synchronize_session=False)
 
-def get_documents_by_business_and_status(
+def documents_by_business_and_status_query(
     db: Session, 
     user_email: str, 
     business_email: str, 
     status: str
-) -> List[StorageNode]:
+):
     """
-    Busca documentos de uma empresa específica baseado nas permissões do usuário e status
+    Query dos documentos de uma empresa específica baseado nas permissões do usuário e status
     
     Args:
         db: Sessão do banco de dados
@@ -608,17 +1199,15 @@ def get_documents_by_business_and_status(
         status: Status dos documentos a serem buscados
         
     Returns:
-        Lista de documentos que o usuário tem permissão para ver
+        Query (não executada) dos documentos que o usuário tem permissão para ver
     """
     from app.crud.user_business_link import get_user_info_by_email
     from app.crud.permission import get_user_permissions_by_email
-    from app.models.share import Share
     
     # Busca informações do usuário e da empresa
     user_info = get_user_info_by_email(db, user_email)
     business_info = get_user_info_by_email(db, business_email)
     
-    user_id = user_info["user_id"]
     business_id = business_info["user_id"]
     
     # Verifica se o usuário tem permissões na empresa
@@ -636,48 +1225,40 @@ def get_documents_by_business_and_status(
             detail="Usuário não tem permissão para acessar documentos desta empresa"
         )
     
-    # Busca documentos da empresa com o status especificado
-    documents = []
-    
-    # 1. Busca todos os arquivos da empresa com o status
-    business_files = db.query(StorageNode).filter(
-        StorageNode.business_id == business_id,
-        StorageNode.type == NodeType.file,
-        StorageNode.status == status,
-        StorageNode.deleted_at.is_(None)  # Não mostrar deletados
-    ).all()
-    
-    # 2. Busca arquivos compartilhados com o usuário (da empresa específica)
-    shared_nodes = db.query(StorageNode).join(
-        Share, StorageNode.id == Share.node_id
-    ).filter(
-        Share.shared_with_user_id == user_id,
+    # Todos os arquivos da empresa com o status (os compartilhados com o
+    # usuário dessa mesma empresa já estão contidos aqui)
+    return db.query(StorageNode).filter(
         StorageNode.business_id == business_id,
         StorageNode.type == NodeType.file,
         StorageNode.status == status,
         StorageNode.deleted_at.is_(None)  # Não mostrar deletados
-    ).all()
-    
-    # Combina os resultados (remove duplicatas)
-    all_documents = business_files + shared_nodes
-    unique_documents = []
-    seen_ids = set()
-    
-    for doc in all_documents:
-        if doc.id not in seen_ids:
-            unique_documents.append(doc)
-            seen_ids.add(doc.id)
+    ).order_by(StorageNode.id)
+
+def get_documents_by_business_and_status(
+    db: Session, 
+    user_email: str, 
+    business_email: str, 
+    status: str
+) -> List[StorageNode]:
+    """
+    Busca documentos de uma empresa específica baseado nas permissões do usuário e status
     
-    return unique_documents
+    Returns:
+        Lista de documentos que o usuário tem permissão para ver
+    """
+    return documents_by_business_and_status_query(db, user_email, business_email, status).all()
 
-def get_user_accessible_documents_by_status(
+def user_accessible_documents_query(
     db: Session,
     user_email: str,
     status: str,
     business_id: Optional[int] = None
-) -> List[StorageNode]:
+):
     """
-    Busca todos os documentos que o usuário tem acesso, filtrado por status
+    Query de todos os documentos que o usuário tem acesso, filtrado por status
+    
+    OTIMIZADO: uma única query (empresas com permissão ativa OU compartilhados,
+    diretamente ou por pasta ancestral) ao invés de uma query por empresa + dedup em Python.
     
     Args:
         db: Sessão do banco de dados
@@ -686,45 +1267,29 @@ def get_user_accessible_documents_by_status(
         business_id: ID específico da empresa (opcional)
         
     Returns:
-        Lista de todos os documentos acessíveis ao usuário
+        Query (não executada) de todos os documentos acessíveis ao usuário
     """
     from app.crud.user_business_link import get_user_info_by_email
     from app.crud.permission import get_user_permissions_by_email
-    from app.models.share import Share
     
     # Busca informações do usuário
     user_info = get_user_info_by_email(db, user_email)
     user_id = user_info["user_id"]
     
-    # Busca permissões do usuário
+    # Empresas em que o usuário tem permissão ativa
     user_permissions = get_user_permissions_by_email(db, user_email)
-    
-    documents = []
-    
-    # Para cada empresa que o usuário tem permissão
-    for perm in user_permissions["permissions"]:
-        if not perm["is_active"]:
-            continue
-            
-        # Se business_id foi especificado, filtra apenas essa empresa
-        if business_id and perm["business_id"] != business_id:
-            continue
-        
-        # Busca documentos da empresa com o status
-        business_docs = db.query(StorageNode).filter(
-            StorageNode.business_id == perm["business_id"],
-            StorageNode.type == NodeType.file,
-            StorageNode.status == status,
-            StorageNode.deleted_at.is_(None)  # Não mostrar deletados
-        ).all()
-        
-        documents.extend(business_docs)
-    
-    # Também busca documentos compartilhados diretamente com o usuário
-    shared_docs = db.query(StorageNode).join(
-        Share, StorageNode.id == Share.node_id
-    ).filter(
-        Share.shared_with_user_id == user_id,
+    business_ids = [
+        perm["business_id"] for perm in user_permissions["permissions"]
+        if perm["is_active"] and (not business_id or perm["business_id"] == business_id)
+    ]
+    
+    # Documentos compartilhados com o usuário (no próprio nó ou em pasta ancestral)
+    visible = subtrees_filter([path for _, path in shared_roots(db, user_id)])
+    if business_ids:
+        visible = or_(StorageNode.business_id.in_(business_ids), visible)
+    
+    query = db.query(StorageNode).filter(
+        visible,
         StorageNode.type == NodeType.file,
         StorageNode.status == status,
         StorageNode.deleted_at.is_(None)  # Não mostrar deletados
@@ -732,21 +1297,23 @@ def get_user_accessible_documents_by_status(
     
     # Se business_id especificado, filtra compartilhados também
     if business_id:
-        shared_docs = shared_docs.filter(StorageNode.business_id == business_id)
-    
-    shared_docs = shared_docs.all()
-    documents.extend(shared_docs)
-    
-    # Remove duplicatas
-    unique_documents = []
-    seen_ids = set()
+        query = query.filter(StorageNode.business_id == business_id)
     
-    for doc in documents:
-        if doc.id not in seen_ids:
-            unique_documents.append(doc)
-            seen_ids.add(doc.id)
+    return query.order_by(StorageNode.id)
+
+def get_user_accessible_documents_by_status(
+    db: Session,
+    user_email: str,
+    status: str,
+    business_id: Optional[int] = None
+) -> List[StorageNode]:
+    """
+    Busca todos os documentos que o usuário tem acesso, filtrado por status
     
-    return unique_documents
+    Returns:
+        Lista de todos os documentos acessíveis ao usuário
+    """
+    return user_accessible_documents_query(db, user_email, status, business_id).all()
 
 
 # ==========================================
@@ -756,76 +1323,62 @@ def get_user_accessible_documents_by_status(
 def soft_delete_node(db: Session, node_id: int, user_id: int, type_user: str):
     """
     Move um node (arquivo ou pasta) para a lixeira (soft delete)
-    Se for pasta, move recursivamente todos os filhos
+    Se for pasta, move a subárvore inteira com um único UPDATE
+    
+    Returns:
+        Dict com o node raiz e o total de itens enviados para a lixeira
     """
     from datetime import datetime
     
     node = get_node(db, node_id)
+    deleted_at = datetime.now()
+    
+    # Subtrair dos contadores tudo que ainda está ativo na subárvore (antes de marcar)
+    track_nodes_usage(db, descendants_filter(node, include_self=True) & StorageNode.deleted_at.is_(None), sign=-1)
     
     # Marcar como deletado
-    node.deleted_at = datetime.now()
+    node.deleted_at = deleted_at
     node.deleted_by_id = user_id
     node.deleted_by_type = type_user
     
-    # Se for pasta, deletar recursivamente filhos
+    # Se for pasta, marcar todos os descendentes de uma vez
+    total_children = 0
     if node.type == NodeType.folder:
-        _soft_delete_children(db, node.id, user_id, type_user)
+        total_children = _soft_delete_children(db, node, user_id, type_user, deleted_at)
     
     db.commit()
     db.refresh(node)
     
     # LOG: Deleção (Lixeira)
     try:
-            # Buscar nome do usuário
-            from app.models.user import UserPF, UserPJ, UserFreelancer
-            from app.models.collaborator import CompanyCollaborator
-            
-            final_user_name = None
-            if type_user == 'pf':
-                u = db.query(UserPF).filter(UserPF.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'pj':
-                u = db.query(UserPJ).filter(UserPJ.id == user_id).first()
-                if u: final_user_name = u.razao_social
-            elif type_user == 'freelancer':
-                u = db.query(UserFreelancer).filter(UserFreelancer.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'collaborator':
-                u = db.query(CompanyCollaborator).filter(CompanyCollaborator.id == user_id).first()
-                if u: final_user_name = u.name
+            final_user_name = resolve_name(db, user_id, type_user)
 
+            # Um único log para a raiz (não um por filho)
             criar_log_documento(
                 db=db,
                 node_id=node.id,
                 action=DocumentAction.DELETED,
                 user_id=user_id,
                 user_type=type_user,
-                user_name=final_user_name
+                user_name=final_user_name,
+                details={"total_itens": total_children + 1}
             )
     except Exception as e:
         print(f"Erro ao criar log de delete: {e}")
         
-    return node
+    return {"node": node, "total_itens": total_children + 1}
 
 
-def _soft_delete_children(db: Session, parent_id: int, user_id: int, type_user: str):
-    """Marca recursivamente todos os filhos como deletados"""
-    from datetime import datetime
-    
-    children = db.query(StorageNode).filter(
-        StorageNode.parent_id == parent_id,
+def _soft_delete_children(db: Session, parent: StorageNode, user_id: int, type_user: str, deleted_at) -> int:
+    """Marca todos os descendentes ainda ativos como deletados (UPDATE em massa)"""
+    return db.query(StorageNode).filter(
+        descendants_filter(parent),
         StorageNode.deleted_at.is_(None)  # Apenas não deletados
-    ).all()
-    
-    for child in children:
-        child.deleted_at = datetime.now()
-        child.deleted_by_id = user_id
-        child.deleted_by_type = type_user
-        
-        if child.type == NodeType.folder:
-            _soft_delete_children(db, child.id, user_id, type_user)
-    
-    db.commit()
+    ).update({
+        StorageNode.deleted_at: deleted_at,
+        StorageNode.deleted_by_id: user_id,
+        StorageNode.deleted_by_type: type_user
+    }, synchronize_session=False)
 
 
 def list_trash(
@@ -854,7 +1407,10 @@ def list_trash(
 def restore_node(db: Session, node_id: int, restore_to_parent: Optional[int] = None, user_id: int = None, type_user: str = None):
     """
     Restaura um node da lixeira para seu local original (ou novo local)
-    Se for pasta, restaura recursivamente todos os filhos
+    Se for pasta, restaura a subárvore inteira com um único UPDATE
+    
+    Returns:
+        Dict com o node raiz e o total de itens restaurados
     """
     node = db.query(StorageNode).filter(
         StorageNode.id == node_id,
@@ -864,6 +1420,9 @@ def restore_node(db: Session, node_id: int, restore_to_parent: Optional[int] = N
     if not node:
         raise HTTPException(status_code=404, detail="Item não encontrado na lixeira")
     
+    # Somar nos contadores tudo que volta da lixeira (o node e, se pasta, os descendentes deletados)
+    track_nodes_usage(db, descendants_filter(node, include_self=True) & StorageNode.deleted_at.isnot(None), sign=1)
+    
     # Restaurar
     node.deleted_at = None
     node.deleted_by_id = None
@@ -871,11 +1430,12 @@ def restore_node(db: Session, node_id: int, restore_to_parent: Optional[int] = N
     
     # Se especificou novo parent, mover para lá
     if restore_to_parent is not None:
-        node.parent_id = restore_to_parent
+        _set_node_parent(db, node, restore_to_parent)
     
-    # Se for pasta, restaurar recursivamente filhos
+    # Se for pasta, restaurar todos os descendentes de uma vez
+    total_children = 0
     if node.type == NodeType.folder:
-        _restore_children(db, node.id)
+        total_children = _restore_children(db, node)
     
     db.commit()
     db.refresh(node)
@@ -883,22 +1443,7 @@ def restore_node(db: Session, node_id: int, restore_to_parent: Optional[int] = N
     # LOG: Restauração
     if user_id and type_user:
         try:
-            # Buscar nome do usuário
-            from app.models.user import UserPF, UserPJ, UserFreelancer
-            final_user_name = None
-            if type_user == 'pf':
-                u = db.query(UserPF).filter(UserPF.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'pj':
-                u = db.query(UserPJ).filter(UserPJ.id == user_id).first()
-                if u: final_user_name = u.razao_social
-            elif type_user == 'freelancer':
-                u = db.query(UserFreelancer).filter(UserFreelancer.id == user_id).first()
-                if u: final_user_name = u.nome
-            elif type_user == 'collaborator':
-                # Collaborator geralmente é um UserPF vinculado
-                u = db.query(UserPF).filter(UserPF.id == user_id).first()
-                if u: final_user_name = u.nome
+            final_user_name = resolve_name(db, user_id, type_user)
 
             criar_log_documento(
                 db=db,
@@ -906,36 +1451,32 @@ def restore_node(db: Session, node_id: int, restore_to_parent: Optional[int] = N
                 action=DocumentAction.RESTORED,
                 user_id=user_id,
                 user_type=type_user,
-                user_name=final_user_name
+                user_name=final_user_name,
+                details={"total_itens": total_children + 1}
             )
         except Exception as e:
             print(f"Erro ao criar log de restauração: {e}")
 
-    return node
+    return {"node": node, "total_itens": total_children + 1}
 
 
-def _restore_children(db: Session, parent_id: int):
-    """Restaura recursivamente todos os filhos de uma pasta"""
-    children = db.query(StorageNode).filter(
-        StorageNode.parent_id == parent_id,
+def _restore_children(db: Session, parent: StorageNode) -> int:
+    """Restaura todos os descendentes deletados de uma pasta (UPDATE em massa)"""
+    return db.query(StorageNode).filter(
+        descendants_filter(parent),
         StorageNode.deleted_at.isnot(None)
-    ).all()
-    
-    for child in children:
-        child.deleted_at = None
-        child.deleted_by_id = None
-        child.deleted_by_type = None
-        
-        if child.type == NodeType.folder:
-            _restore_children(db, child.id)
-    
-    db.commit()
+    ).update({
+        StorageNode.deleted_at: None,
+        StorageNode.deleted_by_id: None,
+        StorageNode.deleted_by_type: None
+    }, synchronize_session=False)
 
 
-def permanent_delete_node(db: Session, node_id: int):
+def permanent_delete_node(db: Session, node_id: int, user_id: int = None, type_user: str = None):
     """
     Deleta permanentemente um node da lixeira
-    Se for pasta, deleta recursivamente todos os filhos
+    Se for pasta, deleta a subárvore inteira com poucas queries em massa,
+    tudo em uma única transação
     """
     node = db.query(StorageNode).filter(
         StorageNode.id == node_id,
@@ -945,46 +1486,83 @@ def permanent_delete_node(db: Session, node_id: int):
     if not node:
         raise HTTPException(status_code=404, detail="Item não encontrado na lixeira")
     
-    # Se for pasta, deletar recursivamente filhos primeiro
-    if node.type == NodeType.folder:
-        _permanent_delete_children(db, node.id)
+    counts, orphan_keys = _permanent_delete_subtrees(db, [node])
+    
+    # LOG: Um único registro para a raiz, na mesma transação
+    if user_id and type_user:
+        criar_log_documento(
+            db=db,
+            node_id=node.id,
+            action=DocumentAction.PERMANENTLY_DELETED,
+            user_id=user_id,
+            user_type=type_user,
+            details={"name": node.name, "total_itens": counts["total_itens"]},
+            na_transacao=True
+        )
     
-    # Limpar dependências (Cascade manual)
-    _cleanup_node_dependencies(db, node.id)
-
-    db.delete(node)
     db.commit()
-    return {"message": "Node deletado permanentemente"}
+    delete_blob_objects(orphan_keys)
+    return {"message": "Node deletado permanentemente", **counts}
 
 
-def _cleanup_node_dependencies(db: Session, node_id: int):
-    """Remove dependências (Shares, Followers) antes de deletar o node"""
+def _cleanup_node_dependencies(db: Session, node_ids) -> dict:
+    """
+    Remove dependências (Shares, Followers, Notificações) antes de deletar os nodes
+    
+    Args:
+        node_ids: Lista ou subquery com os IDs dos nodes
+    """
     # Importar models aqui para evitar ciclo
     from app.models.share import Share
-    from app.models.document_notification import DocumentFollower
+    from app.models.document_notification import DocumentFollower, DocumentNotification
     
     # Deletar compartilhamentos
-    db.query(Share).filter(Share.node_id == node_id).delete()
+    shares = db.query(Share).filter(Share.node_id.in_(node_ids)).delete(synchronize_session=False)
     
     # Deletar seguidores
-    db.query(DocumentFollower).filter(DocumentFollower.node_id == node_id).delete()
+    followers = db.query(DocumentFollower).filter(DocumentFollower.node_id.in_(node_ids)).delete(synchronize_session=False)
+    
+    # Deletar histórico de notificações (FK para storage_nodes)
+    db.query(DocumentNotification).filter(DocumentNotification.node_id.in_(node_ids)).delete(synchronize_session=False)
+    
+    return {"shares": shares, "followers": followers}
+
 
+# Limite de raízes por statement ao deletar várias subárvores (evita ORs gigantes)
+PERMANENT_DELETE_CHUNK = 500
 
-def _permanent_delete_children(db: Session, parent_id: int):
-    """Deleta permanentemente todos os filhos de uma pasta"""
-    children = db.query(StorageNode).filter(StorageNode.parent_id == parent_id).all()
+
+def _permanent_delete_subtrees(db: Session, roots: List[StorageNode]) -> dict:
+    """
+    Deleta permanentemente as subárvores das raízes informadas.
+    Executa um número fixo de statements por lote de raízes (não um por node).
+    O commit fica a cargo do chamador.
+    
+    Returns:
+        (dict com totais de nodes, compartilhamentos e seguidores removidos,
+         keys de objetos deduplicados sem referência, a apagar do R2 após o commit)
+    """
+    counts = {"total_itens": 0, "shares": 0, "followers": 0}
+    orphan_keys = []
     
-    for child in children:
-        if child.type == NodeType.folder:
-            _permanent_delete_children(db, child.id)
+    for i in range(0, len(roots), PERMANENT_DELETE_CHUNK):
+        chunk = roots[i:i + PERMANENT_DELETE_CHUNK]
+        subtree = or_(*[descendants_filter(root, include_self=True) for root in chunk])
+        subtree_ids = db.query(StorageNode.id).filter(subtree).scalar_subquery()
         
-        # Limpar dependências de cada filho
-        _cleanup_node_dependencies(db, child.id)
-        db.delete(child)
+        # Itens ainda ativos dentro da subárvore saem dos contadores
+        track_nodes_usage(db, subtree & StorageNode.deleted_at.is_(None), sign=-1)
+        orphan_keys += release_blobs(db, subtree)
+        
+        deps = _cleanup_node_dependencies(db, subtree_ids)
+        counts["shares"] += deps["shares"]
+        counts["followers"] += deps["followers"]
+        
+        # Desfaz a auto-referência antes do DELETE em massa (evita violar a FK parent_id)
+        db.query(StorageNode).filter(subtree).update({StorageNode.parent_id: None}, synchronize_session=False)
+        counts["total_itens"] += db.query(StorageNode).filter(subtree).delete(synchronize_session=False)
     
-    # Nota: O commit final é feito pelo chamador (permanent_delete_node)
-    # Mas se for chamado recursivamente, tudo bem.
-
+    return counts, orphan_keys
 
 
 def empty_trash(
@@ -1014,13 +1592,13 @@ def empty_trash(
         query = query.filter(StorageNode.deleted_at < cutoff_date)
     
     items = query.all()
-    deleted_count = 0
     
-    for item in items:
-        if item.type == NodeType.folder:
-            _permanent_delete_children(db, item.id)
-        db.delete(item)
-        deleted_count += 1
+    # Ignorar itens que já estão dentro de outra subárvore selecionada
+    selected_ids = {item.id for item in items}
+    roots = [item for item in items if not set(get_ancestor_ids(item)) & selected_ids]
+    
+    counts, orphan_keys = _permanent_delete_subtrees(db, roots)
     
     db.commit()
-    return {"message": f"{deleted_count} itens deletados permanentemente"}
+    delete_blob_objects(orphan_keys)
+    return {"message": f"{counts['total_itens']} itens deletados permanentemente", **counts}
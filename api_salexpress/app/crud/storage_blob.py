@@ -0,0 +1,159 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.storage import StorageNode
+from app.models.storage_blob import StorageBlob
+
+
+# ==========================================
+# DEDUPLICAÇÃO POR CONTEÚDO (SHA-256)
+# ==========================================
+#
+# Com settings.storage_dedup_enabled, arquivos de conteúdo idêntico apontam para
+# um único objeto no R2. storage_blobs guarda hash -> key e quantos nodes o
+# referenciam; o objeto só sai do R2 quando a contagem chega a zero.
+# Assim como os contadores de uso, as referências mudam na MESMA transação da
+# operação nos nodes (commit a cargo do chamador) e os objetos só são apagados
+# do R2 depois do commit (delete_blob_objects).
+#
+# Trocar o conteúdo de um node (nova versão) libera a referência ao blob
+# anterior, mas o objeto não é apagado na hora: a versão antiga continua no
+# histórico (details.old_version dos logs version_uploaded) e fica protegida
+# pela coleta de órfãos do R2 durante r2_gc_version_retention_days.
+
+BlobRef = Tuple[str, str, Optional[int], bool]  # (content_hash, key, size_bytes, reaproveitado)
+
+
+def find_blob(db: Session, content_hash: str) -> Optional[StorageBlob]:
+    return db.query(StorageBlob).filter(StorageBlob.content_hash == content_hash).first()
+
+
+def find_blobs(db: Session, content_hashes: Iterable[str]) -> Dict[str, str]:
+    """{content_hash: key} dos blobs existentes, com uma única query"""
+    content_hashes = list(content_hashes)
+    if not content_hashes:
+        return {}
+    return dict(
+        db.query(StorageBlob.content_hash, StorageBlob.key).filter(StorageBlob.content_hash.in_(content_hashes))
+    )
+
+
+def _locked_blob(db: Session, content_hash: str) -> Optional[StorageBlob]:
+    return db.query(StorageBlob).filter(StorageBlob.content_hash == content_hash).with_for_update().first()
+
+
+def acquire_blobs(db: Session, refs: Iterable[BlobRef]) -> Dict[str, str]:
+    """
+    Soma uma referência por node aos blobs, criando os que ainda não existem.
+    
+    Args:
+        refs: um (content_hash, key, size_bytes, reaproveitado) por node; reaproveitado=True
+              quando o upload foi pulado porque o blob já existia (key = key do blob)
+    
+    Returns:
+        {key enviada: key canônica} das keys que precisam ser trocadas nos nodes:
+        outro upload do mesmo conteúdo criou o blob antes (upload concorrente ou
+        arquivos repetidos no mesmo lote). O objeto enviado fica sobrando e deve
+        ser apagado pelo chamador depois do commit (delete_blob_objects).
+    
+    Raises:
+        HTTPException 409: o blob reaproveitado foi removido nesse meio tempo
+    """
+    by_hash = {}
+    for content_hash, key, size_bytes, reused in refs:
+        entry = by_hash.setdefault(content_hash, {"keys": [], "uploaded": [], "size": size_bytes or 0})
+        entry["keys"].append(key)
+        if not reused:
+            entry["uploaded"].append(key)
+    
+    moved = {}
+    # Ordem fixa dos locks: lotes concorrentes não entram em deadlock
+    for content_hash in sorted(by_hash):
+        entry = by_hash[content_hash]
+        count = len(entry["keys"])
+        blob = _locked_blob(db, content_hash)
+        
+        if blob is None and entry["uploaded"]:
+            canonical = entry["uploaded"][0]
+            try:
+                with db.begin_nested():
+                    db.execute(insert(StorageBlob).values(
+                        content_hash=content_hash, key=canonical,
+                        size_bytes=entry["size"], ref_count=count
+                    ))
+            except IntegrityError:
+                # Outra transação criou o blob ao mesmo tempo
+                blob = _locked_blob(db, content_hash)
+        
+        if blob is not None:
+            canonical = blob.key
+            db.query(StorageBlob).filter(StorageBlob.id == blob.id).update(
+                {StorageBlob.ref_count: StorageBlob.ref_count + count}, synchronize_session=False
+            )
+        elif not entry["uploaded"]:
+            raise HTTPException(
+                status_code=409,
+                detail="O conteúdo reaproveitado foi removido durante o upload. Envie o arquivo novamente."
+            )
+        
+        moved.update({key: canonical for key in entry["keys"] if key != canonical})
+    return moved
+
+
+def release_blob_refs(db: Session, counts: Dict[str, int]) -> List[str]:
+    """
+    Tira `count` referências de cada blob ({content_hash: count}). Blobs que
+    chegam a zero são removidos da tabela.
+    
+    Returns:
+        Keys dos objetos que ficaram sem referências
+    """
+    orphan_keys = []
+    # Ordem fixa dos locks (ver acquire_blobs)
+    for content_hash in sorted(counts):
+        count = counts[content_hash]
+        blob = _locked_blob(db, content_hash)
+        if blob is None:
+            continue
+        if blob.ref_count > count:
+            db.query(StorageBlob).filter(StorageBlob.id == blob.id).update(
+                {StorageBlob.ref_count: StorageBlob.ref_count - count}, synchronize_session=False
+            )
+        else:
+            orphan_keys.append(blob.key)
+            db.query(StorageBlob).filter(StorageBlob.id == blob.id).delete(synchronize_session=False)
+    return orphan_keys
+
+
+def release_blobs(db: Session, node_filter) -> List[str]:
+    """
+    Tira dos blobs as referências dos nodes que atendem ao filtro (chamar antes
+    do DELETE permanente). Blobs que chegam a zero são removidos da tabela.
+    
+    Returns:
+        Keys dos objetos sem referências, a apagar do R2 depois do commit
+    """
+    rows = db.query(StorageNode.content_hash, func.count(StorageNode.id)).filter(
+        node_filter,
+        StorageNode.content_hash.isnot(None)
+    ).group_by(StorageNode.content_hash).all()
+    return release_blob_refs(db, dict(rows))
+
+
+def delete_blob_objects(keys: Iterable[str]) -> int:
+    """Apaga do R2 os objetos sem referência (depois do commit). Falhas só são logadas."""
+    from app.utils.cloudflare_r2 import delete_image
+    
+    deleted = 0
+    for key in keys:
+        result = delete_image(key)
+        if result.get("success"):
+            deleted += 1
+        else:
+            print(f"⚠️ Erro ao apagar objeto {key} do R2: {result.get('error')}")
+    return deleted
+
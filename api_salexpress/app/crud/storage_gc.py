@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.models.storage import StorageNode
+from app.models.storage_blob import StorageBlob
+from app.models.document_log import DocumentLog, DocumentAction, DocumentLogArchive
+from app.models.photosAndDocuments import PhotoProfile, PhotoPlan
+
+
+# ==========================================
+# REFERÊNCIAS A OBJETOS DO R2
+# ==========================================
+#
+# Tudo o que aponta para um objeto do bucket e, portanto, impede a coleta:
+# - storage_nodes.url (ativos e na lixeira, que ainda pode ser restaurada)
+# - storage_blobs.key (deduplicação)
+# - versões substituídas (details.old_version.url dos logs version_uploaded),
+#   dentro da retenção configurada, inclusive as de meses já arquivados
+# - os próprios arquivos de document_logs arquivados
+# - fotos de perfil e de planos (enviadas pelo /storage/upload para o mesmo bucket)
+
+REFERENCE_BATCH = 5000
+
+
+def _details(value) -> dict:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+def referenced_object_keys(db: Session, version_retention_days: Optional[int] = None) -> Set[str]:
+    """
+    Keys de todos os objetos referenciados pelo banco (lidas em lotes com yield_per).
+    
+    Args:
+        version_retention_days: versões substituídas há mais tempo que isso deixam de
+                                proteger o objeto antigo (None = protegidas para sempre)
+    """
+    from app.utils.cloudflare_r2 import key_from_url
+    
+    keys = set()
+    
+    def add(url):
+        key = key_from_url(url)
+        if key:
+            keys.add(key)
+    
+    for (url,) in db.query(StorageNode.url).filter(StorageNode.url.isnot(None)).yield_per(REFERENCE_BATCH):
+        add(url)
+    
+    for (key,) in db.query(StorageBlob.key).yield_per(REFERENCE_BATCH):
+        keys.add(key)
+    
+    versions = db.query(DocumentLog.details).filter(DocumentLog.action == DocumentAction.VERSION_UPLOADED)
+    if version_retention_days is not None:
+        versions = versions.filter(DocumentLog.created_at >= datetime.now() - timedelta(days=version_retention_days))
+    for (details,) in versions.yield_per(REFERENCE_BATCH):
+        old_version = _details(details).get("old_version")
+        if isinstance(old_version, dict):
+            add(old_version.get("url"))
+    
+    cutoff = None if version_retention_days is None else datetime.now() - timedelta(days=version_retention_days)
+    archives = db.query(DocumentLogArchive.object_key, DocumentLogArchive.version_keys, DocumentLogArchive.fim)
+    for object_key, version_keys, fim in archives.yield_per(REFERENCE_BATCH):
+        keys.add(object_key)
+        if isinstance(version_keys, str):
+            version_keys = json.loads(version_keys)
+        if cutoff is None or fim >= cutoff:
+            keys.update(version_keys or [])
+    
+    for model in (PhotoProfile, PhotoPlan):
+        for (url,) in db.query(model.urlPhoto).filter(model.urlPhoto.isnot(None)).yield_per(REFERENCE_BATCH):
+            add(url)
+    
+    return keys
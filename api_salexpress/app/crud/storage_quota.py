@@ -4,35 +4,40 @@ from app.models.storage import StorageNode
 from app.models.user import UserPJ, UserPF, UserFreelancer
 from typing import Dict, Any, Optional
 from fastapi import HTTPException
+from app.core.config import settings
+import re
 
 def parse_size_to_bytes(size_str: Optional[str]) -> int:
     """
-    Converte string de tamanho (ex: "1.5 MB", "500 KB") para bytes
+    Converte string de tamanho (ex: "1.5 MB", "500 KB", "1.5MB", "2048") para bytes
+    
+    Usado para preencher StorageNode.size_bytes quando só o tamanho formatado é conhecido.
     
     Args:
         size_str: String no formato "123 MB", "1.5 GB", etc.
         
     Returns:
-        Tamanho em bytes
+        Tamanho em bytes (0 se não for possível interpretar)
     """
     if not size_str:
         return 0
     
     size_str = size_str.strip().upper()
     
-    # Extrair número e unidade
-    parts = size_str.split()
-    if len(parts) != 2:
-        # Tentar formato sem espaço (ex: "1.5MB")
-        import re
-        match = re.match(r'([\d.]+)\s*([KMGT]?B)', size_str)
-        if not match:
-            return 0
+    # Apenas dígitos: já está em bytes
+    if size_str.isdigit():
+        return int(size_str)
+    
+    # Extrair número e unidade (com ou sem espaço)
+    match = re.match(r'^([\d.]+)\s*([KMGTP]?B)?$', size_str)
+    if not match:
+        return 0
+    
+    try:
         number = float(match.group(1))
-        unit = match.group(2)
-    else:
-        number = float(parts[0])
-        unit = parts[1]
+    except ValueError:
+        return 0
+    unit = match.group(2) or 'B'
     
     # Converter para bytes
     multipliers = {
@@ -41,6 +46,7 @@ def parse_size_to_bytes(size_str: Optional[str]) -> int:
         'MB': 1024 ** 2,
         'GB': 1024 ** 3,
         'TB': 1024 ** 4,
+        'PB': 1024 ** 5,
     }
     
     return int(number * multipliers.get(unit, 1))
@@ -87,34 +93,23 @@ def calculate_company_storage(
         
     Returns:
         Dict com estatísticas de armazenamento
-    """
-    # Query base - USAR company_id ao invés de business_id
-    query = db.query(StorageNode).filter(
-        and_(
-            StorageNode.company_id == business_id,  # ✅ Mudou de business_id para company_id
-            StorageNode.type == 'file'  # Apenas arquivos, não pastas
-        )
-    )
     
-    # Filtrar deletados se necessário
-    if not include_deleted:
-        query = query.filter(StorageNode.deleted_at.is_(None))
+    OTIMIZADO: sem deletados, lê os contadores de company_storage_usage
+    (mantidos a cada upload/delete/restore); com deletados, agrega no SQL.
     
-    # Buscar todos os arquivos
-    files = query.all()
-    
-    # Calcular totais
-    total_files = len(files)
-    total_bytes = sum(parse_size_to_bytes(file.size) for file in files)
-    
-    # Contar por extensão
-    by_extension = {}
-    for file in files:
-        ext = file.extension or 'sem extensão'
-        if ext not in by_extension:
-            by_extension[ext] = {'count': 0, 'bytes': 0}
-        by_extension[ext]['count'] += 1
-        by_extension[ext]['bytes'] += parse_size_to_bytes(file.size)
+    total_bytes é o tamanho lógico (soma dos arquivos); physical_bytes é o espaço
+    ocupado no R2, menor quando há arquivos deduplicados (settings.storage_dedup_enabled).
+    """
+    physical_bytes = None
+    if include_deleted:
+        total_files, total_bytes, by_extension = _aggregate_company_storage(db, business_id)
+    else:
+        from app.crud.storage_usage import get_company_usage
+        usage = get_company_usage(db, business_id)
+        total_files = usage['total_files']
+        total_bytes = usage['total_bytes']
+        by_extension = usage['by_extension']
+        physical_bytes = usage['physical_bytes']
     
     # Formatar por extensão
     by_extension_formatted = {
@@ -126,6 +121,10 @@ def calculate_company_storage(
         for ext, data in by_extension.items()
     }
     
+    # Espaço físico (conteúdos repetidos contam uma vez, contador "physical"); sem deduplicação é o próprio total
+    if not settings.storage_dedup_enabled or physical_bytes is None:
+        physical_bytes = total_bytes
+    
     # Buscar informações da empresa
     company_info = get_company_info(db, business_id, business_type)
     
@@ -135,11 +134,56 @@ def calculate_company_storage(
             'total_files': total_files,
             'total_size': bytes_to_human_readable(total_bytes),
             'total_bytes': total_bytes,
+            'logical_bytes': total_bytes,
+            'physical_size': bytes_to_human_readable(physical_bytes),
+            'physical_bytes': physical_bytes,
             'by_extension': by_extension_formatted
         }
     }
 
 
+def _aggregate_company_storage(db: Session, business_id: int, include_deleted: bool = True):
+    """
+    Agregação no SQL: uma linha por extensão (SUM/COUNT) ao invés de
+    carregar e converter o tamanho de cada arquivo em Python
+    
+    Returns:
+        (total_files, total_bytes, {ext: {'count', 'bytes'}})
+    """
+    # USAR company_id ao invés de business_id
+    query = db.query(
+        StorageNode.extension,
+        func.count(StorageNode.id),
+        func.coalesce(func.sum(StorageNode.size_bytes), 0)
+    ).filter(
+        and_(
+            StorageNode.company_id == business_id,  # ✅ Mudou de business_id para company_id
+            StorageNode.type == 'file'  # Apenas arquivos, não pastas
+        )
+    )
+    
+    # Filtrar deletados se necessário
+    if not include_deleted:
+        query = query.filter(StorageNode.deleted_at.is_(None))
+    
+    rows = query.group_by(StorageNode.extension).all()
+    
+    # Calcular totais e contar por extensão
+    total_files = 0
+    total_bytes = 0
+    by_extension = {}
+    for extension, count, size_bytes in rows:
+        ext = extension or 'sem extensão'
+        if ext not in by_extension:
+            by_extension[ext] = {'count': 0, 'bytes': 0}
+        by_extension[ext]['count'] += count
+        by_extension[ext]['bytes'] += int(size_bytes)
+        total_files += count
+        total_bytes += int(size_bytes)
+    
+    return total_files, total_bytes, by_extension
+
+
 def calculate_user_storage_across_companies(
     db: Session,
     user_id: int,
@@ -261,6 +305,9 @@ def get_storage_limit(db: Session, business_id: int, business_type: str) -> Dict
         
     Returns:
         Dict com limite e uso atual
+    
+    A cota é consumida pelo espaço físico: com deduplicação, o mesmo arquivo em
+    várias pastas conta uma única vez (o tamanho lógico também é informado).
     """
     # Calcular uso atual
     storage_data = calculate_company_storage(db, business_id, business_type)
@@ -269,7 +316,8 @@ def get_storage_limit(db: Session, business_id: int, business_type: str) -> Dict
     # Por enquanto, usar limite padrão
     limit_bytes = 10 * 1024 ** 3  # 10 GB padrão
     
-    used_bytes = storage_data['storage']['total_bytes']
+    used_bytes = storage_data['storage']['physical_bytes']
+    logical_bytes = storage_data['storage']['logical_bytes']
     percentage_used = (used_bytes / limit_bytes) * 100 if limit_bytes > 0 else 0
     available_bytes = max(0, limit_bytes - used_bytes)
     
@@ -282,7 +330,10 @@ def get_storage_limit(db: Session, business_id: int, business_type: str) -> Dict
         'used': {
             'total': bytes_to_human_readable(used_bytes),
             'total_bytes': used_bytes,
-            'percentage': round(percentage_used, 2)
+            'percentage': round(percentage_used, 2),
+            'logical': bytes_to_human_readable(logical_bytes),
+            'logical_bytes': logical_bytes,
+            'physical_bytes': used_bytes
         },
         'available': {
             'total': bytes_to_human_readable(available_bytes),
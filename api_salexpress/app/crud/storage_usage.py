@@ -0,0 +1,244 @@
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.storage import StorageNode, NodeType
+from app.models.storage_usage import CompanyBlobRef, CompanyStorageUsage
+
+
+# ==========================================
+# CONTADORES DE USO POR EMPRESA
+# ==========================================
+#
+# Os contadores consideram apenas nodes ativos (deleted_at IS NULL) com company_id,
+# e são atualizados na MESMA transação da operação que altera os nodes
+# (create, update/nova versão, lixeira, restauração, delete permanente).
+# O commit fica sempre a cargo do chamador.
+#
+# Uso físico (dimension="physical"): arquivos sem content_hash somam o próprio
+# tamanho; um conteúdo deduplicado soma o tamanho do objeto quando o primeiro
+# node ativo da empresa passa a apontar para ele e subtrai quando o último sai
+# (company_blob_refs). A verificação de cota lê só essas linhas.
+
+NO_EXTENSION = "sem extensão"
+NO_STATUS = "Sem Status"
+
+UsageKey = Tuple[int, str, str]  # (company_id, dimension, bucket)
+
+
+def _node_type(value) -> str:
+    return value.value if hasattr(value, "value") else str(value)
+
+
+def _contribution(deltas: Dict[UsageKey, list], company_id, node_type, extension, status, items, size_bytes, sign=1, content_hash=None):
+    """Soma em `deltas` a contribuição de `items` nodes do mesmo (tipo, extensão, status, conteúdo)"""
+    if not company_id or not items:
+        return
+    items *= sign
+    size_bytes = int(size_bytes or 0) * sign
+    node_type = _node_type(node_type)
+    
+    if node_type == NodeType.folder.value:
+        deltas[(company_id, "total", "folder")][0] += items
+        return
+    
+    for key in (
+        (company_id, "total", "file"),
+        (company_id, "extension", extension or NO_EXTENSION),
+        (company_id, "status", status if status and status.strip() else NO_STATUS),
+    ):
+        deltas[key][0] += items
+        deltas[key][1] += size_bytes
+    
+    # Deduplicados: referências por conteúdo (o uso físico muda só na primeira/última)
+    key = (company_id, "blob", content_hash) if content_hash else (company_id, "physical", "file")
+    deltas[key][0] += items
+    deltas[key][1] += size_bytes
+
+
+def _apply_blob_ref(db: Session, company_id: int, content_hash: str, items: int, size_bytes: int) -> int:
+    """
+    Soma `items` referências da empresa ao conteúdo e devolve a variação do uso
+    físico: +tamanho na primeira referência, -tamanho quando não sobra nenhuma.
+    """
+    def _locked():
+        return db.query(CompanyBlobRef).filter(
+            CompanyBlobRef.company_id == company_id,
+            CompanyBlobRef.content_hash == content_hash
+        ).with_for_update().first()
+    
+    row = _locked()
+    if row is None:
+        if items <= 0:
+            return 0
+        size = abs(size_bytes) // items
+        try:
+            with db.begin_nested():
+                db.execute(insert(CompanyBlobRef).values(
+                    company_id=company_id, content_hash=content_hash, refs=items, size_bytes=size
+                ))
+            return size
+        except IntegrityError:
+            # Outra transação criou a referência ao mesmo tempo
+            row = _locked()
+    
+    refs = row.refs + items
+    if refs > 0:
+        db.query(CompanyBlobRef).filter(CompanyBlobRef.id == row.id).update(
+            {CompanyBlobRef.refs: refs}, synchronize_session=False
+        )
+    else:
+        db.query(CompanyBlobRef).filter(CompanyBlobRef.id == row.id).delete(synchronize_session=False)
+    
+    if row.refs <= 0 < refs:
+        return row.size_bytes
+    if row.refs > 0 >= refs:
+        return -row.size_bytes
+    return 0
+
+
+def apply_usage_deltas(db: Session, deltas: Dict[UsageKey, list]) -> None:
+    """
+    Aplica os deltas com UPDATE atômico (items = items + :delta), criando a linha
+    do bucket na primeira vez. Seguro para uploads concorrentes da mesma empresa.
+    """
+    # Referências a conteúdos deduplicados viram variação do uso físico
+    # (ordem fixa dos locks: lotes concorrentes não entram em deadlock)
+    for key in sorted(key for key in deltas if key[1] == "blob"):
+        items, size_bytes = deltas.pop(key)
+        if items:
+            physical = _apply_blob_ref(db, key[0], key[2], items, size_bytes)
+            deltas[(key[0], "physical", "file")][1] += physical
+    
+    for (company_id, dimension, bucket), (items, size_bytes) in deltas.items():
+        if not items and not size_bytes:
+            continue
+        
+        def _update():
+            return db.query(CompanyStorageUsage).filter(
+                CompanyStorageUsage.company_id == company_id,
+                CompanyStorageUsage.dimension == dimension,
+                CompanyStorageUsage.bucket == bucket
+            ).update({
+                CompanyStorageUsage.items: CompanyStorageUsage.items + items,
+                CompanyStorageUsage.bytes: CompanyStorageUsage.bytes + size_bytes
+            }, synchronize_session=False)
+        
+        if _update():
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(CompanyStorageUsage).values(
+                    company_id=company_id, dimension=dimension, bucket=bucket,
+                    items=items, bytes=size_bytes
+                ))
+        except IntegrityError:
+            # Outra transação criou o bucket ao mesmo tempo
+            _update()
+
+
+def track_node_usage(db: Session, node: StorageNode, sign: int = 1) -> None:
+    """Soma (sign=1) ou subtrai (sign=-1) um único node ativo dos contadores"""
+    if node.deleted_at is not None:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+    _contribution(deltas, node.company_id, node.type, node.extension, node.status, 1, node.size_bytes, sign, node.content_hash)
+    apply_usage_deltas(db, deltas)
+
+
+def track_nodes_usage(db: Session, node_filter, sign: int = 1) -> None:
+    """
+    Soma ou subtrai dos contadores todos os nodes que atendem ao filtro
+    (ex: a subárvore indo para a lixeira). Uma agregação GROUP BY + um
+    UPDATE por bucket afetado, independente da quantidade de nodes.
+    
+    O filtro deve selecionar os nodes no estado "ativo" relevante: chamar antes
+    do soft/permanent delete e antes da restauração (com o filtro dos que voltarão).
+    """
+    rows = db.query(
+        StorageNode.company_id,
+        StorageNode.type,
+        StorageNode.extension,
+        StorageNode.status,
+        StorageNode.content_hash,
+        func.count(StorageNode.id),
+        func.coalesce(func.sum(StorageNode.size_bytes), 0)
+    ).filter(
+        node_filter,
+        StorageNode.company_id.isnot(None)
+    ).group_by(
+        StorageNode.company_id, StorageNode.type, StorageNode.extension, StorageNode.status, StorageNode.content_hash
+    ).all()
+    
+    deltas = defaultdict(lambda: [0, 0])
+    for company_id, node_type, extension, status, content_hash, items, size_bytes in rows:
+        _contribution(deltas, company_id, node_type, extension, status, items, size_bytes, sign, content_hash)
+    apply_usage_deltas(db, deltas)
+
+
+def get_company_usage(db: Session, company_id: int) -> Dict[str, Any]:
+    """
+    Lê os contadores da empresa (poucas linhas, independente do número de arquivos)
+    
+    Returns:
+        {"total_bytes", "physical_bytes", "total_files", "total_folders",
+         "by_extension": {ext: {"count", "bytes"}}, "by_status": {status: count}}
+    """
+    usage = {
+        "total_bytes": 0,
+        "physical_bytes": 0,
+        "total_files": 0,
+        "total_folders": 0,
+        "by_extension": {},
+        "by_status": {},
+    }
+    rows = db.query(CompanyStorageUsage).filter(CompanyStorageUsage.company_id == company_id).all()
+    for row in rows:
+        if row.dimension == "total" and row.bucket == "file":
+            usage["total_files"] = row.items
+            usage["total_bytes"] = row.bytes
+        elif row.dimension == "total" and row.bucket == "folder":
+            usage["total_folders"] = row.items
+        elif row.dimension == "physical":
+            usage["physical_bytes"] = row.bytes
+        elif row.dimension == "extension" and row.items:
+            usage["by_extension"][row.bucket] = {"count": row.items, "bytes": row.bytes}
+        elif row.dimension == "status" and row.items:
+            usage["by_status"][row.bucket] = row.items
+    return usage
+
+
+def reconcile_company_usage(db: Session, company_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Reconstrói os contadores a partir de storage_nodes (uma empresa ou todas).
+    Corrige qualquer divergência acumulada; executado via cron/endpoint.
+    
+    Returns:
+        Dict com o número de empresas e buckets gravados
+    """
+    delete_query = db.query(CompanyStorageUsage)
+    refs_query = db.query(CompanyBlobRef)
+    node_filter = StorageNode.deleted_at.is_(None)
+    if company_id is not None:
+        delete_query = delete_query.filter(CompanyStorageUsage.company_id == company_id)
+        refs_query = refs_query.filter(CompanyBlobRef.company_id == company_id)
+        node_filter = node_filter & (StorageNode.company_id == company_id)
+    
+    delete_query.delete(synchronize_session=False)
+    refs_query.delete(synchronize_session=False)
+    track_nodes_usage(db, node_filter, sign=1)
+    db.commit()
+    
+    query = db.query(
+        func.count(func.distinct(CompanyStorageUsage.company_id)),
+        func.count(CompanyStorageUsage.id)
+    )
+    if company_id is not None:
+        query = query.filter(CompanyStorageUsage.company_id == company_id)
+    companies, buckets = query.one()
+    
+    print(f"📊 Contadores de armazenamento reconstruídos: {companies} empresa(s), {buckets} bucket(s)")
+    return {"empresas": companies, "buckets": buckets}
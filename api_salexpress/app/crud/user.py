@@ -8,6 +8,7 @@ from fastapi.encoders import jsonable_encoder
 from app.utils.security import *
 from math import ceil
 from app.models import PermissionsPJ, PermissionsFreelas
+from app.services.user_identity import invalidate_user
 
 def create_user_pf(db: Session, user: UserPFBase):
     # Verificando se o CPF ou email já existe
@@ -229,6 +230,7 @@ def edit_user_pf(db: Session, user_id: int, user_data: UserPFBase):
 
     db.commit()
     db.refresh(db_user)
+    invalidate_user(db_user.id, "pf")
 
     return {"message": "Usuário PF atualizado com sucesso", "user_id": db_user.id}
 
@@ -244,8 +246,7 @@ def edit_user_pj(db: Session, user_id: int, user_data: UserPJBase):
 
     db.commit()
     db.refresh(db_user)
-
-    
+    invalidate_user(db_user.id, "pj")
 
     return {"message": "Usuário PJ atualizado com sucesso", "user_id": db_user.id}
 
@@ -263,6 +264,7 @@ def edit_user_freelancer(db: Session, user_id: int, user_data: UserFreelancerBas
 
     db.commit()
     db.refresh(db_user)
+    invalidate_user(db_user.id, "freelancer")
 
     return {"message": "Freelancer atualizado com sucesso", "user_id": db_user.id}
 
@@ -278,6 +280,7 @@ def delete_user_freelancer(db: Session, user_id: int):
 
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id, "freelancer")
     return {"message": "Freelancer deletado com sucesso"}
 
 
@@ -288,6 +291,7 @@ def delete_user_pj(db: Session, user_id: int):
 
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id, "pj")
     return {"message": "Usuário PJ deletado com sucesso"}
 
 
@@ -308,6 +312,7 @@ def delete_user_pf(db: Session, user_id: int):
 
     db.delete(db_user)
     db.commit()
+    invalidate_user(user_id, "pf")  # PJs vinculados saem junto do cache
     return {"message": "Usuário PF deletado com sucesso"}
 
 def add_permissions_to_user(db: Session, user_id: int, permissions: list, user_type: str):
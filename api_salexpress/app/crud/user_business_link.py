@@ -82,7 +82,7 @@ def create_link(db: Session, data: UserBusinessLinkCreate) -> UserBusinessLink:
         company_info = get_user_basic_info(db, data.business_id, data.business_type)
         company_name = company_info.get('name', 'Uma Empresa')
         
-        # Envia em background ou direto (direto por enquanto, timeout no service é alto)
+        # Apenas enfileira (email_outbox): o envio é feito pelo worker da fila
         try:
             send_active_freelancer_email(data.email, company_name)
         except Exception as e:
@@ -1,8 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.v1.v1 import router as v1_router
 from fastapi.middleware.cors import CORSMiddleware
+from app.services.email_outbox import start_worker, stop_worker
+from app.services.audit_log import start_audit_sink, stop_audit_sink
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker da fila de e-mails (email_outbox) e buffer de auditoria (document_logs)
+    # rodam em threads neste processo; no shutdown o buffer é gravado
+    start_worker()
+    start_audit_sink()
+    yield
+    stop_audit_sink()
+    stop_worker()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Adicionando o middleware CORS
 # Adicionando o middleware CORS
@@ -15,6 +30,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Permite todos os métodos HTTP
     allow_headers=["*"],  # Permite todos os cabeçalhos
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],  # Paginação por cursor
 )
 
 
@@ -19,4 +19,7 @@ from .storage import *
 from .share import *
 from .status import *
 from .user_business_link import *
-from .document_log import *
\ No newline at end of file
+from .document_log import *
+from .storage_usage import *
+from .storage_blob import *
+from .email_outbox import *
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from app.core.db import Base
 
@@ -9,6 +9,10 @@ class DocumentLog(Base):
     
     Registra todas as ações: criação, movimentação, edição, renomeação,
     deleção, compartilhamento, etc.
+    
+    No MySQL a tabela é particionada por mês em created_at (RANGE COLUMNS) e a
+    chave primária no banco é (id, created_at); meses fora da retenção são
+    arquivados no R2 (ver app/services/document_log_archive.py).
     """
     __tablename__ = "document_logs"
 
@@ -42,6 +46,39 @@ class DocumentLog(Base):
         return f"<DocumentLog(id={self.id}, node_id={self.node_id}, action='{self.action}', user='{self.user_name}')>"
 
 
+class DocumentLogArchive(Base):
+    """
+    Mês de document_logs arquivado no R2 (JSONL compactado com gzip).
+    
+    version_keys guarda as keys das versões substituídas (logs version_uploaded)
+    do mês, que continuam protegidas da coleta de órfãos do R2.
+    """
+    __tablename__ = "document_log_archives"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    periodo = Column(String(7), nullable=False, index=True, comment="Mês arquivado (AAAA-MM)")
+    inicio = Column(DateTime, nullable=False, comment="Início do mês")
+    fim = Column(DateTime, nullable=False, comment="Início do mês seguinte (exclusivo)")
+    object_key = Column(String(500), nullable=False, comment="Key do arquivo .jsonl.gz no R2")
+    total_registros = Column(Integer, nullable=False, default=0)
+    tamanho_bytes = Column(BigInteger, nullable=False, default=0)
+    version_keys = Column(JSON, nullable=True, comment="Keys de versões substituídas referenciadas no mês")
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<DocumentLogArchive(periodo='{self.periodo}', registros={self.total_registros})>"
+
+
+class DocumentLogArchiveNode(Base):
+    """Índice dos arquivos: em quais meses arquivados cada node tem logs"""
+    __tablename__ = "document_log_archive_nodes"
+
+    archive_id = Column(Integer, primary_key=True, comment="ID em document_log_archives")
+    node_id = Column(Integer, primary_key=True, index=True, comment="ID do documento/pasta")
+    total_registros = Column(Integer, nullable=False, default=0)
+    resumo = Column(JSON, nullable=True, comment="Por ação: total e último log do node no mês")
+
+
 # Tipos de ações disponíveis
 class DocumentAction:
     """Constantes para tipos de ações"""
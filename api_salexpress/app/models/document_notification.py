@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import String, Integer, DateTime, Boolean, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.sql import func
 from app.core.db import Base
 from datetime import datetime
@@ -20,6 +20,7 @@ class DocumentFollower(Base):
     # Configurações de notificação
     dias_antes_alerta: Mapped[int] = mapped_column(Integer, nullable=False, default=7)  # Quantos dias antes alertar
     alertar_no_vencimento: Mapped[bool] = mapped_column(Boolean, default=True)  # Alertar no dia do vencimento
+    modo_notificacao: Mapped[str] = mapped_column(String(20), nullable=False, default="imediato", server_default="imediato")  # 'imediato', 'diario', 'semanal' (resumo)
     
     # Status
     ativo: Mapped[bool] = mapped_column(Boolean, default=True)
@@ -29,6 +30,22 @@ class DocumentFollower(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
+class NotificationPreference(Base):
+    """Preferência de notificação do usuário, aplicada aos documentos que ele passar a seguir"""
+    __tablename__ = "notification_preferences"
+    __table_args__ = (
+        UniqueConstraint('user_id', 'tipo_usuario', name='uq_notification_preferences_user'),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    tipo_usuario: Mapped[str] = mapped_column(String(20), nullable=False)
+    modo_notificacao: Mapped[str] = mapped_column(String(20), nullable=False, default="imediato", server_default="imediato")  # 'imediato', 'diario', 'semanal' (resumo)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
 class DocumentNotification(Base):
     """Tabela de histórico de notificações enviadas"""
     __tablename__ = "document_notifications"
@@ -54,6 +71,7 @@ class DocumentNotification(Base):
     # Status do envio
     enviada: Mapped[bool] = mapped_column(Boolean, default=False)
     erro_envio: Mapped[str] = mapped_column(Text, nullable=True)
+    email_outbox_id: Mapped[int] = mapped_column(Integer, nullable=True, index=True)  # E-mail de resumo que levou esta notificação
     
     # Metadados
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, DateTime, Text, JSON, Index
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from sqlalchemy.sql import func
+from app.core.db import Base
+from datetime import datetime
+
+
+class EmailOutbox(Base):
+    """
+    Fila persistente de e-mails (outbox).
+    
+    Os endpoints apenas enfileiram (app/services/email_outbox.py); o worker envia
+    em paralelo, agrupa destinatários de mensagens idênticas e reenvia com
+    backoff exponencial até email_outbox_max_attempts.
+    
+    status: pending -> sending -> sent | failed (sending com next_attempt_at
+    vencido é um envio interrompido e volta a ser processado)
+    """
+    __tablename__ = "email_outbox"
+    
+    __table_args__ = (
+        Index('idx_email_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    destinatarios: Mapped[list] = mapped_column(JSON, nullable=False)
+    assunto: Mapped[str] = mapped_column(String(255), nullable=False)
+    mensagem: Mapped[str] = mapped_column(Text().with_variant(MEDIUMTEXT(), "mysql"), nullable=False)
+    # SHA-256 de assunto + mensagem: agrupa mensagens idênticas em um único envio
+    conteudo_hash: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    origem: Mapped[str | None] = mapped_column(String(50), nullable=True, comment="Quem enfileirou (vencimento, reset_senha, ...)")
+    # Notificação de vencimento marcada como enviada quando o e-mail sair
+    notification_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
+    
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    tentativas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    ultimo_erro: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    enviada_em: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
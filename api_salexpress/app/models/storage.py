@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, DateTime, Date, ForeignKey, Enum, Text, Index
+from sqlalchemy import String, Integer, BigInteger, DateTime, Date, ForeignKey, Enum, Text, Index, Computed
 from sqlalchemy.sql import func
 from app.core.db import Base
 import enum
@@ -15,21 +15,35 @@ class StorageNode(Base):
     __table_args__ = (
         Index('idx_storage_nodes_owner_active', 'business_id', 'type_user', 'deleted_at'),
         Index('idx_storage_nodes_parent_deleted', 'parent_id', 'deleted_at'),
+        # Busca por nome/comentários (MATCH ... AGAINST em search_text), ver app/crud/search.py
+        Index('ix_storage_nodes_search_text', 'search_text', mysql_prefix='FULLTEXT'),
     )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     type: Mapped[NodeType] = mapped_column(Enum(NodeType), nullable=False, index=True)
     parent_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("storage_nodes.id"), nullable=True, index=True)
+    # Caminho materializado com os IDs dos ancestrais e do próprio node (ex: "/1/5/23/")
+    # Permite buscar subárvores com um único "path LIKE '/1/5/%'" indexado
+    path: Mapped[str | None] = mapped_column(String(512), nullable=True, index=True, comment="Caminho materializado de ancestrais (/1/5/23/)")
     business_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True, comment="ID do usuário dono (quem fez upload)")
     type_user: Mapped[str | None] = mapped_column(String(50), nullable=True, index=True, comment="Tipo do usuário dono (pf/pj/freelancer)")
     company_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True, comment="ID da empresa responsável (para filtrar arquivos)")
     company_type: Mapped[str | None] = mapped_column(String(50), nullable=True, comment="Tipo da empresa (pf/pj/freelancer)")
     size: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    # Tamanho em bytes (desnormalizado de "size") para somar/agrupar direto no SQL
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True, comment="Tamanho do arquivo em bytes")
     extension: Mapped[str | None] = mapped_column(String(20), nullable=True)
     status: Mapped[str | None] = mapped_column(String(50), nullable=True, index=True)
     comments: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Nome (com "_" trocado por espaço) + comentários, mantido pelo banco: o FULLTEXT do InnoDB
+    # trata "_" como parte da palavra e "NF_2024_contrato.pdf" não seria encontrado por "contrato"
+    search_text: Mapped[str | None] = mapped_column(
+        Text, Computed("CONCAT_WS(' ', REPLACE(name, '_', ' '), comments)", persisted=True), nullable=True
+    )
     url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # SHA-256 do conteúdo quando o upload passou pela deduplicação (ver StorageBlob)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True, comment="SHA-256 do conteúdo (storage_blobs)")
     data_validade: Mapped[Date | None] = mapped_column(Date, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
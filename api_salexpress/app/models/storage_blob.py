@@ -0,0 +1,26 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.db import Base
+
+
+class StorageBlob(Base):
+    """
+    Objeto do R2 compartilhado por arquivos de conteúdo idêntico (deduplicação).
+    
+    Uma linha por conteúdo (SHA-256): key do objeto no R2 e quantos nodes
+    (ativos ou na lixeira) apontam para ele. O objeto só é apagado do R2 quando
+    ref_count chega a zero. Mantida em app/crud/storage_blob.py.
+    """
+    __tablename__ = "storage_blobs"
+    
+    __table_args__ = (
+        UniqueConstraint('content_hash', name='uq_storage_blobs_content_hash'),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, comment="SHA-256 do conteúdo (hex)")
+    key: Mapped[str] = mapped_column(String(512), nullable=False, comment="Key do objeto no R2")
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, comment="Tamanho físico do objeto")
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="Nodes que referenciam o objeto")
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,53 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.db import Base
+
+
+class CompanyStorageUsage(Base):
+    """
+    Contadores de uso de armazenamento por empresa (company_id dos nodes ativos).
+    
+    Uma linha por (empresa, dimensão, bucket):
+    - dimension="total":     bucket "file" / "folder"
+    - dimension="extension": bucket = extensão do arquivo ("sem extensão" se vazia)
+    - dimension="status":    bucket = status do arquivo ("Sem Status" se vazio)
+    - dimension="physical":  bucket "file" = bytes ocupados no R2 (cada conteúdo
+                             deduplicado conta uma vez, ver CompanyBlobRef)
+    
+    Mantida incrementalmente em app/crud/storage_usage.py e reconstruída
+    por reconcile_company_usage a partir de storage_nodes.
+    """
+    __tablename__ = "company_storage_usage"
+    
+    __table_args__ = (
+        UniqueConstraint('company_id', 'dimension', 'bucket', name='uq_company_storage_usage_bucket'),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    company_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    dimension: Mapped[str] = mapped_column(String(20), nullable=False)
+    bucket: Mapped[str] = mapped_column(String(100), nullable=False)
+    items: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="Quantidade de nodes")
+    bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, comment="Soma de size_bytes")
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CompanyBlobRef(Base):
+    """
+    Quantos nodes ativos de cada empresa apontam para cada conteúdo deduplicado
+    (storage_blobs). O tamanho do objeto entra no uso físico da empresa
+    (dimension="physical") na primeira referência e sai na última.
+    Mantida junto com os contadores em app/crud/storage_usage.py.
+    """
+    __tablename__ = "company_blob_refs"
+    
+    __table_args__ = (
+        UniqueConstraint('company_id', 'content_hash', name='uq_company_blob_refs_hash'),
+    )
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    company_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False, comment="SHA-256 do conteúdo (hex)")
+    refs: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="Nodes ativos da empresa com o conteúdo")
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, comment="Tamanho físico do objeto")
@@ -9,19 +9,26 @@ class DocumentFollowerCreate(BaseModel):
     tipo_usuario: Literal['pf', 'pj', 'freelancer', 'collaborator'] = Field(..., description="Tipo do usuário (pf, pj, freelancer ou collaborator)")
     dias_antes_alerta: int = Field(default=7, ge=0, le=90, description="Dias antes do vencimento para alertar (0-90)")
     alertar_no_vencimento: bool = Field(default=True, description="Alertar no dia do vencimento")
+    modo_notificacao: Optional[Literal['imediato', 'diario', 'semanal']] = Field(None, description="imediato: um email por alerta; diario/semanal: um resumo por destinatário (padrão: preferência do usuário)")
 
 class DocumentFollowerByEmailRequest(BaseModel):
     """Schema para seguir um documento usando apenas o email"""
     email: EmailStr = Field(..., description="Email do usuário que vai seguir o documento")
     dias_antes_alerta: int = Field(default=7, ge=0, le=90, description="Dias antes do vencimento para alertar (0-90)")
     alertar_no_vencimento: bool = Field(default=True, description="Alertar no dia do vencimento")
+    modo_notificacao: Optional[Literal['imediato', 'diario', 'semanal']] = Field(None, description="imediato: um email por alerta; diario/semanal: um resumo por destinatário (padrão: preferência do usuário)")
 
 class DocumentFollowerUpdate(BaseModel):
     """Schema para atualizar configurações de seguimento"""
     dias_antes_alerta: Optional[int] = Field(None, ge=0, le=90, description="Dias antes do vencimento para alertar")
     alertar_no_vencimento: Optional[bool] = Field(None, description="Alertar no dia do vencimento")
+    modo_notificacao: Optional[Literal['imediato', 'diario', 'semanal']] = Field(None, description="imediato, diario ou semanal (resumo)")
     ativo: Optional[bool] = Field(None, description="Ativar/desativar seguimento")
 
+class ModoNotificacaoUpdate(BaseModel):
+    """Schema para definir o modo de notificação de todos os documentos seguidos pelo usuário"""
+    modo_notificacao: Literal['imediato', 'diario', 'semanal'] = Field(..., description="imediato: um email por alerta; diario/semanal: um resumo por destinatário")
+
 class DocumentFollowerResponse(BaseModel):
     """Schema de resposta de seguidor"""
     id: int
@@ -30,6 +37,7 @@ class DocumentFollowerResponse(BaseModel):
     tipo_usuario: str
     dias_antes_alerta: int
     alertar_no_vencimento: bool
+    modo_notificacao: str
     ativo: bool
     created_at: datetime
     updated_at: datetime
@@ -26,3 +26,10 @@ class ShareResponse(ShareBase):
     created_at: datetime
     class Config:
         from_attributes = True
+
+class ShareSummaryResponse(BaseModel):
+    """Resumo de um compartilhamento recursivo (apenas contagens)"""
+    node_id: int
+    total_itens: int
+    criados: int
+    atualizados: int
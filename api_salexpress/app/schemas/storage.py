@@ -11,6 +11,7 @@ class StorageBase(BaseModel):
     company_id: Optional[int] = None   # ID da empresa responsável
     company_type: Optional[str] = None # Tipo da empresa
     size: Optional[str] = None
+    size_bytes: Optional[int] = None   # Tamanho em bytes (calculado de size se omitido)
     extension: Optional[str] = None
     status: Optional[str] = None
     comments: Optional[str] = None
@@ -25,6 +26,7 @@ class StorageUpdate(BaseModel):
     parent_id: Optional[int] = None
     type_user: Optional[str] = None
     size: Optional[str] = None
+    size_bytes: Optional[int] = None
     extension: Optional[str] = None
     status: Optional[str] = None
     comments: Optional[str] = None
@@ -125,3 +127,84 @@ class PresignedUploadResponse(BaseModel):
     key: str
     public_url: str
     filename: str
+
+class MultipartInitiateResponse(BaseModel):
+    """Upload multipart iniciado: o navegador divide o arquivo em part_count partes de part_size bytes"""
+    key: str
+    upload_id: str
+    part_size: int
+    part_count: int
+    public_url: str
+    filename: str
+
+class MultipartPresignPartsRequest(BaseModel):
+    key: str
+    upload_id: str
+    part_numbers: List[int] = Field(..., description="Números das partes (1..10000) a presignar")
+
+class MultipartPartUrl(BaseModel):
+    part_number: int
+    url: str
+
+class MultipartPresignPartsResponse(BaseModel):
+    parts: List[MultipartPartUrl]
+
+class MultipartPart(BaseModel):
+    part_number: int
+    etag: str
+    size: Optional[int] = None
+
+class MultipartCompleteRequest(BaseModel):
+    key: str
+    upload_id: str
+    parts: Optional[List[MultipartPart]] = Field(
+        default=None,
+        description="Partes enviadas; se omitido, usa as partes registradas no R2"
+    )
+
+class MultipartAbortRequest(BaseModel):
+    key: str
+    upload_id: str
+
+class BatchUploadResponse(BaseModel):
+    """Resultado do upload em lote: arquivos criados e pastas criadas a partir dos caminhos relativos"""
+    total_arquivos: int
+    total_pastas_criadas: int
+    files: List[StorageResponse]
+    folders: List[StorageResponse]
+
+class PresignedUploadFile(BaseModel):
+    filename: str
+    content_type: str
+    size_bytes: int
+
+class BatchPresignedUploadRequest(BaseModel):
+    business_id: int
+    type_user: str
+    company_id: Optional[int] = None
+    company_type: Optional[str] = None
+    files: List[PresignedUploadFile]
+
+class BatchPresignedUploadResponse(BaseModel):
+    total_bytes: int
+    uploads: List[PresignedUploadResponse]
+
+class CompletedUploadItem(BaseModel):
+    """Arquivo já enviado ao R2 (URL presignada) a ser registrado"""
+    name: str
+    url: str
+    path: Optional[str] = Field(default=None, description="Caminho relativo (ex: Contratos/2024/a.pdf) para criar as pastas")
+    size: Optional[str] = None
+    size_bytes: Optional[int] = None
+    extension: Optional[str] = None
+    status: Optional[str] = None
+    comments: Optional[str] = None
+    data_validade: Optional[date] = None
+
+class BatchCompleteUploadRequest(BaseModel):
+    parent_id: Optional[int] = None
+    business_id: Optional[int] = None
+    type_user: Optional[str] = None
+    company_id: Optional[int] = None
+    company_type: Optional[str] = None
+    items: List[CompletedUploadItem]
@@ -13,6 +13,9 @@ class StorageStats(BaseModel):
     total_files: int
     total_size: str
     total_bytes: int
+    logical_bytes: int = 0
+    physical_size: str = "0 B"
+    physical_bytes: int = 0
     by_extension: Dict[str, StorageByExtension]
 
 
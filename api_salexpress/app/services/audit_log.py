@@ -0,0 +1,268 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# LOG DE AUDITORIA COM ESCRITA ADIADA (WRITE-BEHIND)
+# ==========================================
+#
+# OTIMIZADO: criar_log_documento fazia add + commit + refresh por registro, logo
+# depois do commit principal da operação (duas transações por escrita). Agora os
+# eventos entram em um buffer em memória e uma thread grava tudo com INSERT em
+# lote (multi-row) quando o buffer atinge audit_log_batch_size ou a cada
+# audit_log_flush_seconds, numa sessão própria: nenhum commit extra no caminho
+# da requisição.
+#
+# Contrapressão: o buffer tem no máximo audit_log_max_pending eventos. Cheio, o
+# comportamento segue audit_log_overflow:
+# - "flush": quem está registrando grava o buffer na hora (desacelera o produtor,
+#   nada se perde);
+# - "drop": o evento é descartado e contado em dropped.
+#
+# Um lote que falha por causa de uma linha (JSON inválido, valor maior que a
+# coluna...) é regravado linha a linha e só as linhas ruins são descartadas, com
+# log (dead_lettered); só falhas do banco (conexão, lock) devolvem o lote ao buffer.
+#
+# Eventos ainda no buffer são gravados no shutdown (stop_audit_sink no lifespan).
+# Um processo que morra sem shutdown perde no máximo o conteúdo do buffer.
+
+
+def _is_unavailable(error: Exception) -> bool:
+    """Falha do banco (conexão, lock, timeout) e não da linha: vale tentar de novo depois"""
+    from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, (OperationalError, InterfaceError))
+
+
+OVERFLOW_FLUSH = "flush"
+OVERFLOW_DROP = "drop"
+
+
+class AuditLogSink(threading.Thread):
+    """Buffer de eventos de document_logs gravados em lote por uma thread"""
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int,
+        flush_seconds: float,
+        max_pending: int,
+        overflow: str = OVERFLOW_FLUSH
+    ):
+        super().__init__(name="audit-log", daemon=True)
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self._buffer = deque()
+        self._lock = threading.Lock()          # Protege o buffer
+        self._flush_lock = threading.Lock()    # Um INSERT de cada vez (ordem dos eventos)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self._last_failed = False
+
+    def emit(self, row: Dict) -> bool:
+        """Coloca um evento no buffer. Returns: False se foi descartado (overflow "drop")"""
+        with self._lock:
+            full = len(self._buffer) >= self.max_pending
+            if not full:
+                self._buffer.append(row)
+                pending = len(self._buffer)
+        if full:
+            if self.overflow == OVERFLOW_DROP:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Buffer de auditoria cheio: {self.dropped} eventos descartados")
+                return False
+            # Contrapressão: o produtor grava o buffer antes de seguir
+            self.flush()
+            with self._lock:
+                if len(self._buffer) >= self.max_pending:
+                    # Banco indisponível (o lote voltou para o buffer): não crescer sem limite
+                    self.dropped += 1
+                    return False
+                self._buffer.append(row)
+                pending = len(self._buffer)
+        if pending >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """Grava tudo que está no buffer (INSERT em lote de até batch_size linhas por vez)"""
+        from sqlalchemy import insert
+        from app.models.document_log import DocumentLog
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    rows = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not rows:
+                    return written
+                db = self._session_factory()
+                try:
+                    db.execute(insert(DocumentLog), rows)
+                    db.commit()
+                    written += len(rows)
+                    self.written += len(rows)
+                    self._last_failed = False
+                except Exception as e:
+                    db.rollback()
+                    self.failures += 1
+                    if _is_unavailable(e) and not self._database_up():
+                        # Banco fora: o lote volta para o buffer e espera o próximo ciclo
+                        self._last_failed = True
+                        self._requeue(rows)
+                        logger.error(f"Erro ao gravar {len(rows)} logs de auditoria: {e}")
+                        return written
+                    # Linha inválida no lote: isolar uma a uma para não travar o buffer
+                    ok, requeued = self._write_one_by_one(db, rows)
+                    written += ok
+                    if requeued:
+                        return written
+                finally:
+                    db.close()
+
+    def _write_one_by_one(self, db, rows: List[Dict]) -> tuple:
+        """
+        Regrava um lote que falhou linha a linha. Linhas que falham de novo são
+        descartadas com log (dead letter); se o banco cair no meio, o restante
+        volta para o buffer.
+
+        Returns:
+            (linhas gravadas, True se houve devolução ao buffer)
+        """
+        from sqlalchemy import insert
+        from app.models.document_log import DocumentLog
+
+        written = 0
+        for index, row in enumerate(rows):
+            try:
+                db.execute(insert(DocumentLog), [row])
+                db.commit()
+                written += 1
+            except Exception as e:
+                db.rollback()
+                # Erro "do banco" com o banco respondendo é erro da linha (ex: lock só dela)
+                if _is_unavailable(e) and not self._database_up():
+                    self._last_failed = True
+                    self._requeue(rows[index:])
+                    logger.error(f"Erro ao gravar {len(rows) - index} logs de auditoria: {e}")
+                    self.written += written
+                    return written, True
+                self.dead_lettered += 1
+                logger.error(
+                    f"Log de auditoria descartado (node_id={row.get('node_id')}, action={row.get('action')}, "
+                    f"user_id={row.get('user_id')}): {e} | {row!r}"
+                )
+        self.written += written
+        self._last_failed = False
+        return written, False
+
+    def _database_up(self) -> bool:
+        from sqlalchemy import text
+
+        db = self._session_factory()
+        try:
+            db.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+        finally:
+            db.close()
+
+    def _requeue(self, rows: List[Dict]) -> None:
+        """Devolve um lote que falhou para o início do buffer (o excedente é descartado)"""
+        with self._lock:
+            space = max(0, self.max_pending - len(self._buffer))
+            if space < len(rows):
+                self.dropped += len(rows) - space
+                rows = rows[:space]
+            self._buffer.extendleft(reversed(rows))
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Para a thread e grava o que sobrou no buffer"""
+        self._stopping.set()
+        self._wake.set()
+        self.join(timeout)
+        self.flush()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            # Acorda pelo tamanho (emit) ou pelo tempo
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro no flush de auditoria: {e}")
+            # Banco fora: não insistir em loop apertado (emit acorda a thread a cada lote)
+            if self._last_failed:
+                time.sleep(min(self.flush_seconds, 5.0))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+            "failures": self.failures
+        }
+
+
+_sink: Optional[AuditLogSink] = None
+
+
+def start_audit_sink() -> Optional[AuditLogSink]:
+    """Inicia o buffer de auditoria deste processo (startup da API), se habilitado"""
+    global _sink
+    if not settings.audit_log_buffer_enabled or _sink is not None:
+        return _sink
+    from app.core.conn import SessionLocal
+
+    _sink = AuditLogSink(
+        SessionLocal,
+        batch_size=settings.audit_log_batch_size,
+        flush_seconds=settings.audit_log_flush_seconds,
+        max_pending=settings.audit_log_max_pending,
+        overflow=settings.audit_log_overflow
+    )
+    _sink.start()
+    return _sink
+
+
+def stop_audit_sink(timeout: float = 10.0) -> None:
+    """Shutdown: para a thread e grava os eventos pendentes"""
+    global _sink
+    sink, _sink = _sink, None
+    if sink is not None:
+        sink.stop(timeout)
+
+
+def flush_audit_log() -> int:
+    """Grava agora os eventos pendentes (ex: antes de ler o histórico no mesmo processo)"""
+    return _sink.flush() if _sink is not None else 0
+
+
+def audit_sink() -> Optional[AuditLogSink]:
+    return _sink
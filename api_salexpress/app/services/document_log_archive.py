@@ -0,0 +1,424 @@
+import gzip
+import json
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.document_log import DocumentLog, DocumentAction, DocumentLogArchive, DocumentLogArchiveNode
+
+
+# ==========================================
+# RETENÇÃO E ARQUIVAMENTO DE DOCUMENT_LOGS
+# ==========================================
+#
+# OTIMIZADO: document_logs só crescia. No MySQL a tabela é particionada por mês
+# (RANGE COLUMNS em created_at, migration d7f3b1a9c264): consultas por período
+# leem só as partições do intervalo e um mês inteiro sai da tabela com
+# ALTER TABLE ... DROP PARTITION (instantâneo), sem DELETE linha a linha.
+#
+# run_archive (POST /storage-quota/logs/arquivar, via cron mensal):
+# 1. exporta cada mês anterior a document_logs_retention_months para um JSONL
+#    compactado com gzip no R2 (uma linha por log);
+# 2. registra o arquivo em document_log_archives e, em document_log_archive_nodes,
+#    os nodes presentes nele (a leitura sob demanda só baixa os meses do node);
+# 3. só então remove o mês do banco (DROP PARTITION; DELETE em lotes se a tabela
+#    não for particionada);
+# 4. cria as partições dos próximos meses (REORGANIZE da partição pmax).
+#
+# Uma execução interrompida entre 2 e 3 deixa o mês no banco: a próxima rodada
+# lê os ids do arquivo já enviado e exporta só os logs que faltam, então os
+# arquivos de um mesmo mês nunca se repetem (e os resumos abaixo podem ser somados).
+#
+# document_log_archive_nodes.resumo guarda, por ação, o total e o último log do
+# node no mês: o resumo de rastreabilidade soma os meses arquivados sem baixar
+# os arquivos (archived_summary).
+
+TABLE = "document_logs"
+EXPORT_BATCH = 5000
+DELETE_BATCH = 5000
+# Arquivos até esse tamanho ficam em memória antes do upload; acima disso, em disco
+SPOOL_MAX_BYTES = 64 * 1024 * 1024
+
+_COLUMNS = (
+    "id", "node_id", "action", "user_id", "user_type", "user_name", "user_email",
+    "details", "ip_address", "user_agent", "created_at"
+)
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(inicio: datetime) -> str:
+    return f"p{inicio:%Y%m}"
+
+
+def archive_key(inicio: datetime, now: Optional[datetime] = None) -> str:
+    """Key do arquivo do mês; o carimbo de data evita sobrescrever um arquivo anterior do mesmo mês"""
+    now = now or datetime.now()
+    prefix = settings.document_logs_archive_prefix.strip("/")
+    return f"{prefix}/{inicio:%Y}/{inicio:%Y-%m}-{now:%Y%m%d%H%M%S}.jsonl.gz"
+
+
+# ==========================================
+# PARTIÇÕES (MYSQL)
+# ==========================================
+
+def list_partitions(db: Session) -> List[Tuple[str, Optional[datetime]]]:
+    """
+    Partições de document_logs em ordem.
+
+    Returns:
+        [(nome, limite superior exclusivo ou None para MAXVALUE)]; vazio se a
+        tabela não for particionada (ou o banco não for MySQL)
+    """
+    if db.get_bind().dialect.name != "mysql":
+        return []
+    rows = db.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": TABLE}).all()
+    partitions = []
+    for name, description in rows:
+        bound = None
+        if description and description.upper() != "MAXVALUE":
+            bound = datetime.fromisoformat(description.strip("'"))
+        partitions.append((name, bound))
+    return partitions
+
+
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None, now: Optional[datetime] = None) -> List[str]:
+    """
+    Garante partições até o mês atual + months_ahead, dividindo a partição final
+    (MAXVALUE). Returns: nomes das partições criadas
+    """
+    partitions = list_partitions(db)
+    if not partitions or partitions[-1][1] is not None:
+        return []
+    months_ahead = settings.document_logs_partitions_ahead if months_ahead is None else months_ahead
+    current = month_start(now or datetime.now())
+    bound = max((b for _, b in partitions if b is not None), default=current)
+    target = add_months(current, months_ahead + 1)
+
+    created = []
+    definitions = []
+    while bound < target:
+        created.append(partition_name(bound))
+        bound = add_months(bound, 1)
+        definitions.append(f"PARTITION {created[-1]} VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')")
+    if definitions:
+        last = partitions[-1][0]
+        db.execute(text(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION {last} INTO "
+            f"({', '.join(definitions)}, PARTITION {last} VALUES LESS THAN (MAXVALUE))"
+        ))
+    return created
+
+
+def _remove_until(db: Session, fim: datetime) -> None:
+    """Remove do banco os logs anteriores a `fim` (já arquivados)"""
+    partitions = list_partitions(db)
+    if partitions:
+        # Partição inteira abaixo de `fim`: só contém logs exportados
+        drop = [name for name, bound in partitions if bound is not None and bound <= fim]
+        if drop:
+            db.execute(text(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(drop)}"))
+        return
+
+    while True:
+        ids = [log_id for (log_id,) in db.query(DocumentLog.id).filter(DocumentLog.created_at < fim).limit(DELETE_BATCH)]
+        if not ids:
+            return
+        db.query(DocumentLog).filter(DocumentLog.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+# ==========================================
+# EXPORTAÇÃO
+# ==========================================
+
+def _to_row(log: DocumentLog) -> Dict:
+    row = {column: getattr(log, column) for column in _COLUMNS}
+    row["created_at"] = log.created_at.isoformat() if log.created_at else None
+    return row
+
+
+def _version_key(log: DocumentLog) -> Optional[str]:
+    """Key da versão substituída de um log version_uploaded (protegida da coleta de órfãos)"""
+    from app.utils.cloudflare_r2 import key_from_url
+
+    details = log.details
+    if isinstance(details, str):
+        try:
+            details = json.loads(details)
+        except ValueError:
+            return None
+    old_version = details.get("old_version") if isinstance(details, dict) else None
+    return key_from_url(old_version.get("url")) if isinstance(old_version, dict) else None
+
+
+def _add_to_summary(resumo: Dict[str, Dict], row: Dict) -> None:
+    """Soma um log (dict de _to_row) no resumo do node: {action: {"total", "ultimo"}}"""
+    entry = resumo.setdefault(row["action"], {"total": 0, "ultimo": None})
+    entry["total"] += 1
+    ultimo = entry["ultimo"]
+    if ultimo is None or (row["created_at"] or "", row["id"]) >= (ultimo["created_at"] or "", ultimo["id"]):
+        entry["ultimo"] = json.loads(json.dumps(row, default=str))
+
+
+def _export(db: Session, fim: datetime, file_obj, skip_ids: Optional[set] = None) -> Dict:
+    """
+    Grava em file_obj (gzip, JSONL) os logs anteriores a `fim`, em ordem de id,
+    exceto skip_ids (logs já presentes em outro arquivo do mês).
+
+    Lê em lotes de EXPORT_BATCH por faixa de id (id > último lido), só as colunas:
+    o mysqlconnector não tem cursor do lado do servidor e yield_per traria o mês
+    inteiro para a memória no execute.
+    """
+    nodes: Dict[int, int] = {}
+    resumos: Dict[int, Dict[str, Dict]] = {}
+    version_keys = set()
+    total = 0
+    columns = [getattr(DocumentLog, column) for column in _COLUMNS]
+    last_id = 0
+    with gzip.GzipFile(fileobj=file_obj, mode="wb") as gz:
+        while True:
+            batch = db.query(*columns).filter(
+                DocumentLog.created_at < fim, DocumentLog.id > last_id
+            ).order_by(DocumentLog.id).limit(EXPORT_BATCH).all()
+            if not batch:
+                break
+            for log in batch:
+                if skip_ids and log.id in skip_ids:
+                    continue
+                row = _to_row(log)
+                gz.write(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+                nodes[log.node_id] = nodes.get(log.node_id, 0) + 1
+                _add_to_summary(resumos.setdefault(log.node_id, {}), row)
+                if log.action == DocumentAction.VERSION_UPLOADED:
+                    key = _version_key(log)
+                    if key:
+                        version_keys.add(key)
+                total += 1
+            last_id = batch[-1].id
+            if len(batch) < EXPORT_BATCH:
+                break
+    return {"registros": total, "nodes": nodes, "resumos": resumos, "version_keys": sorted(version_keys)}
+
+
+def archive_month(db: Session, inicio: datetime, dry_run: bool = False) -> Dict:
+    """
+    Arquiva no R2 os logs anteriores ao fim do mês `inicio` e os remove do banco.
+
+    Returns:
+        {"periodo", "registros", "bytes", "key"} (key None se nada foi enviado)
+    """
+    from app.utils.cloudflare_r2 import upload_object
+
+    fim = add_months(inicio, 1)
+    periodo = f"{inicio:%Y-%m}"
+    if dry_run:
+        total = db.query(func.count(DocumentLog.id)).filter(
+            DocumentLog.created_at >= inicio, DocumentLog.created_at < fim
+        ).scalar() or 0
+        return {"periodo": periodo, "registros": total, "bytes": 0, "key": None}
+
+    # Execução anterior interrompida antes da remoção: não exportar de novo o que já está no R2
+    skip_ids = set()
+    for (key,) in db.query(DocumentLogArchive.object_key).filter(DocumentLogArchive.periodo == periodo):
+        skip_ids.update(row["id"] for row in iter_archive(key))
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as tmp:
+        exported = _export(db, fim, tmp, skip_ids)
+        size = tmp.tell()
+        db.rollback()  # Encerra a leitura antes do DDL/commit abaixo
+        report = {"periodo": periodo, "registros": exported["registros"], "bytes": 0, "key": None}
+        if not exported["registros"]:
+            _remove_until(db, fim)
+            return report
+
+        key = archive_key(inicio)
+        tmp.seek(0)
+        result = upload_object(tmp, key, "application/gzip")
+        if not result.get("success"):
+            raise RuntimeError(f"Falha ao enviar o arquivo de {periodo} para o R2: {result.get('error')}")
+
+    # Catálogo gravado antes de remover os logs: nenhum log fica sem cópia
+    archive = DocumentLogArchive(
+        periodo=periodo,
+        inicio=inicio,
+        fim=fim,
+        object_key=key,
+        total_registros=exported["registros"],
+        tamanho_bytes=size,
+        version_keys=exported["version_keys"]
+    )
+    db.add(archive)
+    db.flush()
+    db.execute(insert(DocumentLogArchiveNode), [
+        {"archive_id": archive.id, "node_id": node_id, "total_registros": count, "resumo": exported["resumos"][node_id]}
+        for node_id, count in exported["nodes"].items()
+    ])
+    db.commit()
+
+    _remove_until(db, fim)
+    report.update(bytes=size, key=key)
+    return report
+
+
+def run_archive(
+    db: Session,
+    retention_months: Optional[int] = None,
+    max_months: Optional[int] = None,
+    dry_run: bool = False,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Arquiva os meses anteriores à retenção (do mais antigo para o mais novo) e
+    cria as partições futuras.
+
+    Args:
+        retention_months: meses mantidos no banco além do atual (padrão: settings.document_logs_retention_months)
+        max_months: limite de meses arquivados nesta execução
+        dry_run: apenas contar os logs que seriam arquivados
+
+    Returns:
+        {"corte", "meses": [{"periodo", "registros", "bytes", "key"}], "particoes_criadas"}
+    """
+    now = now or datetime.now()
+    retention = settings.document_logs_retention_months if retention_months is None else retention_months
+    cutoff = add_months(month_start(now), -max(retention, 0))
+    report = {"corte": cutoff.isoformat(), "meses": [], "particoes_criadas": []}
+
+    oldest = db.query(func.min(DocumentLog.created_at)).filter(DocumentLog.created_at < cutoff).scalar()
+    inicio = month_start(oldest) if oldest else cutoff
+    while inicio < cutoff and (max_months is None or len(report["meses"]) < max_months):
+        month = archive_month(db, inicio, dry_run=dry_run)
+        if month["registros"]:
+            report["meses"].append(month)
+        inicio = add_months(inicio, 1)
+
+    if not dry_run:
+        report["particoes_criadas"] = ensure_partitions(db, now=now)
+
+    total = sum(m["registros"] for m in report["meses"])
+    print(
+        f"🗄️ Arquivamento de document_logs{' (dry-run)' if dry_run else ''}: {len(report['meses'])} meses, "
+        f"{total} logs anteriores a {cutoff:%Y-%m}, {len(report['particoes_criadas'])} partições criadas"
+    )
+    return report
+
+
+# ==========================================
+# LEITURA SOB DEMANDA
+# ==========================================
+
+def iter_archive(key: str) -> Iterator[Dict]:
+    """Lê um arquivo do R2 em streaming, um log (dict) por linha"""
+    from app.utils.cloudflare_r2 import open_object
+
+    body = open_object(key)
+    try:
+        with gzip.GzipFile(fileobj=body, mode="rb") as gz:
+            for line in gz:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        body.close()
+
+
+def _from_row(row: Dict) -> DocumentLog:
+    """DocumentLog fora da sessão, para reaproveitar a formatação do histórico"""
+    values = {column: row.get(column) for column in _COLUMNS}
+    if values["created_at"]:
+        values["created_at"] = datetime.fromisoformat(values["created_at"])
+    return DocumentLog(**values)
+
+
+def archived_history(
+    db: Session,
+    node_id: int,
+    limit: Optional[int] = None,
+    action_filter: Optional[str] = None
+) -> List[DocumentLog]:
+    """
+    Logs arquivados de um node, mais recentes primeiro.
+
+    Só baixa os arquivos em que o node aparece (document_log_archive_nodes), do
+    mês mais novo para o mais antigo, e para assim que os meses restantes não
+    podem mais entrar entre os `limit` primeiros.
+    """
+    archives = db.query(DocumentLogArchive.object_key, DocumentLogArchive.fim).join(
+        DocumentLogArchiveNode, DocumentLogArchiveNode.archive_id == DocumentLogArchive.id
+    ).filter(
+        DocumentLogArchiveNode.node_id == node_id
+    ).order_by(DocumentLogArchive.fim.desc(), DocumentLogArchive.id.desc()).all()
+
+    found: Dict[int, DocumentLog] = {}
+    for key, fim in archives:
+        # Arquivos restantes só têm logs anteriores a `fim`
+        if limit is not None and sum(1 for log in found.values() if log.created_at >= fim) >= limit:
+            break
+        for row in iter_archive(key):
+            if row.get("node_id") != node_id or row.get("id") in found:
+                continue
+            if action_filter and row.get("action") != action_filter:
+                continue
+            found[row["id"]] = _from_row(row)
+
+    logs = sorted(found.values(), key=lambda log: (log.created_at, log.id), reverse=True)
+    return logs if limit is None else logs[:limit]
+
+
+def archived_summary(db: Session, node_id: int, actions: List[str]) -> Dict[str, Tuple[Optional[DocumentLog], int]]:
+    """
+    Total e último log arquivado de cada ação do node, a partir de
+    document_log_archive_nodes.resumo (sem baixar arquivos).
+
+    Meses arquivados antes do resumo existir (resumo NULL) são lidos do R2 uma
+    vez e o resumo é gravado. Arquivos do mesmo mês não repetem logs (ver
+    archive_month) e são somados.
+
+    Returns:
+        {action: (último DocumentLog fora da sessão ou None, total)}
+    """
+    entries = db.query(DocumentLogArchiveNode, DocumentLogArchive.object_key).join(
+        DocumentLogArchive, DocumentLogArchive.id == DocumentLogArchiveNode.archive_id
+    ).filter(
+        DocumentLogArchiveNode.node_id == node_id
+    ).order_by(DocumentLogArchive.id.desc()).all()
+
+    resultado: Dict[str, Tuple[Optional[DocumentLog], int]] = {action: (None, 0) for action in actions}
+    backfilled = False
+    for entry, key in entries:
+        if entry.resumo is None:
+            resumo: Dict[str, Dict] = {}
+            for row in iter_archive(key):
+                if row.get("node_id") == node_id:
+                    _add_to_summary(resumo, row)
+            entry.resumo = resumo
+            backfilled = True
+
+        for action in actions:
+            item = entry.resumo.get(action)
+            if not item:
+                continue
+            ultimo, total = resultado[action]
+            candidato = _from_row(item["ultimo"]) if item.get("ultimo") else None
+            if candidato is not None and (ultimo is None or (candidato.created_at, candidato.id) > (ultimo.created_at, ultimo.id)):
+                ultimo = candidato
+            resultado[action] = (ultimo, total + item["total"])
+
+    if backfilled:
+        db.commit()
+    return resultado
@@ -1,178 +1,354 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, case, exists, insert, tuple_
 from app.models.document_notification import DocumentFollower, DocumentNotification
 from app.models.storage import StorageNode
-from app.crud.document_notification import obter_email_usuario
-from app.services.email_service import set_email
+from app.crud.document_notification import obter_emails_usuarios_batch
+from app.core.config import settings
+from app.services.email_outbox import enqueue_email, enqueue_emails, notify_worker
 from datetime import datetime, timedelta, date
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Seguidores processados por transação: cada lote grava notificações e itens da fila
+# de e-mails juntos, e serve de checkpoint (ver verificar_e_notificar_vencimentos)
+VENCIMENTOS_LOTE = 500
+
+# Destinatários por transação no modo resumo (todos os alertas de cada um no mesmo lote)
+RESUMO_DESTINATARIOS_LOTE = 200
+
+MODO_IMEDIATO = "imediato"
+MODO_DIARIO = "diario"
+MODO_SEMANAL = "semanal"
+
+
+def _em_data_de_alerta(hoje: date, janela: int, dias_configurados: List[int]):
+    """
+    Seguidor/documento com alerta nos próximos `janela` dias (1 = só hoje):
+    vencido, vence na janela (alertar_no_vencimento) ou a data de "X dias antes" cai na janela.
+    Alertas "X dias antes": uma condição de intervalo por valor distinto configurado.
+    """
+    fim = hoje + timedelta(days=janela)
+    return or_(
+        StorageNode.data_validade < hoje,
+        and_(
+            DocumentFollower.alertar_no_vencimento == True,
+            StorageNode.data_validade >= hoje,
+            StorageNode.data_validade < fim
+        ),
+        *[
+            and_(
+                DocumentFollower.dias_antes_alerta == dias,
+                StorageNode.data_validade >= hoje + timedelta(days=dias),
+                StorageNode.data_validade < fim + timedelta(days=dias)
+            )
+            for dias in dias_configurados
+        ]
+    )
+
+
 def verificar_e_notificar_vencimentos(db: Session) -> Dict[str, int]:
     """
     Verifica documentos próximos do vencimento e envia notificações
     Deve ser executado diariamente via cron job
     
+    OTIMIZADO: varredura por conjuntos ao invés de 5+ queries e um envio por seguidor.
+    O banco devolve só os pares seguidor/documento que caem numa data de alerta hoje
+    (vencido, vence hoje ou vence em dias_antes_alerta dias) e que ainda não foram
+    notificados (anti-join em document_notifications). Por lote: emails em bulk,
+    INSERT em lote das notificações e dos e-mails (email_outbox) e um commit.
+    
+    Modo de notificação do seguidor (modo_notificacao):
+    - imediato: um email por alerta
+    - diario: um email de resumo por destinatário com os alertas do dia
+    - semanal: no dia settings.notificacao_resumo_dia_semana, um resumo com os
+      alertas dos próximos 7 dias e os documentos vencidos
+    
+    Cada lote commitado é um checkpoint: se o processo cair no meio, os lotes já
+    gravados são excluídos pelo anti-join na próxima execução e o lote em andamento
+    é desfeito inteiro (nada foi enviado, o envio é feito pela fila após o commit).
+    
     Retorna estatísticas do processamento
     """
     hoje = date.today()
     notificacoes_enviadas = 0
     notificacoes_falhadas = 0
+    documentos_verificados = 0
+    resumos_enfileirados = 0
     
-    # Buscar todos os seguidores ativos
-    seguidores = db.query(DocumentFollower, StorageNode).join(
-        StorageNode, DocumentFollower.node_id == StorageNode.id
-    ).filter(
-        and_(
-            DocumentFollower.ativo == True,
-            StorageNode.data_validade != None
-        )
-    ).all()
+    dias_configurados = [
+        dias for (dias,) in db.query(DocumentFollower.dias_antes_alerta).filter(
+            DocumentFollower.ativo == True
+        ).distinct().all()
+        if dias is not None and dias >= 0
+    ]
+    semanal = DocumentFollower.modo_notificacao == MODO_SEMANAL
+    em_data_de_alerta = and_(~semanal, _em_data_de_alerta(hoje, 1, dias_configurados))
+    if hoje.weekday() == settings.notificacao_resumo_dia_semana:
+        em_data_de_alerta = or_(em_data_de_alerta, and_(semanal, _em_data_de_alerta(hoje, 7, dias_configurados)))
     
-    for seguidor, documento in seguidores:
+    tipo_notificacao = case(
+        (StorageNode.data_validade < hoje, "VENCIDO"),
+        (and_(
+            DocumentFollower.alertar_no_vencimento == True,
+            or_(
+                StorageNode.data_validade == hoje,
+                and_(semanal, StorageNode.data_validade < hoje + timedelta(days=7))
+            )
+        ), "NO_VENCIMENTO"),
+        else_="DIAS_ANTES"
+    )
+    # Já notificado (enviada ou ainda na fila) nas últimas 24h: não repetir
+    ontem = datetime.now() - timedelta(days=1)
+    ja_notificado = exists().where(
+        DocumentNotification.node_id == StorageNode.id,
+        DocumentNotification.user_id == DocumentFollower.user_id,
+        DocumentNotification.tipo_usuario == DocumentFollower.tipo_usuario,
+        DocumentNotification.tipo_notificacao == tipo_notificacao,
+        DocumentNotification.created_at >= ontem,
+        or_(DocumentNotification.enviada == True, DocumentNotification.erro_envio.is_(None))
+    )
+    filtros = (
+        DocumentFollower.ativo == True,
+        StorageNode.data_validade != None,
+        em_data_de_alerta,
+        ~ja_notificado
+    )
+    
+    def consultar_candidatos(*filtros_extras):
+        return db.query(
+            DocumentFollower.id,
+            DocumentFollower.user_id,
+            DocumentFollower.tipo_usuario,
+            DocumentFollower.modo_notificacao,
+            StorageNode.id.label("node_id"),
+            StorageNode.name,
+            StorageNode.url,
+            StorageNode.data_validade,
+            tipo_notificacao.label("tipo_notificacao")
+        ).join(
+            StorageNode, DocumentFollower.node_id == StorageNode.id
+        ).filter(*filtros, *filtros_extras)
+    
+    # 1. Modo imediato: um email por alerta
+    ultimo_id = 0
+    while True:
+        # Paginação por id do seguidor: seguidores sem email não voltam no próximo lote
+        candidatos = consultar_candidatos(
+            DocumentFollower.modo_notificacao == MODO_IMEDIATO,
+            DocumentFollower.id > ultimo_id
+        ).order_by(DocumentFollower.id).limit(VENCIMENTOS_LOTE).all()
+        
+        if not candidatos:
+            break
+        ultimo_id = candidatos[-1].id
+        documentos_verificados += len(candidatos)
+        
         try:
-            # Calcular dias para vencimento
-            dias_para_vencimento = (documento.data_validade - hoje).days
-            
-            # Verificar se deve notificar
-            deve_notificar = False
-            tipo_notificacao = None
-            
-            if dias_para_vencimento < 0:
-                # Documento vencido - notificar apenas uma vez
-                tipo_notificacao = "VENCIDO"
-                deve_notificar = not _ja_foi_notificado(db, seguidor, documento, tipo_notificacao)
-                
-            elif dias_para_vencimento == 0 and seguidor.alertar_no_vencimento:
-                # Vence hoje
-                tipo_notificacao = "NO_VENCIMENTO"
-                deve_notificar = not _ja_foi_notificado(db, seguidor, documento, tipo_notificacao)
-                
-            elif dias_para_vencimento == seguidor.dias_antes_alerta:
-                # X dias antes do vencimento
-                tipo_notificacao = "DIAS_ANTES"
-                deve_notificar = not _ja_foi_notificado(db, seguidor, documento, tipo_notificacao)
-            
-            if deve_notificar:
-                # Enviar notificação
-                sucesso = _enviar_notificacao_vencimento(
-                    db=db,
-                    seguidor=seguidor,
-                    documento=documento,
-                    tipo_notificacao=tipo_notificacao,
-                    dias_para_vencimento=dias_para_vencimento
-                )
-                
-                if sucesso:
-                    notificacoes_enviadas += 1
-                else:
-                    notificacoes_falhadas += 1
-                    
+            enviadas, falhadas = _notificar_lote(db, candidatos, hoje, ontem)
+            notificacoes_enviadas += enviadas
+            notificacoes_falhadas += falhadas
         except Exception as e:
-            logger.error(f"Erro ao processar seguidor {seguidor.id}: {str(e)}")
-            notificacoes_falhadas += 1
+            db.rollback()
+            logger.error(f"Erro ao processar lote de vencimentos (seguidores até {ultimo_id}): {str(e)}")
+            notificacoes_falhadas += len(candidatos)
+    
+    # 2. Modos diário/semanal: um resumo por destinatário
+    ultimo_destinatario = (0, "")
+    while True:
+        # Paginação por destinatário: todos os alertas de um usuário entram no mesmo resumo
+        user_id, tipo_usuario = ultimo_destinatario
+        destinatarios = db.query(
+            DocumentFollower.user_id,
+            DocumentFollower.tipo_usuario
+        ).join(
+            StorageNode, DocumentFollower.node_id == StorageNode.id
+        ).filter(
+            *filtros,
+            DocumentFollower.modo_notificacao != MODO_IMEDIATO,
+            or_(
+                DocumentFollower.user_id > user_id,
+                and_(DocumentFollower.user_id == user_id, DocumentFollower.tipo_usuario > tipo_usuario)
+            )
+        ).distinct().order_by(
+            DocumentFollower.user_id, DocumentFollower.tipo_usuario
+        ).limit(RESUMO_DESTINATARIOS_LOTE).all()
+        
+        if not destinatarios:
+            break
+        ultimo_destinatario = tuple(destinatarios[-1])
+        candidatos = consultar_candidatos(
+            DocumentFollower.modo_notificacao != MODO_IMEDIATO,
+            tuple_(DocumentFollower.user_id, DocumentFollower.tipo_usuario).in_([tuple(d) for d in destinatarios])
+        ).order_by(StorageNode.data_validade, StorageNode.name).all()
+        documentos_verificados += len(candidatos)
+        
+        try:
+            enviadas, falhadas, resumos = _notificar_resumos(db, candidatos, hoje)
+            notificacoes_enviadas += enviadas
+            notificacoes_falhadas += falhadas
+            resumos_enfileirados += resumos
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao processar resumos de vencimento (destinatários até {ultimo_destinatario}): {str(e)}")
+            notificacoes_falhadas += len(candidatos)
     
     return {
-        "documentos_verificados": len(seguidores),
+        "documentos_verificados": documentos_verificados,
         "notificacoes_enviadas": notificacoes_enviadas,
-        "notificacoes_falhadas": notificacoes_falhadas
+        "notificacoes_falhadas": notificacoes_falhadas,
+        "resumos_enfileirados": resumos_enfileirados
     }
 
-def _ja_foi_notificado(db: Session, seguidor: DocumentFollower, documento: StorageNode, tipo_notificacao: str) -> bool:
+def _linha_notificacao(c, email: str, hoje: date, email_outbox_id: Optional[int] = None) -> Dict:
+    """Linha de document_notifications para um candidato (INSERT em lote)"""
+    return {
+        "node_id": c.node_id,
+        "user_id": c.user_id,
+        "tipo_usuario": c.tipo_usuario,
+        "email_destinatario": email,
+        "tipo_notificacao": c.tipo_notificacao,
+        "dias_para_vencimento": (c.data_validade - hoje).days,
+        "documento_nome": c.name,
+        "documento_data_validade": datetime.combine(c.data_validade, datetime.min.time()),
+        "enviada": False,
+        "email_outbox_id": email_outbox_id
+    }
+
+def _notificar_lote(db: Session, candidatos: List, hoje: date, ontem: datetime) -> Tuple[int, int]:
     """
-    Verifica se já foi enviada uma notificação deste tipo para este documento/seguidor
+    Grava as notificações de um lote de candidatos e enfileira os emails (email_outbox)
+    na mesma transação. A notificação é marcada como enviada pelo worker da fila
+    quando o e-mail sair.
+    
+    Returns:
+        (notificações enfileiradas, seguidores sem email)
     """
-    # Para vencimentos, verificar apenas nas últimas 24h para não spam
-    ontem = datetime.now() - timedelta(days=1)
+    emails = obter_emails_usuarios_batch(db, [(c.user_id, c.tipo_usuario) for c in candidatos])
     
-    notificacao_existente = db.query(DocumentNotification).filter(
-        and_(
-            DocumentNotification.node_id == documento.id,
-            DocumentNotification.user_id == seguidor.user_id,
-            DocumentNotification.tipo_usuario == seguidor.tipo_usuario,
-            DocumentNotification.tipo_notificacao == tipo_notificacao,
-            DocumentNotification.created_at >= ontem,
-            DocumentNotification.enviada == True
-        )
-    ).first()
+    notificacoes = []
+    chaves = set()
+    falhadas = 0
+    for c in candidatos:
+        chave = (c.node_id, c.user_id, c.tipo_usuario, c.tipo_notificacao)
+        if chave in chaves:
+            continue  # Seguidor duplicado: uma notificação por documento/usuário
+        chaves.add(chave)
+        email = emails.get((c.user_id, c.tipo_usuario))
+        if not email:
+            logger.error(f"Email não encontrado para user_id={c.user_id}, tipo={c.tipo_usuario}")
+            falhadas += 1
+            continue
+        notificacoes.append(_linha_notificacao(c, email, hoje))
+    if not notificacoes:
+        return 0, falhadas
     
-    return notificacao_existente is not None
-
-def _enviar_notificacao_vencimento(
-    db: Session,
-    seguidor: DocumentFollower,
-    documento: StorageNode,
-    tipo_notificacao: str,
-    dias_para_vencimento: int
-) -> bool:
-    """
-    Envia email de notificação de vencimento
-    """
-    # Obter email do usuário
-    email = obter_email_usuario(db, seguidor.user_id, seguidor.tipo_usuario)
+    db.execute(insert(DocumentNotification), notificacoes)
     
-    if not email:
-        logger.error(f"Email não encontrado para user_id={seguidor.user_id}, tipo={seguidor.tipo_usuario}")
-        return False
+    # IDs das notificações recém-criadas (o anti-join garante que são as únicas
+    # pendentes nas últimas 24h para cada chave)
+    chaves = [(n["node_id"], n["user_id"], n["tipo_usuario"], n["tipo_notificacao"]) for n in notificacoes]
+    criadas = db.query(
+        DocumentNotification.id,
+        DocumentNotification.node_id,
+        DocumentNotification.user_id,
+        DocumentNotification.tipo_usuario,
+        DocumentNotification.tipo_notificacao
+    ).filter(
+        tuple_(
+            DocumentNotification.node_id,
+            DocumentNotification.user_id,
+            DocumentNotification.tipo_usuario,
+            DocumentNotification.tipo_notificacao
+        ).in_(chaves),
+        DocumentNotification.created_at >= ontem,
+        DocumentNotification.enviada == False,
+        DocumentNotification.erro_envio.is_(None)
+    ).all()
+    ids = {(r.node_id, r.user_id, r.tipo_usuario, r.tipo_notificacao): r.id for r in criadas}
     
-    # Criar registro de notificação
-    notificacao = DocumentNotification(
-        node_id=documento.id,
-        user_id=seguidor.user_id,
-        tipo_usuario=seguidor.tipo_usuario,
-        email_destinatario=email,
-        tipo_notificacao=tipo_notificacao,
-        dias_para_vencimento=dias_para_vencimento,
-        documento_nome=documento.name,
-        documento_data_validade=datetime.combine(documento.data_validade, datetime.min.time()),
-        enviada=False
-    )
+    urls = {c.node_id: c.url for c in candidatos}
+    mensagens = []
+    for n, chave in zip(notificacoes, chaves):
+        mensagens.append({
+            "destinatarios": n["email_destinatario"],
+            "assunto": _assunto_vencimento(n["documento_nome"], n["tipo_notificacao"], n["dias_para_vencimento"]),
+            "mensagem": _gerar_email_vencimento_html(
+                documento_nome=n["documento_nome"],
+                documento_url=urls[n["node_id"]],
+                data_validade=n["documento_data_validade"].date(),
+                tipo_notificacao=n["tipo_notificacao"],
+                dias_para_vencimento=n["dias_para_vencimento"]
+            ),
+            "origem": "vencimento",
+            "notification_id": ids.get(chave)
+        })
     
-    db.add(notificacao)
+    # Notificações e itens da fila no mesmo commit (checkpoint do lote)
+    enqueue_emails(db, mensagens, commit=False)
     db.commit()
-    db.refresh(notificacao)
+    notify_worker()
+    return len(notificacoes), falhadas
+
+def _notificar_resumos(db: Session, candidatos: List, hoje: date) -> Tuple[int, int, int]:
+    """
+    Modo resumo: um email por destinatário com todos os seus alertas do lote.
+    Cada resumo entra na fila (email_outbox) e as notificações apontam para ele
+    (email_outbox_id), para o worker marcá-las como enviadas juntas.
     
-    # Gerar HTML do email
-    html_email = _gerar_email_vencimento_html(
-        documento_nome=documento.name,
-        documento_url=documento.url,
-        data_validade=documento.data_validade,
-        tipo_notificacao=tipo_notificacao,
-        dias_para_vencimento=dias_para_vencimento
-    )
+    Returns:
+        (notificações no resumo, alertas de destinatários sem email, resumos enfileirados)
+    """
+    emails = obter_emails_usuarios_batch(db, [(c.user_id, c.tipo_usuario) for c in candidatos])
     
-    # Definir assunto
-    if tipo_notificacao == "VENCIDO":
-        assunto = f"⚠️ Documento VENCIDO: {documento.name}"
-    elif tipo_notificacao == "NO_VENCIMENTO":
-        assunto = f"🔔 Documento vence HOJE: {documento.name}"
-    else:
-        assunto = f"📅 Documento vence em {dias_para_vencimento} dias: {documento.name}"
+    por_destinatario = {}
+    for c in candidatos:
+        eventos = por_destinatario.setdefault((c.user_id, c.tipo_usuario), {})
+        # Seguidor duplicado: uma notificação por documento/usuário
+        eventos.setdefault((c.node_id, c.tipo_notificacao), c)
     
-    # Enviar email
-    try:
-        sucesso = set_email(
+    resumos = []
+    falhadas = 0
+    for (user_id, tipo_usuario), eventos in por_destinatario.items():
+        email = emails.get((user_id, tipo_usuario))
+        if not email:
+            logger.error(f"Email não encontrado para user_id={user_id}, tipo={tipo_usuario}")
+            falhadas += len(eventos)
+            continue
+        eventos = list(eventos.values())
+        semanal = all(e.modo_notificacao == MODO_SEMANAL for e in eventos)
+        item = enqueue_email(
+            db,
             destinatarios=email,
-            assunto=assunto,
-            mensagem=html_email
+            assunto=f"📋 Resumo {'semanal' if semanal else 'diário'} de vencimentos: {len(eventos)} documento(s)",
+            mensagem=_gerar_email_resumo_html(eventos, hoje, semanal),
+            origem="vencimento_resumo",
+            commit=False
         )
-        
-        if sucesso:
-            notificacao.enviada = True
-            notificacao.enviada_em = datetime.now()
-        else:
-            notificacao.erro_envio = "Erro ao enviar email"
-        
-        db.commit()
-        return sucesso
-        
-    except Exception as e:
-        notificacao.erro_envio = str(e)
-        db.commit()
-        logger.error(f"Erro ao enviar email: {str(e)}")
-        return False
+        resumos.append((item, email, eventos))
+    if not resumos:
+        return 0, falhadas, 0
+    
+    db.flush()  # IDs dos resumos na fila (um INSERT por destinatário, não por documento)
+    notificacoes = [
+        _linha_notificacao(c, email, hoje, email_outbox_id=item.id)
+        for item, email, eventos in resumos
+        for c in eventos
+    ]
+    db.execute(insert(DocumentNotification), notificacoes)
+    
+    # Notificações e resumos no mesmo commit (checkpoint do lote)
+    db.commit()
+    notify_worker()
+    return len(notificacoes), falhadas, len(resumos)
+
+def _assunto_vencimento(documento_nome: str, tipo_notificacao: str, dias_para_vencimento: int) -> str:
+    if tipo_notificacao == "VENCIDO":
+        return f"⚠️ Documento VENCIDO: {documento_nome}"
+    elif tipo_notificacao == "NO_VENCIMENTO":
+        return f"🔔 Documento vence HOJE: {documento_nome}"
+    return f"📅 Documento vence em {dias_para_vencimento} dias: {documento_nome}"
 
 def _gerar_email_vencimento_html(
     documento_nome: str,
@@ -320,6 +496,135 @@ def _gerar_email_vencimento_html(
     </html>
     '''
 
+def _gerar_email_resumo_html(eventos: List, hoje: date, semanal: bool) -> str:
+    """
+    Gera o HTML do email de resumo (modo diário/semanal): uma linha por documento,
+    vencidos primeiro e depois por data de validade
+    """
+    linhas = []
+    for e in sorted(eventos, key=lambda e: (e.data_validade, e.name or "")):
+        dias = (e.data_validade - hoje).days
+        if dias < 0:
+            situacao, cor = f"VENCIDO há {-dias} dia(s)", "#f44336"
+        elif dias == 0:
+            situacao, cor = "Vence HOJE", "#ff9800"
+        else:
+            situacao, cor = f"Vence em {dias} dia(s)", "#e98344"
+        linhas.append(f'''
+                <tr>
+                    <td style="border-left: 4px solid {cor};"><a href="{e.url if e.url else '#'}">{e.name}</a></td>
+                    <td>{e.data_validade.strftime("%d/%m/%Y")}</td>
+                    <td style="color: {cor}; font-weight: bold;">{situacao}</td>
+                </tr>''')
+    
+    vencidos = sum(1 for e in eventos if e.data_validade < hoje)
+    periodo = "desta semana" if semanal else "de hoje"
+    
+    return f'''
+    <!DOCTYPE html>
+    <html lang="pt-BR">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>Resumo de Vencimentos - Salexpress</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                background-color: #f4f4f4;
+                margin: 0;
+                padding: 0;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 20px auto;
+                background: #ffffff;
+                padding: 30px;
+                border-radius: 10px;
+                box-shadow: 0px 0px 15px rgba(0, 0, 0, 0.1);
+            }}
+            .logo {{
+                text-align: center;
+                margin-bottom: 20px;
+            }}
+            .logo img {{
+                max-width: 150px;
+            }}
+            .alert-box {{
+                background: #e98344;
+                color: white;
+                padding: 20px;
+                border-radius: 8px;
+                text-align: center;
+                margin: 20px 0;
+            }}
+            .alert-box h1 {{
+                margin: 0;
+                font-size: 24px;
+            }}
+            table {{
+                width: 100%;
+                border-collapse: collapse;
+                margin: 20px 0;
+            }}
+            th, td {{
+                padding: 10px;
+                text-align: left;
+                border-bottom: 1px solid #e0e0e0;
+                color: #333;
+                font-size: 14px;
+            }}
+            th {{
+                background: #f8f8f8;
+            }}
+            .footer {{
+                text-align: center;
+                margin-top: 30px;
+                padding-top: 20px;
+                border-top: 1px solid #e0e0e0;
+                color: #888;
+                font-size: 13px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="logo">
+                <img src="https://Salexpress.com/aplicativorelatorios/assets/images/logo2%204.png" alt="Salexpress">
+            </div>
+            
+            <div class="alert-box">
+                <h1>📋 Resumo de Vencimentos</h1>
+            </div>
+            
+            <p>Olá,</p>
+            
+            <p>Estes são os alertas {periodo} dos documentos que você segue:
+            <strong>{len(eventos)} documento(s)</strong>, {vencidos} vencido(s).</p>
+            
+            <table>
+                <tr>
+                    <th>Documento</th>
+                    <th>Validade</th>
+                    <th>Situação</th>
+                </tr>{"".join(linhas)}
+            </table>
+            
+            <p style="font-size: 14px; color: #666;">
+                <strong>Importante:</strong> Tome as providências necessárias para renovar ou atualizar estes documentos.
+            </p>
+            
+            <div class="footer">
+                <p>Salexpress - Sistema de Gestão Documental</p>
+                <p style="font-size: 11px;">
+                    Você está recebendo este resumo porque segue estes documentos.<br>
+                    Para receber um email por alerta ou deixar de receber notificações, acesse o sistema.
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    '''
+
 def notificar_proprietario_documento(db: Session, node_id: int) -> bool:
     """
     Notifica o proprietário de um documento sobre vencimento
@@ -0,0 +1,349 @@
+import hashlib
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# FILA DE E-MAILS (OUTBOX)
+# ==========================================
+#
+# OTIMIZADO: os endpoints não esperam mais o serviço de e-mail (antes um
+# requests.post com timeout de 150s dentro da requisição). enqueue_email grava
+# a mensagem em email_outbox e acorda o worker, que:
+# - reserva um lote com SELECT ... FOR UPDATE SKIP LOCKED (vários processos/máquinas
+#   podem rodar o worker sem enviar a mesma mensagem duas vezes);
+# - agrupa destinatários de mensagens idênticas (mesmo assunto + corpo) em um envio;
+# - envia os grupos em paralelo por uma sessão HTTP com pool de conexões;
+# - reagenda as falhas com backoff exponencial até email_outbox_max_attempts.
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# Tempo de reserva de um lote: passado isso, mensagens "sending" (worker caiu no
+# meio do envio) voltam a ser elegíveis
+SENDING_LEASE_SECONDS = 300
+
+
+def _content_hash(assunto: str, mensagem: str) -> str:
+    return hashlib.sha256(f"{assunto}\0{mensagem}".encode("utf-8")).hexdigest()
+
+
+def enqueue_email(
+    db: Session,
+    destinatarios: Union[str, List[str]],
+    assunto: str,
+    mensagem: str,
+    origem: Optional[str] = None,
+    notification_id: Optional[int] = None,
+    commit: bool = True
+) -> EmailOutbox:
+    """
+    Enfileira um e-mail para envio pelo worker.
+
+    Args:
+        commit: False para gravar na transação do chamador (o worker só é acordado
+                no próximo ciclo ou por notify_worker() após o commit)
+    """
+    if isinstance(destinatarios, str):
+        destinatarios = [destinatarios]
+    item = EmailOutbox(
+        destinatarios=[d for d in destinatarios if d],
+        assunto=assunto,
+        mensagem=mensagem,
+        conteudo_hash=_content_hash(assunto, mensagem),
+        origem=origem,
+        notification_id=notification_id,
+        status=STATUS_PENDING,
+        tentativas=0,
+        next_attempt_at=datetime.now()
+    )
+    db.add(item)
+    if commit:
+        db.commit()
+        db.refresh(item)
+        notify_worker()
+    return item
+
+
+def enqueue_emails(db: Session, messages: List[Dict], commit: bool = True) -> int:
+    """
+    Enfileira vários e-mails com um único INSERT em lote.
+
+    Args:
+        messages: [{"destinatarios", "assunto", "mensagem", "origem"?, "notification_id"?}]
+        commit: False para gravar na transação do chamador (ver enqueue_email)
+
+    Returns:
+        Quantidade de mensagens enfileiradas
+    """
+    from sqlalchemy import insert
+
+    if not messages:
+        return 0
+    now = datetime.now()
+    rows = []
+    for message in messages:
+        destinatarios = message["destinatarios"]
+        if isinstance(destinatarios, str):
+            destinatarios = [destinatarios]
+        rows.append({
+            "destinatarios": [d for d in destinatarios if d],
+            "assunto": message["assunto"],
+            "mensagem": message["mensagem"],
+            "conteudo_hash": _content_hash(message["assunto"], message["mensagem"]),
+            "origem": message.get("origem"),
+            "notification_id": message.get("notification_id"),
+            "status": STATUS_PENDING,
+            "tentativas": 0,
+            "next_attempt_at": now,
+        })
+    db.execute(insert(EmailOutbox), rows)
+    if commit:
+        db.commit()
+        notify_worker()
+    return len(rows)
+
+
+def get_email_status(db: Session, email_id: int) -> Optional[Dict]:
+    item = db.query(EmailOutbox).filter(EmailOutbox.id == email_id).first()
+    if not item:
+        return None
+    return {
+        "id": item.id,
+        "status": item.status,
+        "destinatarios": item.destinatarios,
+        "assunto": item.assunto,
+        "origem": item.origem,
+        "tentativas": item.tentativas,
+        "proxima_tentativa": item.next_attempt_at if item.status in (STATUS_PENDING, STATUS_SENDING) else None,
+        "ultimo_erro": item.ultimo_erro,
+        "created_at": item.created_at,
+        "enviada_em": item.enviada_em,
+    }
+
+
+def outbox_stats(db: Session) -> Dict[str, int]:
+    from sqlalchemy import func
+
+    rows = db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+    stats = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+    stats.update({status: count for status, count in rows})
+    return stats
+
+
+# ==========================================
+# ENVIO
+# ==========================================
+
+def _claim_batch(db: Session, limit: int) -> List[Dict]:
+    """
+    Reserva mensagens vencidas (pendentes ou com reserva expirada) para este worker.
+    Retorna cópias simples das linhas: nada é recarregado do banco após o commit.
+    """
+    now = datetime.now()
+    items = db.query(EmailOutbox).filter(
+        EmailOutbox.status.in_((STATUS_PENDING, STATUS_SENDING)),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit).with_for_update(skip_locked=True).all()
+
+    claimed = []
+    for item in items:
+        item.status = STATUS_SENDING
+        item.tentativas += 1
+        item.next_attempt_at = now + timedelta(seconds=SENDING_LEASE_SECONDS)
+        claimed.append({
+            "id": item.id,
+            "destinatarios": list(item.destinatarios or []),
+            "assunto": item.assunto,
+            "mensagem": item.mensagem,
+            "conteudo_hash": item.conteudo_hash,
+            "tentativas": item.tentativas,
+            "notification_id": item.notification_id,
+        })
+    db.commit()
+    return claimed
+
+
+def _group_messages(items: List[Dict], max_recipients: int) -> List[Dict]:
+    """
+    Agrupa mensagens idênticas (conteudo_hash) em envios de até max_recipients
+    destinatários. Returns: [{"items", "destinatarios", "assunto", "mensagem"}]
+    """
+    groups = []
+    open_groups = {}
+    for item in items:
+        group = open_groups.get(item["conteudo_hash"])
+        recipients = [r for r in item["destinatarios"] if r]
+        if group is None or len(group["destinatarios"]) + len(recipients) > max_recipients:
+            group = {"items": [], "destinatarios": [], "assunto": item["assunto"], "mensagem": item["mensagem"]}
+            groups.append(group)
+            open_groups[item["conteudo_hash"]] = group
+        group["items"].append(item)
+        group["destinatarios"] += [r for r in recipients if r not in group["destinatarios"]]
+    return groups
+
+
+def _backoff(tentativas: int) -> timedelta:
+    delay = settings.email_outbox_backoff_seconds * (2 ** max(0, tentativas - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))  # jitter: falhas em massa não voltam juntas
+
+
+def process_outbox(db: Session, limit: Optional[int] = None) -> Dict[str, int]:
+    """
+    Processa um lote da fila: reserva, agrupa, envia em paralelo e grava o resultado.
+    Pode ser chamado pelo worker ou manualmente (POST /Emails/outbox/processar).
+
+    Returns:
+        {"mensagens", "envios", "enviadas", "reagendadas", "falhas"}
+    """
+    from sqlalchemy import update
+    from app.services.email_service import post_email
+
+    items = _claim_batch(db, limit or settings.email_outbox_batch_size)
+    stats = {"mensagens": len(items), "envios": 0, "enviadas": 0, "reagendadas": 0, "falhas": 0}
+    if not items:
+        return stats
+
+    groups = _group_messages(items, settings.email_outbox_max_recipients)
+    to_send = [g for g in groups if g["destinatarios"]]
+    stats["envios"] = len(to_send)
+
+    results = {}
+    if to_send:
+        with ThreadPoolExecutor(max_workers=min(settings.email_outbox_concurrency, len(to_send))) as pool:
+            sent = pool.map(lambda g: post_email(g["destinatarios"], g["assunto"], g["mensagem"]), to_send)
+            results = {id(group): result for group, result in zip(to_send, sent)}
+
+    now = datetime.now()
+    updates = []
+    sent_items = []
+    failed_items = []
+    for group in groups:
+        # Sem destinatário válido não há o que reenviar
+        ok, error = results.get(id(group), (False, "Nenhum destinatário"))
+        for item in group["items"]:
+            row = {"id": item["id"], "ultimo_erro": error}
+            if ok:
+                row.update(status=STATUS_SENT, enviada_em=now)
+                stats["enviadas"] += 1
+                sent_items.append(item)
+            elif item["tentativas"] >= settings.email_outbox_max_attempts or not group["destinatarios"]:
+                row.update(status=STATUS_FAILED)
+                stats["falhas"] += 1
+                failed_items.append((item, error))
+            else:
+                row.update(status=STATUS_PENDING, next_attempt_at=now + _backoff(item["tentativas"]))
+                stats["reagendadas"] += 1
+            updates.append(row)
+
+    # Resultado de todo o lote: UPDATE em lote por chave primária
+    db.execute(update(EmailOutbox), updates)
+    _update_notifications(db, sent_items, failed_items, now)
+    db.commit()
+    return stats
+
+
+def _update_notifications(db: Session, sent_items: List[Dict], failed_items: List[tuple], now: datetime) -> None:
+    """
+    Reflete o resultado do envio nas notificações de vencimento (document_notifications):
+    pela notification_id do item (um email por alerta) ou pelo email_outbox_id da
+    notificação (resumo com vários alertas)
+    """
+    from sqlalchemy import or_
+    from app.models.document_notification import DocumentNotification
+
+    def of_items(items):
+        return or_(
+            DocumentNotification.id.in_([i["notification_id"] for i in items if i["notification_id"]]),
+            DocumentNotification.email_outbox_id.in_([i["id"] for i in items])
+        )
+
+    if sent_items:
+        db.query(DocumentNotification).filter(of_items(sent_items)).update(
+            {DocumentNotification.enviada: True, DocumentNotification.enviada_em: now, DocumentNotification.erro_envio: None},
+            synchronize_session=False
+        )
+    for item, error in failed_items:
+        db.query(DocumentNotification).filter(of_items([item])).update(
+            {DocumentNotification.erro_envio: error or "Erro ao enviar email"}, synchronize_session=False
+        )
+
+
+# ==========================================
+# WORKER
+# ==========================================
+
+class EmailOutboxWorker(threading.Thread):
+    """Thread que drena a fila: processa lotes enquanto houver mensagens e dorme até o próximo ciclo"""
+
+    def __init__(self, session_factory, poll_seconds: float):
+        super().__init__(name="email-outbox", daemon=True)
+        self._session_factory = session_factory
+        self._poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            processed = 0
+            db = self._session_factory()
+            try:
+                processed = process_outbox(db)["mensagens"]
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Erro no worker de e-mails: {e}")
+            finally:
+                db.close()
+            # Lote cheio: provavelmente há mais na fila, segue sem esperar
+            if processed < settings.email_outbox_batch_size:
+                self._wake.wait(self._poll_seconds)
+                self._wake.clear()
+
+
+_worker: Optional[EmailOutboxWorker] = None
+
+
+def start_worker() -> Optional[EmailOutboxWorker]:
+    """Inicia o worker deste processo (startup da API), se habilitado"""
+    global _worker
+    if not settings.email_outbox_worker_enabled or _worker is not None:
+        return _worker
+    from app.core.conn import SessionLocal
+
+    _worker = EmailOutboxWorker(SessionLocal, settings.email_outbox_poll_seconds)
+    _worker.start()
+    return _worker
+
+
+def stop_worker(timeout: float = 10.0) -> None:
+    global _worker
+    worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop()
+        worker.join(timeout)
+
+
+def notify_worker() -> None:
+    """Acorda o worker deste processo (mensagem nova na fila)"""
+    if _worker is not None:
+        _worker.notify()
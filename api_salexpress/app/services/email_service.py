@@ -1,10 +1,40 @@
 import requests
 import json
+import threading
+from requests.adapters import HTTPAdapter
+from app.core.config import settings
 
-def set_email(destinatarios, assunto, mensagem):
-    # URL do serviço de envio de e-mail
-    url = "https://Salexpress-email.vercel.app/email"
+_http_lock = threading.Lock()
+_http_session = None
 
+
+def _session() -> requests.Session:
+    """Sessão HTTP compartilhada (conexões keep-alive reaproveitadas pelo worker da fila)"""
+    global _http_session
+    session = _http_session
+    if session is None:
+        with _http_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.email_outbox_concurrency)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Content-Type": "application/json",
+                    "Accept": "application/json"
+                })
+                _http_session = session
+            session = _http_session
+    return session
+
+
+def post_email(destinatarios, assunto, mensagem):
+    """
+    Envia de fato pelo serviço de e-mail (usado pelo worker da fila).
+
+    Returns:
+        (sucesso, erro)
+    """
     # Criando o corpo da requisição em JSON
     data = {
         "email": destinatarios,
@@ -12,27 +42,43 @@ def set_email(destinatarios, assunto, mensagem):
         "Mensagem": mensagem
     }
 
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
-
     try:
-        # Fazendo a requisição POST para a API
-        response = requests.post(url, headers=headers, data=json.dumps(data), timeout=150)
-
-        # Verificando se a requisição foi bem-sucedida
+        response = _session().post(
+            settings.email_api_url,
+            data=json.dumps(data),
+            timeout=(settings.email_connect_timeout, settings.email_read_timeout)
+        )
         if response.status_code == 200:
-            print("E-mail enviado com sucesso!")
-            return True
-        else:
-            print(f"Erro ao enviar e-mail. Código de resposta: {response.status_code}")
-            print(f"Resposta: {response.text}")
-            return False
-
+            return True, None
+        return False, f"HTTP {response.status_code}: {response.text[:500]}"
     except requests.exceptions.RequestException as e:
-        print(f"Erro na requisição: {e}")
+        return False, str(e)
+
+
+def set_email(destinatarios, assunto, mensagem, db=None, origem=None):
+    """
+    Enfileira o e-mail (email_outbox) e retorna na hora; o envio é feito pelo
+    worker da fila (app/services/email_outbox.py), com novas tentativas em caso de falha.
+
+    Returns:
+        True se a mensagem foi enfileirada
+    """
+    from app.services.email_outbox import enqueue_email
+
+    own_session = db is None
+    if own_session:
+        from app.core.conn import SessionLocal
+        db = SessionLocal()
+    try:
+        enqueue_email(db, destinatarios, assunto, mensagem, origem=origem)
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"Erro ao enfileirar e-mail: {e}")
         return False
+    finally:
+        if own_session:
+            db.close()
 
 
 def confirmCode(codeVerify, email):
@@ -110,7 +156,8 @@ def confirmCode(codeVerify, email):
         set_email(
             destinatarios=[email],
             assunto="Validação de email - Sistema Salexpress",
-            mensagem=html
+            mensagem=html,
+            origem="validacao_email"
         )
 
 
@@ -183,5 +230,6 @@ def send_active_freelancer_email(email, company_name):
     return set_email(
         destinatarios=[email],
         assunto=f"Novo Vínculo - {company_name}",
-        mensagem=html
+        mensagem=html,
+        origem="vinculo_freelancer"
     )
@@ -0,0 +1,146 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.utils.cloudflare_r2 import DELETE_BATCH_SIZE, delete_objects, iter_object_pages
+
+
+# ==========================================
+# COLETA DE OBJETOS ÓRFÃOS NO R2
+# ==========================================
+#
+# Delete permanente, lixeira esvaziada e versões substituídas removem/alteram as
+# linhas do banco mas deixam o objeto no bucket. A coleta compara a listagem do
+# bucket (paginada) com as keys referenciadas pelo banco e apaga as que sobraram
+# em lotes de DeleteObjects (1.000 keys), com vazão limitada.
+#
+# As referências são lidas ANTES da listagem e objetos mais novos que
+# r2_gc_min_age_hours nunca são apagados: um upload ainda não registrado (URL
+# presignada, multipart, stream) não é confundido com lixo.
+
+SAMPLE_SIZE = 50
+
+
+class RateLimiter:
+    """Balde de tokens: limita a vazão a `rate` itens por segundo (rate <= 0 desliga)"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+
+    def acquire(self, n: int = 1) -> None:
+        if self.rate <= 0:
+            return
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        self._tokens -= n
+        if self._tokens < 0:
+            # Lote maior que o saldo: espera o tempo de repor a diferença
+            self._sleep(-self._tokens / self.rate)
+
+
+def collect_orphans(
+    referenced: Set[str],
+    dry_run: bool = True,
+    prefix: str = "",
+    min_age_hours: Optional[int] = None,
+    protected_prefixes: Optional[Iterable[str]] = None,
+    deletes_per_second: Optional[float] = None,
+    max_deletes: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    Percorre o bucket e apaga (ou só lista, em dry_run) os objetos fora de `referenced`.
+
+    Args:
+        referenced: keys referenciadas (crud.storage_gc.referenced_object_keys)
+        dry_run: apenas relatar o que seria apagado
+        prefix: restringir a coleta a um prefixo do bucket
+        max_deletes: parar depois de N objetos órfãos (execuções incrementais)
+        demais: padrões em settings.r2_gc_*
+
+    Returns:
+        Relatório: objetos listados, protegidos, órfãos (quantidade, bytes, amostra),
+        apagados e erros
+    """
+    min_age_hours = settings.r2_gc_min_age_hours if min_age_hours is None else min_age_hours
+    protected = tuple(settings.r2_gc_protected_prefixes if protected_prefixes is None else protected_prefixes)
+    rate = settings.r2_gc_deletes_per_second if deletes_per_second is None else deletes_per_second
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=min_age_hours)
+
+    report = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "referenced": 0,
+        "too_recent": 0,
+        "protected": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "deleted": 0,
+        "errors": [],
+        "sample": [],
+    }
+    if not referenced and not dry_run:
+        # Banco sem nenhuma referência: muito provavelmente erro de configuração
+        raise RuntimeError("Nenhuma referência encontrada no banco; coleta abortada para não esvaziar o bucket")
+
+    limiter = RateLimiter(rate)
+    batch: List[str] = []
+    started = time.perf_counter()
+
+    def flush():
+        limiter.acquire(len(batch))
+        result = delete_objects(batch)
+        report["deleted"] += result["deleted"]
+        report["errors"] += result["errors"]
+        batch.clear()
+
+    for page in iter_object_pages(prefix):
+        for obj in page:
+            key = obj["Key"]
+            report["scanned"] += 1
+            if key in referenced:
+                report["referenced"] += 1
+                continue
+            if protected and key.startswith(protected):
+                report["protected"] += 1
+                continue
+            if obj["LastModified"] > cutoff:
+                report["too_recent"] += 1
+                continue
+            if max_deletes is not None and report["orphans"] >= max_deletes:
+                continue
+
+            report["orphans"] += 1
+            report["orphan_bytes"] += obj.get("Size", 0)
+            if len(report["sample"]) < SAMPLE_SIZE:
+                report["sample"].append(key)
+            if not dry_run:
+                batch.append(key)
+                if len(batch) >= DELETE_BATCH_SIZE:
+                    flush()
+
+    if batch:
+        flush()
+
+    report["duration_seconds"] = round(time.perf_counter() - started, 2)
+    print(
+        f"🧹 GC R2{' (dry-run)' if dry_run else ''}: {report['scanned']} objetos listados, "
+        f"{report['orphans']} órfãos ({report['orphan_bytes']} bytes), {report['deleted']} apagados, "
+        f"{len(report['errors'])} erros"
+    )
+    return report
+
+
+def run_gc(db, dry_run: bool = True, prefix: str = "", max_deletes: Optional[int] = None) -> dict:
+    """Coleta completa: referências do banco + varredura do bucket (ver collect_orphans)"""
+    from app.crud.storage_gc import referenced_object_keys
+
+    referenced = referenced_object_keys(db, settings.r2_gc_version_retention_days)
+    return collect_orphans(referenced, dry_run=dry_run, prefix=prefix, max_deletes=max_deletes)
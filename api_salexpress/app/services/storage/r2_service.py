@@ -1,12 +1,211 @@
-from typing import BinaryIO, Optional
-from app.utils.cloudflare_r2 import upload_image, delete_image
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from app.core.config import settings
+from app.utils.cloudflare_r2 import (
+    upload_image, delete_image, new_object_key, multipart_part_size, build_public_url,
+    create_multipart_upload, upload_part, complete_multipart_upload, abort_multipart_upload
+)
 
 # Camada de serviço para encapsular regras adicionais futuramente
 
+# Executor dedicado aos uploads: a transferência (boto3, bloqueante) não roda no
+# event loop nem ocupa o threadpool dos endpoints síncronos. max_workers limita
+# quantos uploads vão ao R2 ao mesmo tempo; os excedentes aguardam na fila.
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.r2_upload_max_workers,
+    thread_name_prefix="r2-upload"
+)
+
+
 def store_image(file_obj: BinaryIO, original_filename: str, folder: Optional[str] = None, content_type: Optional[str] = None):
     return upload_image(file_obj=file_obj, original_filename=original_filename, folder=folder, content_type=content_type)
 
 
+async def store_image_async(file_obj: BinaryIO, original_filename: str, folder: Optional[str] = None, content_type: Optional[str] = None):
+    """store_image para endpoints async: executa no executor de uploads e libera o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _upload_executor,
+        partial(store_image, file_obj=file_obj, original_filename=original_filename, folder=folder, content_type=content_type)
+    )
+
+
+def _file_sha256(file_obj: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 do arquivo já recebido pelo servidor (lido em pedaços), voltando ao início"""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+async def store_image_dedup(db, file_obj: BinaryIO, original_filename: str, folder: Optional[str] = None, content_type: Optional[str] = None):
+    """
+    store_image_async com deduplicação por conteúdo (settings.storage_dedup_enabled).
+
+    Calcula o SHA-256 do arquivo e, se o conteúdo já existe em storage_blobs, não
+    envia nada ao R2 e devolve a key do blob. A referência ao blob é registrada
+    junto com o node (create_node / update_node / create_nodes_batch).
+
+    Returns:
+        resultado de store_image_async + {"content_hash", "deduplicated"}
+    """
+    if not settings.storage_dedup_enabled:
+        return await store_image_async(file_obj, original_filename, folder=folder, content_type=content_type)
+
+    from fastapi.concurrency import run_in_threadpool
+    from app.crud.storage_blob import find_blob
+
+    loop = asyncio.get_running_loop()
+    content_hash = await loop.run_in_executor(_upload_executor, _file_sha256, file_obj)
+    blob = await run_in_threadpool(find_blob, db, content_hash)
+    if blob is not None:
+        return {
+            "success": True, "key": blob.key, "url": build_public_url(blob.key),
+            "content_hash": content_hash, "deduplicated": True
+        }
+
+    result = await store_image_async(file_obj, original_filename, folder=folder, content_type=content_type)
+    if result.get("success"):
+        result.update(content_hash=content_hash, deduplicated=False)
+    return result
+
+
+async def store_images_dedup(db, files: List[Tuple[BinaryIO, str, Optional[str]]], folder: Optional[str] = None) -> List:
+    """
+    store_image_dedup para um lote de arquivos (upload em lote).
+
+    A Session não é thread-safe: os hashes são calculados em paralelo, mas os
+    blobs existentes são buscados com UMA query (find_blobs) em uma única thread;
+    só então os arquivos novos são enviados em paralelo.
+
+    Args:
+        files: [(file_obj, nome original, content_type)]
+
+    Returns:
+        Um resultado por arquivo, na mesma ordem (exceções de upload são devolvidas
+        no lugar do resultado, como asyncio.gather(return_exceptions=True))
+    """
+    if not settings.storage_dedup_enabled:
+        return await asyncio.gather(*(
+            store_image_async(file_obj, filename, folder=folder, content_type=content_type)
+            for file_obj, filename, content_type in files
+        ), return_exceptions=True)
+
+    from fastapi.concurrency import run_in_threadpool
+    from app.crud.storage_blob import find_blobs
+
+    loop = asyncio.get_running_loop()
+    hashes = await asyncio.gather(*(
+        loop.run_in_executor(_upload_executor, _file_sha256, file_obj) for file_obj, _, _ in files
+    ))
+    existing = await run_in_threadpool(find_blobs, db, set(hashes))
+
+    async def store(file_obj, filename, content_type, content_hash):
+        key = existing.get(content_hash)
+        if key is not None:
+            return {
+                "success": True, "key": key, "url": build_public_url(key),
+                "content_hash": content_hash, "deduplicated": True
+            }
+        result = await store_image_async(file_obj, filename, folder=folder, content_type=content_type)
+        if result.get("success"):
+            result.update(content_hash=content_hash, deduplicated=False)
+        return result
+
+    return await asyncio.gather(*(
+        store(file_obj, filename, content_type, content_hash)
+        for (file_obj, filename, content_type), content_hash in zip(files, hashes)
+    ), return_exceptions=True)
+
+
+async def store_stream_multipart(
+    chunks: AsyncIterator[bytes],
+    original_filename: str,
+    content_type: Optional[str] = None,
+    folder: Optional[str] = None,
+    total_size: Optional[int] = None
+):
+    """
+    Envia um stream (ex: corpo da requisição) ao R2 em multipart, sem gravar o arquivo em disco.
+
+    Os chunks são agrupados em partes de multipart_part_size() e enviadas pelo
+    executor de uploads; no máximo r2_multipart_concurrency partes ficam em voo
+    por upload (memória limitada a ~(concorrência + 1) partes). Em qualquer
+    falha o upload multipart é abortado no R2.
+
+    Com settings.storage_dedup_enabled o SHA-256 é calculado enquanto o stream
+    passa; um conteúdo repetido é resolvido ao registrar o node (acquire_blobs).
+
+    Returns:
+        {"success", "key", "url", "size_bytes", "content_hash"} ou {"success": False, "error"}
+    """
+    loop = asyncio.get_running_loop()
+    ct = content_type or 'application/octet-stream'
+    key = new_object_key(original_filename, folder)
+    part_size = multipart_part_size(total_size)
+
+    upload_id = await loop.run_in_executor(_upload_executor, create_multipart_upload, key, ct)
+    if not upload_id:
+        return {"success": False, "error": "Não foi possível iniciar o upload multipart"}
+
+    parts = []
+    pending = set()
+    buffer = bytearray()
+    size_bytes = 0
+    digest = hashlib.sha256() if settings.storage_dedup_enabled else None
+
+    async def send(data: bytes):
+        nonlocal pending
+        if len(pending) >= settings.r2_multipart_concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                parts.append(task.result())
+        part_number = len(parts) + len(pending) + 1
+        pending.add(loop.run_in_executor(_upload_executor, upload_part, key, upload_id, part_number, data))
+
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            size_bytes += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            while len(buffer) >= part_size:
+                await send(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+        if buffer or (not parts and not pending):  # Último pedaço (ou arquivo vazio)
+            await send(bytes(buffer))
+        if pending:
+            parts.extend(await asyncio.gather(*pending))
+            pending = set()
+    except ClientError as e:
+        await _abort_stream(loop, key, upload_id, pending)
+        return {"success": False, "error": str(e)}
+    except BaseException:
+        # Cliente desconectou / request cancelada: não deixar partes órfãs no R2
+        await _abort_stream(loop, key, upload_id, pending)
+        raise
+
+    result = await loop.run_in_executor(_upload_executor, complete_multipart_upload, key, upload_id, parts)
+    if not result.get("success"):
+        await loop.run_in_executor(_upload_executor, abort_multipart_upload, key, upload_id)
+        return result
+    result["size_bytes"] = size_bytes
+    result["content_hash"] = digest.hexdigest() if digest is not None else None
+    return result
+
+
+async def _abort_stream(loop, key: str, upload_id: str, pending):
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    await loop.run_in_executor(_upload_executor, abort_multipart_upload, key, upload_id)
+
+
 def remove_image(key: str):
     return delete_image(key)
 
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+# ==========================================
+# IDENTIDADE DE USUÁRIOS (NOME/EMAIL) COM CACHE
+# ==========================================
+#
+# OTIMIZADO: logs (update/move/delete/restore) e listagens de compartilhamentos
+# e seguidores buscavam UserPF/UserPJ/UserFreelancer/CompanyCollaborator um a um
+# só para exibir nome e email. resolve_many resolve um conjunto de (id, tipo) com
+# no máximo uma query por tipo, passando antes por um cache LRU com TTL.
+#
+# O cache é por processo: edit_user_* e update_collaborator invalidam a entrada
+# no processo que fez a edição; nos demais, o TTL limita o tempo de dado antigo.
+
+UserKey = Tuple[int, str]
+
+
+class _IdentityCache:
+    """LRU com expiração por entrada (thread-safe)"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[UserKey, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[UserKey]) -> Dict[UserKey, Dict]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, info, _ = entry
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = info
+        return found
+
+    def put_many(self, items: Dict[UserKey, Tuple[Dict, Optional[int]]]) -> None:
+        """items: {(id, tipo): (info, id_user_pf do PJ ou None)}"""
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for key, (info, linked_pf) in items.items():
+                self._data[key] = (expires, info, linked_pf)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int, tipo: str) -> None:
+        with self._lock:
+            self._data.pop((user_id, tipo), None)
+            if tipo == "pf":
+                # O email exibido para PJ é o do PF responsável
+                linked = [k for k, (_, _, pf) in self._data.items() if k[1] == "pj" and pf == user_id]
+                for key in linked:
+                    del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _IdentityCache(settings.user_identity_cache_size, settings.user_identity_cache_ttl_seconds)
+
+
+def _load(db: Session, keys: Iterable[UserKey]) -> Dict[UserKey, Tuple[Dict, Optional[int]]]:
+    """Busca no banco: uma query por tipo de usuário"""
+    from app.models.user import UserPF, UserPJ, UserFreelancer
+    from app.models.collaborator import CompanyCollaborator
+
+    ids_por_tipo: Dict[str, set] = {}
+    for user_id, tipo in keys:
+        if user_id is not None:
+            ids_por_tipo.setdefault(tipo, set()).add(user_id)
+
+    loaded = {}
+    if ids_por_tipo.get("pf"):
+        for u in db.query(UserPF.id, UserPF.nome, UserPF.email).filter(UserPF.id.in_(ids_por_tipo["pf"])):
+            loaded[(u.id, "pf")] = ({"id": u.id, "nome": u.nome, "email": u.email, "tipo": "pf"}, None)
+    if ids_por_tipo.get("pj"):
+        rows = db.query(UserPJ.id, UserPJ.razao_social, UserPJ.id_user_pf, UserPF.email).outerjoin(
+            UserPF, UserPF.id == UserPJ.id_user_pf
+        ).filter(UserPJ.id.in_(ids_por_tipo["pj"]))
+        for u in rows:
+            loaded[(u.id, "pj")] = ({"id": u.id, "nome": u.razao_social, "email": u.email, "tipo": "pj"}, u.id_user_pf)
+    if ids_por_tipo.get("freelancer"):
+        rows = db.query(UserFreelancer.id, UserFreelancer.nome, UserFreelancer.email).filter(
+            UserFreelancer.id.in_(ids_por_tipo["freelancer"])
+        )
+        for u in rows:
+            loaded[(u.id, "freelancer")] = ({"id": u.id, "nome": u.nome, "email": u.email, "tipo": "freelancer"}, None)
+    if ids_por_tipo.get("collaborator"):
+        rows = db.query(
+            CompanyCollaborator.id, CompanyCollaborator.name, CompanyCollaborator.email,
+            CompanyCollaborator.company_id, CompanyCollaborator.company_type
+        ).filter(CompanyCollaborator.id.in_(ids_por_tipo["collaborator"]))
+        for u in rows:
+            loaded[(u.id, "collaborator")] = ({
+                "id": u.id,
+                "nome": u.name,
+                "email": u.email,
+                "tipo": "collaborator",
+                "company_id": u.company_id,
+                "company_type": u.company_type
+            }, None)
+    return loaded
+
+
+def resolve_many(db: Session, keys: Iterable[UserKey]) -> Dict[UserKey, Dict]:
+    """
+    Resolve nome/email de vários usuários de uma vez.
+
+    Args:
+        keys: [(user_id, tipo)] com tipo pf, pj, freelancer ou collaborator
+
+    Returns:
+        {(user_id, tipo): {"id", "nome", "email", "tipo"}} (+ company_id/company_type
+        para collaborator). Usuários inexistentes ficam de fora.
+    """
+    keys = {(user_id, tipo) for user_id, tipo in keys if user_id is not None and tipo}
+    found = _cache.get_many(keys)
+    missing = keys - found.keys()
+    if missing:
+        loaded = _load(db, missing)
+        _cache.put_many(loaded)
+        found.update({key: info for key, (info, _) in loaded.items()})
+    # Cópias: quem chama pode alterar o dict sem afetar o cache
+    return {key: dict(info) for key, info in found.items()}
+
+
+def resolve(db: Session, user_id: Optional[int], tipo: Optional[str]) -> Optional[Dict]:
+    return resolve_many(db, [(user_id, tipo)]).get((user_id, tipo))
+
+
+def resolve_name(db: Session, user_id: Optional[int], tipo: Optional[str]) -> Optional[str]:
+    """Nome de exibição do usuário (razão social para PJ), para DocumentLog.user_name"""
+    info = resolve(db, user_id, tipo)
+    return info["nome"] if info else None
+
+
+def invalidate_user(user_id: int, tipo: str) -> None:
+    """Remove o usuário do cache (chamar após editar/excluir)"""
+    _cache.invalidate(user_id, tipo)
+
+
+def clear_cache() -> None:
+    _cache.clear()
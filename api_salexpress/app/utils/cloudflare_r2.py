@@ -1,8 +1,16 @@
 from app.core.config import settings
+import datetime
+import hashlib
+import hmac
+import math
+import threading
 import uuid
-from typing import Optional, BinaryIO
+from typing import Dict, Iterator, List, Optional, BinaryIO
+from urllib.parse import quote, unquote, urlsplit
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 R2_ENDPOINT = settings.r2_endpoint
@@ -11,16 +19,161 @@ R2_ACCESS_KEY = settings.r2_access_key
 R2_SECRET_KEY = settings.r2_secret_key
 
 
+# ==========================================
+# CLIENTE COMPARTILHADO
+# ==========================================
+#
+# OTIMIZADO: um único client boto3 por processo, criado na primeira chamada.
+# Antes cada upload/delete/presign montava um client novo (resolução de
+# credenciais, carga do modelo do serviço, pool HTTP e handshake TLS próprios).
+# Clients boto3 são thread-safe, então o mesmo client atende o threadpool em que
+# o FastAPI roda os endpoints síncronos; o pool comporta max_pool_connections
+# requisições simultâneas ao R2 (o threadpool padrão do AnyIO tem 40 threads).
+
+_client_lock = threading.Lock()
+_shared_client = None
+
+
+def _client_config() -> Config:
+    return Config(
+        max_pool_connections=settings.r2_max_pool_connections,
+        connect_timeout=settings.r2_connect_timeout,
+        read_timeout=settings.r2_read_timeout,
+        retries={"max_attempts": settings.r2_max_attempts, "mode": "standard"},
+        tcp_keepalive=settings.r2_tcp_keepalive,
+    )
+
+
 def _client():
+    """Client S3 do R2 compartilhado pelo processo (criado uma vez, sob lock)"""
+    global _shared_client
+    client = _shared_client
+    if client is not None:
+        return client
+
     if not (R2_ACCESS_KEY and R2_SECRET_KEY):
         raise RuntimeError("Credenciais R2 não configuradas (R2_ACCESS_KEY / R2_SECRET_KEY)")
-    return boto3.client(
-        "s3",
-        endpoint_url=R2_ENDPOINT,
-        aws_access_key_id=R2_ACCESS_KEY,
-        aws_secret_access_key=R2_SECRET_KEY,
-        region_name="auto",
-    )
+
+    with _client_lock:
+        if _shared_client is None:
+            # Session própria: a sessão default do boto3 não é thread-safe
+            session = boto3.session.Session()
+            _shared_client = session.client(
+                "s3",
+                endpoint_url=R2_ENDPOINT,
+                aws_access_key_id=R2_ACCESS_KEY,
+                aws_secret_access_key=R2_SECRET_KEY,
+                region_name="auto",
+                config=_client_config(),
+            )
+        return _shared_client
+
+
+def reset_client():
+    """Descarta o client compartilhado (ex: após trocar credenciais); o próximo uso recria"""
+    global _shared_client, _shared_signer
+    with _client_lock:
+        client, _shared_client = _shared_client, None
+        _shared_signer = None
+    if client is not None:
+        client.close()
+
+
+# ==========================================
+# URLs PRESIGNADAS
+# ==========================================
+#
+# OTIMIZADO: assinatura SigV4 por query string feita direto (hmac/sha256), com a
+# chave de assinatura do dia em cache. client.generate_presigned_url passa pelo
+# pipeline completo do botocore (serialização, eventos, resolução de endpoint) a
+# cada URL: ~0,5 ms por URL contra alguns µs aqui. Mesmo formato do botocore
+# (path-style, UNSIGNED-PAYLOAD, content-type assinado quando informado).
+
+class PresignSigner:
+    ALGORITHM = "AWS4-HMAC-SHA256"
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str, region: str = "auto"):
+        parts = urlsplit(endpoint)
+        self.scheme = parts.scheme or "https"
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._signing_key = (None, None)  # (data, chave) - a chave muda uma vez por dia
+
+    def _key_for(self, datestamp: str) -> bytes:
+        cached_date, key = self._signing_key
+        if cached_date != datestamp:
+            key = ("AWS4" + self.secret_key).encode()
+            for part in (datestamp, self.region, "s3", "aws4_request"):
+                key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+            self._signing_key = (datestamp, key)
+        return key
+
+    def presign(
+        self,
+        method: str,
+        key: str,
+        expires_in: int = 3600,
+        params: Optional[Dict[str, str]] = None,
+        content_type: Optional[str] = None,
+        now: Optional[datetime.datetime] = None
+    ) -> str:
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+
+        headers = {"host": self.host}
+        if content_type:
+            headers["content-type"] = " ".join(content_type.split())
+        signed_headers = ";".join(sorted(headers))
+
+        query = dict(params or {})
+        query.update({
+            "X-Amz-Algorithm": self.ALGORITHM,
+            "X-Amz-Credential": f"{self.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": signed_headers,
+        })
+        canonical_query = "&".join(
+            f"{quote(str(k), safe='-_.~')}={quote(str(v), safe='-_.~')}"
+            for k, v in sorted(query.items())
+        )
+
+        uri = f"{self.base_path}/{self.bucket}/{quote(key, safe='/~')}"
+        canonical_request = "\n".join([
+            method,
+            uri,
+            canonical_query,
+            "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+            signed_headers,
+            "UNSIGNED-PAYLOAD",
+        ])
+        string_to_sign = "\n".join([
+            self.ALGORITHM,
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(self._key_for(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self.scheme}://{self.host}{uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+
+_shared_signer = None
+
+
+def _signer() -> PresignSigner:
+    global _shared_signer
+    signer = _shared_signer
+    if signer is None:
+        if not (R2_ACCESS_KEY and R2_SECRET_KEY):
+            raise RuntimeError("Credenciais R2 não configuradas (R2_ACCESS_KEY / R2_SECRET_KEY)")
+        signer = _shared_signer = PresignSigner(R2_ENDPOINT, R2_BUCKET, R2_ACCESS_KEY, R2_SECRET_KEY)
+    return signer
 
 
 def build_public_url(key: str) -> str:
@@ -28,12 +181,7 @@ def build_public_url(key: str) -> str:
 
 
 def upload_image(file_obj: BinaryIO, original_filename: str, folder: Optional[str] = None, content_type: Optional[str] = None):
-    ext = ''
-    if '.' in original_filename:
-        ext = '.' + original_filename.rsplit('.', 1)[1].lower()
-    key = f"{uuid.uuid4().hex}{ext}"
-    if folder:
-        key = f"{folder.strip().strip('/')}/{key}"
+    key = new_object_key(original_filename, folder)
     ct = content_type or 'application/octet-stream'
     client = _client()
     try:
@@ -41,13 +189,47 @@ def upload_image(file_obj: BinaryIO, original_filename: str, folder: Optional[st
             Fileobj=file_obj,
             Bucket=R2_BUCKET,
             Key=key,
-            ExtraArgs={"ContentType": ct}
+            ExtraArgs={"ContentType": ct},
+            Config=_transfer_config()
         )
         return {"success": True, "key": key, "url": build_public_url(key)}
     except ClientError as e:
         return {"success": False, "error": str(e)}
 
 
+def upload_object(file_obj: BinaryIO, key: str, content_type: Optional[str] = None):
+    """Envia um arquivo para uma key definida pelo chamador (sem gerar nome novo)"""
+    try:
+        _client().upload_fileobj(
+            Fileobj=file_obj,
+            Bucket=R2_BUCKET,
+            Key=key,
+            ExtraArgs={"ContentType": content_type or 'application/octet-stream'},
+            Config=_transfer_config()
+        )
+        return {"success": True, "key": key}
+    except ClientError as e:
+        return {"success": False, "error": str(e)}
+
+
+def key_from_url(url: Optional[str]) -> Optional[str]:
+    """Key do objeto a partir da URL gravada no node (pública r2.dev, endpoint/bucket/key ou só a key)"""
+    if not url:
+        return None
+    if "://" not in url:
+        return url.lstrip("/")
+    path = unquote(urlsplit(url).path).lstrip("/")
+    bucket_prefix = f"{R2_BUCKET}/"
+    if url.startswith(R2_ENDPOINT or "") and path.startswith(bucket_prefix):
+        path = path[len(bucket_prefix):]
+    return path
+
+
+def open_object(key: str):
+    """Abre o objeto para leitura em streaming (StreamingBody); lança ClientError se não existir"""
+    return _client().get_object(Bucket=R2_BUCKET, Key=key)["Body"]
+
+
 def delete_image(key: str):
     client = _client()
     try:
@@ -59,26 +241,166 @@ def delete_image(key: str):
 
 # Função para gerar link temporário autorizado (presigned URL)
 def generate_presigned_url(key: str, expires_in: int = 3600) -> Optional[str]:
+    return _signer().presign("GET", key, expires_in)
+
+def generate_presigned_upload_url(key: str, content_type: str, expires_in: int = 3600) -> Optional[str]:
+    return _signer().presign("PUT", key, expires_in, content_type=content_type)
+
+
+# ==========================================
+# MULTIPART
+# ==========================================
+#
+# Limites do S3/R2: partes de no mínimo 5 MB (exceto a última) e no máximo
+# 10.000 partes por upload. O R2 exige ainda que todas as partes, exceto a
+# última, tenham o mesmo tamanho.
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+
+
+def multipart_part_size(total_size: Optional[int] = None) -> int:
+    """Tamanho de parte configurado, aumentado (em MB inteiros) se o arquivo passaria de MAX_PARTS"""
+    part_size = max(settings.r2_multipart_part_size_mb * MB, MIN_PART_SIZE)
+    if total_size and math.ceil(total_size / part_size) > MAX_PARTS:
+        part_size = math.ceil(total_size / MAX_PARTS / MB) * MB
+    return part_size
+
+
+def _transfer_config() -> TransferConfig:
+    """upload_fileobj em partes paralelas para arquivos grandes (acima do threshold)"""
+    return TransferConfig(
+        multipart_threshold=settings.r2_multipart_threshold_mb * MB,
+        multipart_chunksize=multipart_part_size(),
+        max_concurrency=settings.r2_multipart_concurrency,
+        use_threads=True,
+    )
+
+
+def new_object_key(original_filename: str, folder: Optional[str] = None) -> str:
+    ext = ''
+    if '.' in original_filename:
+        ext = '.' + original_filename.rsplit('.', 1)[1].lower()
+    key = f"{uuid.uuid4().hex}{ext}"
+    if folder:
+        key = f"{folder.strip().strip('/')}/{key}"
+    return key
+
+
+def create_multipart_upload(key: str, content_type: str) -> Optional[str]:
+    """Inicia um upload multipart e retorna o UploadId (None em caso de erro)"""
     client = _client()
     try:
-        url = client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': R2_BUCKET, 'Key': key},
-            ExpiresIn=expires_in
+        resp = client.create_multipart_upload(
+            Bucket=R2_BUCKET,
+            Key=key,
+            ContentType=content_type or 'application/octet-stream'
         )
-        return url
+        return resp["UploadId"]
     except ClientError:
         return None
 
-def generate_presigned_upload_url(key: str, content_type: str, expires_in: int = 3600) -> Optional[str]:
+
+def upload_part(key: str, upload_id: str, part_number: int, data: bytes) -> Dict:
+    """Envia uma parte (lança ClientError em caso de falha, para o chamador abortar)"""
+    resp = _client().upload_part(
+        Bucket=R2_BUCKET,
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data
+    )
+    return {"PartNumber": part_number, "ETag": resp["ETag"]}
+
+
+def generate_presigned_part_urls(key: str, upload_id: str, part_numbers: List[int], expires_in: int = 3600) -> Dict[int, str]:
+    """URLs presignadas (PUT) por número de parte, para o navegador enviar as partes direto ao R2"""
+    signer = _signer()
+    return {
+        n: signer.presign("PUT", key, expires_in, params={"partNumber": n, "uploadId": upload_id})
+        for n in part_numbers
+    }
+
+
+def list_multipart_parts(key: str, upload_id: str) -> Optional[List[Dict]]:
+    """Partes já recebidas pelo R2 (para retomar um upload); None se o upload não existe mais"""
     client = _client()
+    parts = []
+    marker = 0
     try:
-        url = client.generate_presigned_url(
-            'put_object',
-            Params={'Bucket': R2_BUCKET, 'Key': key, 'ContentType': content_type},
-            ExpiresIn=expires_in
-        )
-        return url
+        while True:
+            resp = client.list_parts(Bucket=R2_BUCKET, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+            parts.extend(
+                {"PartNumber": p["PartNumber"], "ETag": p["ETag"], "Size": p["Size"]}
+                for p in resp.get("Parts", [])
+            )
+            if not resp.get("IsTruncated"):
+                return parts
+            marker = resp["NextPartNumberMarker"]
     except ClientError:
         return None
 
+
+def complete_multipart_upload(key: str, upload_id: str, parts: List[Dict]):
+    client = _client()
+    try:
+        client.complete_multipart_upload(
+            Bucket=R2_BUCKET,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": p["PartNumber"], "ETag": p["ETag"]}
+                for p in sorted(parts, key=lambda p: p["PartNumber"])
+            ]}
+        )
+        return {"success": True, "key": key, "url": build_public_url(key)}
+    except ClientError as e:
+        return {"success": False, "error": str(e)}
+
+
+def abort_multipart_upload(key: str, upload_id: str):
+    client = _client()
+    try:
+        client.abort_multipart_upload(Bucket=R2_BUCKET, Key=key, UploadId=upload_id)
+        return {"success": True, "aborted": key}
+    except ClientError as e:
+        return {"success": False, "error": str(e)}
+
+
+# ==========================================
+# LISTAGEM E DELETE EM LOTE
+# ==========================================
+
+# DeleteObjects aceita no máximo 1.000 keys por requisição
+DELETE_BATCH_SIZE = 1000
+
+
+def iter_object_pages(prefix: str = "", page_size: int = 1000) -> Iterator[List[Dict]]:
+    """Percorre o bucket página a página (list_objects_v2): [{"Key", "Size", "LastModified", ...}]"""
+    paginator = _client().get_paginator("list_objects_v2")
+    pages = paginator.paginate(Bucket=R2_BUCKET, Prefix=prefix, PaginationConfig={"PageSize": page_size})
+    for page in pages:
+        yield page.get("Contents", [])
+
+
+def delete_objects(keys: List[str]) -> Dict:
+    """
+    Apaga até DELETE_BATCH_SIZE objetos em uma requisição (DeleteObjects, modo Quiet).
+
+    Returns:
+        {"deleted": quantidade, "errors": [{"key", "error"}]}
+    """
+    if len(keys) > DELETE_BATCH_SIZE:
+        raise ValueError(f"DeleteObjects aceita no máximo {DELETE_BATCH_SIZE} keys por chamada")
+    if not keys:
+        return {"deleted": 0, "errors": []}
+    try:
+        resp = _client().delete_objects(
+            Bucket=R2_BUCKET,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+    except ClientError as e:
+        return {"deleted": 0, "errors": [{"key": key, "error": str(e)} for key in keys]}
+    errors = [{"key": err.get("Key"), "error": err.get("Message") or err.get("Code")} for err in resp.get("Errors", [])]
+    return {"deleted": len(keys) - len(errors), "errors": errors}
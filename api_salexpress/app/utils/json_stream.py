@@ -0,0 +1,101 @@
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+
+# Linhas buscadas por consulta (e enriquecidas em batch)
+STREAM_BATCH_SIZE = 500
+
+STREAM_MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(jsonable_encoder(obj), ensure_ascii=False)
+
+
+def iter_batches(
+    batches: Iterable[List[Any]],
+    on_batch: Optional[Callable[[List[Any]], None]] = None,
+    session: Optional[Session] = None
+) -> Iterator[Any]:
+    """
+    Entrega os itens de um gerador de lotes mantendo em memória apenas um lote por vez.
+
+    Os lotes devem vir de consultas limitadas (keyset/LIMIT, ex: crud.storage.iter_children_batches):
+    o driver mysqlconnector não tem cursor do lado do servidor e yield_per carregaria
+    o resultado inteiro no cliente.
+
+    Args:
+        on_batch: Chamado com cada lote antes de ele ser entregue (ex: enriquecimento em lote)
+        session: Sessão dos objetos, esvaziada a cada lote (não acumular no identity map)
+    """
+    for batch in batches:
+        if on_batch:
+            on_batch(batch)
+        yield from batch
+        if session is not None:
+            session.expunge_all()
+
+
+def json_stream_chunks(
+    items: Iterable[Dict[str, Any]],
+    fmt: str = "json",
+    envelope: Optional[Dict[str, Any]] = None,
+    items_key: str = "items",
+    count_key: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Gera o corpo da resposta de forma incremental.
+
+    - json: array JSON ([...]) ou, com envelope, {...envelope, "items": [...], "total": n}
+      (o total é escrito no final, depois de contar os itens)
+    - ndjson: um objeto por linha; com envelope, a primeira linha é o envelope
+    """
+    count = 0
+    if fmt == "ndjson":
+        if envelope is not None:
+            yield _dumps(envelope) + "\n"
+        for item in items:
+            count += 1
+            yield _dumps(item) + "\n"
+        return
+
+    if envelope is not None:
+        head = _dumps(envelope)[:-1]
+        yield head + ("," if envelope else "") + json.dumps(items_key) + ":["
+    else:
+        yield "["
+
+    for item in items:
+        yield ("," if count else "") + _dumps(item)
+        count += 1
+
+    if envelope is not None:
+        tail = "]"
+        if count_key:
+            tail += "," + json.dumps(count_key) + ":" + str(count)
+        yield tail + "}"
+    else:
+        yield "]"
+
+
+def streaming_json_response(
+    items: Iterable[Dict[str, Any]],
+    fmt: str = "json",
+    envelope: Optional[Dict[str, Any]] = None,
+    items_key: str = "items",
+    count_key: Optional[str] = None
+) -> StreamingResponse:
+    """StreamingResponse para json_stream_chunks com o media type do formato"""
+    if fmt not in STREAM_MEDIA_TYPES:
+        fmt = "json"
+    return StreamingResponse(
+        json_stream_chunks(items, fmt, envelope, items_key, count_key),
+        media_type=STREAM_MEDIA_TYPES[fmt]
+    )
@@ -0,0 +1,135 @@
+import datetime
+import io
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional
+
+
+# Pedaço lido de cada objeto por vez (memória ~ ZIP_CHUNK_SIZE x (ZIP_PREFETCH + 1))
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# Objetos abertos antecipadamente (latência do GET escondida atrás do arquivo atual)
+ZIP_PREFETCH = 4
+
+# Formatos já comprimidos: DEFLATE só gastaria CPU
+STORED_EXTENSIONS = {
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".zip", ".rar", ".7z", ".gz",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".mp3", ".mp4", ".mov", ".avi",
+}
+
+
+class ZipEntry(NamedTuple):
+    arcname: str                       # Caminho dentro do ZIP ("Pasta/arquivo.pdf"; pastas terminam com "/")
+    modified: Optional[datetime.datetime] = None
+    source: Optional[str] = None       # Key do objeto no R2 (None = pasta)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino não-seekable do ZipFile: acumula os bytes escritos até serem entregues"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> List[bytes]:
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _zip_info(entry: ZipEntry) -> zipfile.ZipInfo:
+    modified = entry.modified or datetime.datetime.now()
+    date_time = modified.timetuple()[:6] if modified.year >= 1980 else (1980, 1, 1, 0, 0, 0)
+    info = zipfile.ZipInfo(entry.arcname, date_time)
+    if entry.source is None:
+        info.external_attr = 0o40775 << 16 | 0x10  # Diretório
+    elif os.path.splitext(entry.arcname)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def zip_stream(
+    entries: Iterable[ZipEntry],
+    open_source: Callable[[str], Any],
+    prefetch: int = ZIP_PREFETCH,
+    chunk_size: int = ZIP_CHUNK_SIZE,
+    errors_name: str = "ERROS_DOWNLOAD.txt",
+    errors: Iterable[str] = ()
+) -> Iterator[bytes]:
+    """
+    Gera um arquivo ZIP64 incrementalmente, sem manter arquivos inteiros em memória ou disco.
+
+    Cada objeto é lido em pedaços de chunk_size via open_source(key) (objeto com read()).
+    Os próximos `prefetch` objetos são abertos em paralelo (e o primeiro pedaço já lido),
+    o que esconde a latência do GET de cada arquivo. Objetos que falharem são listados
+    em errors_name no final do ZIP, sem interromper o download, junto com `errors`
+    (falhas já conhecidas ao montar as entradas).
+    """
+    entries = list(entries)
+    sink = _ChunkSink()
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="zip-prefetch")
+    pending = deque()
+    next_to_fetch = 0
+    errors = list(errors)
+
+    def fetch(key):
+        src = open_source(key)
+        return src, src.read(chunk_size)
+
+    def fill_window():
+        nonlocal next_to_fetch
+        while next_to_fetch < len(entries) and len(pending) < prefetch:
+            entry = entries[next_to_fetch]
+            if entry.source is not None:
+                pending.append((next_to_fetch, executor.submit(fetch, entry.source)))
+            next_to_fetch += 1
+
+    try:
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+            for index, entry in enumerate(entries):
+                fill_window()
+                info = _zip_info(entry)
+
+                if entry.source is None:
+                    zf.writestr(info, b"")
+                    yield from sink.drain()
+                    continue
+
+                _, future = pending.popleft()  # A janela de prefetch começa no arquivo atual
+                try:
+                    src, data = future.result()
+                except Exception as e:
+                    errors.append(f"{entry.arcname}: {e}")
+                    continue
+
+                try:
+                    with zf.open(info, "w", force_zip64=True) as dest:
+                        while data:
+                            dest.write(data)
+                            yield from sink.drain()
+                            data = src.read(chunk_size)
+                except Exception as e:
+                    # Falha no meio do objeto: o ZIP já tem o início dele, registrar e seguir
+                    errors.append(f"{entry.arcname}: {e}")
+                finally:
+                    getattr(src, "close", lambda: None)()
+                yield from sink.drain()
+
+            if errors:
+                zf.writestr(_zip_info(ZipEntry(errors_name, source=errors_name)), "\n".join(errors) + "\n")
+        yield from sink.drain()
+    finally:
+        # Cliente desconectou ou terminou: fechar objetos já abertos pelo prefetch
+        for _, future in pending:
+            if not future.cancel() and future.done() and not future.exception():
+                getattr(future.result()[0], "close", lambda: None)()
+        executor.shutdown(wait=False)
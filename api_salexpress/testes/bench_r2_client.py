@@ -0,0 +1,145 @@
+"""
+Benchmark do client R2/S3: client novo por chamada (comportamento antigo) x client compartilhado
+
+Sobe um S3 local com moto (pip install "moto[server]") e mede a latência por chamada de
+upload_image, generate_presigned_url e delete_image, em série e com várias threads
+(simulando o threadpool dos endpoints síncronos do FastAPI).
+
+Uso (a partir de api_salexpress/):
+    python -m testes.bench_r2_client
+    python -m testes.bench_r2_client --chamadas 300 --threads 16
+    python -m testes.bench_r2_client --endpoint http://localhost:9000   # S3 já rodando (ex: MinIO)
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BUCKET = "bench-r2-client"
+ACCESS_KEY = "bench"
+SECRET_KEY = "bench-secret"
+
+
+def _iniciar_moto():
+    import logging
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # Sem log por requisição
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, f"http://{host}:{port}"
+
+
+def _client_antigo():
+    """Reproduz o _client() anterior: um boto3.client novo a cada chamada"""
+    import boto3
+
+    from app.utils import cloudflare_r2 as r2
+
+    return boto3.client(
+        "s3",
+        endpoint_url=r2.R2_ENDPOINT,
+        aws_access_key_id=r2.R2_ACCESS_KEY,
+        aws_secret_access_key=r2.R2_SECRET_KEY,
+        region_name="auto",
+    )
+
+
+def _operacoes(get_client):
+    """Mesmas chamadas de upload_image / generate_presigned_url / delete_image"""
+    from app.utils import cloudflare_r2 as r2
+
+    def upload(i):
+        key = f"bench/{i}.txt"
+        get_client().upload_fileobj(
+            Fileobj=io.BytesIO(b"x" * 1024), Bucket=r2.R2_BUCKET, Key=key,
+            ExtraArgs={"ContentType": "text/plain"}
+        )
+
+    def presign(i):
+        get_client().generate_presigned_url(
+            "get_object", Params={"Bucket": r2.R2_BUCKET, "Key": f"bench/{i}.txt"}, ExpiresIn=3600
+        )
+
+    def delete(i):
+        get_client().delete_object(Bucket=r2.R2_BUCKET, Key=f"bench/{i}.txt")
+
+    return [("upload", upload), ("presign", presign), ("delete", delete)]
+
+
+def _medir(fn, chamadas, threads):
+    def cronometrar(i):
+        inicio = time.perf_counter()
+        fn(i)
+        return (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    if threads <= 1:
+        tempos = [cronometrar(i) for i in range(chamadas)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            tempos = list(pool.map(cronometrar, range(chamadas)))
+    total = time.perf_counter() - inicio
+    p95 = statistics.quantiles(tempos, n=20)[-1]
+    return statistics.median(tempos), p95, chamadas / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do client R2/S3 (novo por chamada x compartilhado)")
+    parser.add_argument("--chamadas", type=int, default=200, help="Chamadas por operação")
+    parser.add_argument("--threads", type=int, default=8, help="Threads na rodada concorrente")
+    parser.add_argument("--endpoint", help="Endpoint S3 já rodando (padrão: sobe um moto server local)")
+    args = parser.parse_args()
+
+    server = None
+    endpoint = args.endpoint
+    if not endpoint:
+        server, endpoint = _iniciar_moto()
+
+    # Aponta o módulo para o S3 local antes de carregar as settings
+    os.environ.update({
+        "R2_ENDPOINT": endpoint,
+        "R2_BUCKET": BUCKET,
+        "R2_ACCESS_KEY": ACCESS_KEY,
+        "R2_SECRET_KEY": SECRET_KEY,
+    })
+    from app.utils import cloudflare_r2 as r2
+
+    try:
+        r2._client().create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "auto"})
+    except r2.ClientError as e:
+        if e.response["Error"]["Code"] not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+            raise
+
+    try:
+        print(f"🪣 {endpoint} | {args.chamadas} chamadas por operação\n")
+        print(f"{'rodada':<22}{'operação':<10}{'antes med/p95 (ms)':>22}{'depois med/p95 (ms)':>23}{'req/s antes x depois':>24}")
+
+        for threads in (1, args.threads):
+            rodada = "serial" if threads == 1 else f"{threads} threads"
+            antes = dict(_operacoes(_client_antigo))
+            depois = dict(_operacoes(r2._client))
+            for nome in antes:
+                a_med, a_p95, a_rps = _medir(antes[nome], args.chamadas, threads)
+                d_med, d_p95, d_rps = _medir(depois[nome], args.chamadas, threads)
+                print(
+                    f"{rodada:<22}{nome:<10}{a_med:>12.2f} / {a_p95:<8.2f}{d_med:>13.2f} / {d_p95:<8.2f}"
+                    f"{a_rps:>12.0f} x {d_rps:<8.0f}"
+                )
+
+        print(f"\nℹ️  max_pool_connections={r2._client().meta.config.max_pool_connections}; "
+              "com mais threads que conexões, as chamadas esperam por uma conexão livre.")
+    finally:
+        r2.reset_client()
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
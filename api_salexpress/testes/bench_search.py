@@ -0,0 +1,80 @@
+"""
+Benchmark da busca de documentos: ILIKE '%termo%' x índice FULLTEXT
+
+Roda direto no banco configurado em app/core/conn.py (MySQL), sem passar pela API.
+Requer a migration d8b1f5c3e207 (coluna search_text e índice ix_storage_nodes_search_text) aplicada.
+
+Uso (a partir de api_salexpress/):
+    python -m testes.bench_search contrato relatorio "nota fiscal"
+    python -m testes.bench_search --repeticoes 20 contrato
+"""
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import or_
+
+from app.core.conn import SessionLocal
+from app.crud.search import build_fulltext_query, search_filter, search_relevance
+from app.models.storage import StorageNode
+
+
+def _ilike_query(db, termo):
+    like = f"%{termo}%"
+    return db.query(StorageNode.id).filter(
+        StorageNode.deleted_at.is_(None),
+        or_(StorageNode.name.ilike(like), StorageNode.comments.ilike(like))
+    )
+
+
+def _fulltext_query(db, termo):
+    return db.query(StorageNode.id).filter(
+        StorageNode.deleted_at.is_(None),
+        search_filter(db, termo)
+    ).order_by(search_relevance(db, termo).desc())
+
+
+def _medir(fn, repeticoes):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), max(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ILIKE x FULLTEXT na busca de storage_nodes")
+    parser.add_argument("termos", nargs="+", help="Termos de busca a medir")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = db.query(StorageNode.id).count()
+        print(f"📦 storage_nodes: {total} linhas | {args.repeticoes} repetições por termo\n")
+        print(f"{'termo':<24}{'ILIKE med/max (ms)':>22}{'FULLTEXT med/max (ms)':>25}{'linhas':>16}")
+
+        for termo in args.termos:
+            if not build_fulltext_query(termo):
+                print(f"{termo:<24}  ⚠️ termo curto/stopword: a busca usa ILIKE (sem índice)")
+                continue
+
+            ilike_med, ilike_max, ilike_rows = _medir(lambda: _ilike_query(db, termo).all(), args.repeticoes)
+            ft_med, ft_max, ft_rows = _medir(lambda: _fulltext_query(db, termo).all(), args.repeticoes)
+
+            print(
+                f"{termo:<24}{ilike_med:>12.1f} / {ilike_max:<8.1f}{ft_med:>14.1f} / {ft_max:<8.1f}"
+                f"{len(ilike_rows):>7} x {len(ft_rows):<6}"
+            )
+
+        print("\nℹ️  FULLTEXT casa prefixos de palavras; ILIKE casa qualquer trecho,")
+        print("   então o número de linhas pode diferir (ex: 'trato' só casa no ILIKE).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Teste manual da coleta de objetos órfãos do R2 (app/services/storage/r2_gc.py) contra um S3 local
+
+Sobe um S3 com moto (pip install "moto[server]"), cria objetos referenciados, órfãos,
+recentes e em prefixo protegido, e roda a coleta em dry-run e de verdade com um
+conjunto de referências sintético (sem banco). Confere que só os órfãos saem do
+bucket, em lotes de DeleteObjects, respeitando a vazão configurada.
+
+Uso (a partir de api_salexpress/):
+    python -m testes.gc_r2_local
+    python -m testes.gc_r2_local --objetos 5000 --vazao 2000
+    python -m testes.gc_r2_local --endpoint http://localhost:9000   # S3 já rodando (ex: MinIO)
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+BUCKET = "gc-r2-local"
+ACCESS_KEY = "gc"
+SECRET_KEY = "gc-secret"
+
+
+def _iniciar_moto():
+    import logging
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # Sem log por requisição
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, f"http://{host}:{port}"
+
+
+def _keys_do_bucket(r2, prefix=""):
+    return {obj["Key"] for page in r2.iter_object_pages(prefix) for obj in page}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coleta de órfãos do R2 contra um S3 local")
+    parser.add_argument("--objetos", type=int, default=2500, help="Objetos criados (metade fica órfã)")
+    parser.add_argument("--vazao", type=float, default=1000.0, help="Objetos apagados por segundo")
+    parser.add_argument("--endpoint", help="Endpoint S3 já rodando (padrão: sobe um moto server local)")
+    args = parser.parse_args()
+
+    server = None
+    endpoint = args.endpoint
+    if not endpoint:
+        server, endpoint = _iniciar_moto()
+
+    # Aponta o módulo para o S3 local antes de carregar as settings
+    os.environ.update({
+        "R2_ENDPOINT": endpoint,
+        "R2_BUCKET": BUCKET,
+        "R2_ACCESS_KEY": ACCESS_KEY,
+        "R2_SECRET_KEY": SECRET_KEY,
+    })
+    from app.utils import cloudflare_r2 as r2
+    from app.services.storage.r2_gc import collect_orphans
+
+    client = r2._client()
+    try:
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "auto"})
+    except r2.ClientError as e:
+        if e.response["Error"]["Code"] not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+            raise
+
+    try:
+        keys = [f"{i:06d}.pdf" for i in range(args.objetos)]
+        protegidas = [f"fotos/{i}.png" for i in range(10)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(lambda k: client.put_object(Bucket=BUCKET, Key=k, Body=b"x" * 100), keys + protegidas))
+
+        referenciadas = set(keys[::2])
+        orfas = set(keys) - referenciadas
+        print(f"🪣 {endpoint} | {len(keys)} objetos, {len(orfas)} órfãos, {len(protegidas)} em prefixo protegido\n")
+
+        # Objetos acabaram de ser criados: "agora" no futuro os torna antigos o bastante
+        futuro = datetime.now(timezone.utc) + timedelta(hours=48)
+        opcoes = dict(min_age_hours=24, protected_prefixes=["fotos/"], deletes_per_second=args.vazao)
+
+        recentes = collect_orphans(referenciadas, dry_run=True, **opcoes)
+        print(f"⏳ sem esperar a carência: {recentes['too_recent']} recentes, {recentes['orphans']} órfãos")
+
+        dry = collect_orphans(referenciadas, dry_run=True, now=futuro, **opcoes)
+        print(f"🔎 dry-run: {dry['orphans']} órfãos ({dry['orphan_bytes']} bytes), {dry['deleted']} apagados")
+        assert dry["orphans"] == len(orfas) and _keys_do_bucket(r2) >= set(keys)
+
+        inicio = time.perf_counter()
+        real = collect_orphans(referenciadas, dry_run=False, now=futuro, **opcoes)
+        duracao = time.perf_counter() - inicio
+        restantes = _keys_do_bucket(r2)
+        print(f"🗑️  coleta: {real['deleted']} apagados em {duracao:.2f}s, {len(real['errors'])} erros")
+        print(f"   lotes de DeleteObjects: {-(-real['deleted'] // r2.DELETE_BATCH_SIZE)} | "
+              f"mínimo pela vazão: {max(0, real['deleted'] - args.vazao) / args.vazao:.2f}s")
+
+        assert restantes == referenciadas | set(protegidas), "bucket divergente após a coleta"
+        print("\n✅ só os órfãos saíram do bucket (referenciados e protegidos intactos)")
+
+        try:
+            collect_orphans(set(), dry_run=False, now=futuro, **opcoes)
+        except RuntimeError as e:
+            print(f"🛡️  sem referências: {e}")
+    finally:
+        for page in r2.iter_object_pages():
+            r2.delete_objects([obj["Key"] for obj in page])
+        r2.reset_client()
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
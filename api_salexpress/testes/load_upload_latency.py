@@ -0,0 +1,114 @@
+"""
+Teste de carga: latência do GET /nodes enquanto uploads grandes estão em andamento
+
+Mede p50/p95/p99 da listagem de nodes em duas fases contra uma API já rodando:
+  1. base: só as listagens
+  2. com uploads: as mesmas listagens com N uploads grandes simultâneos em loop
+     (POST /nodes/upload)
+
+Com os uploads fora do event loop (executor de uploads + threadpool), o p99 da
+listagem deve ficar próximo da fase base. Os arquivos enviados ficam na conta
+informada: use um usuário de teste.
+
+Uso (a partir de api_salexpress/):
+    python -m testes.load_upload_latency --base-url http://localhost:8000 --user-id 1 --tipo-usuario pf
+    python -m testes.load_upload_latency --uploads 8 --tamanho-mb 50 --duracao 30 ...
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+
+def _percentis(tempos):
+    ordenados = sorted(tempos)
+
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+    return p(0.50), p(0.95), p(0.99), ordenados[-1]
+
+
+async def _listar_em_loop(client, params, fim, tempos, erros):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        resp = await client.get("/api/v1/nodes/", params=params)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if resp.status_code != 200:
+            erros.append(resp.status_code)
+
+
+async def _upload_em_loop(client, conteudo, dados, fim, tempos, erros):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        resp = await client.post(
+            "/api/v1/nodes/upload",
+            files={"file": ("carga.bin", conteudo, "application/octet-stream")},
+            data=dados,
+        )
+        tempos.append(time.perf_counter() - inicio)
+        if resp.status_code != 200:
+            erros.append(resp.status_code)
+
+
+async def _fase(args, conteudo=None):
+    params = {"user_id": args.user_id, "tipo_usuario": args.tipo_usuario}
+    dados = {"business_id": str(args.user_id), "type_user": args.tipo_usuario, "name": "teste-carga"}
+    tempos_get, erros_get, tempos_up, erros_up = [], [], [], []
+
+    timeout = httpx.Timeout(300.0)
+    limites = httpx.Limits(max_connections=args.leitores + args.uploads + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limites) as client:
+        fim = time.perf_counter() + args.duracao
+        tarefas = [_listar_em_loop(client, params, fim, tempos_get, erros_get) for _ in range(args.leitores)]
+        if conteudo is not None:
+            tarefas += [_upload_em_loop(client, conteudo, dados, fim, tempos_up, erros_up) for _ in range(args.uploads)]
+        await asyncio.gather(*tarefas)
+
+    return tempos_get, erros_get, tempos_up, erros_up
+
+
+def _imprimir(nome, tempos, erros):
+    if not tempos:
+        print(f"{nome:<14} sem requisições concluídas")
+        return
+    p50, p95, p99, maximo = _percentis(tempos)
+    print(f"{nome:<14}{len(tempos):>8}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{maximo:>10.1f}{len(erros):>8}")
+
+
+async def main_async(args):
+    conteudo = os.urandom(args.tamanho_mb * 1024 * 1024)
+
+    print(f"🌐 {args.base_url} | {args.leitores} leitores GET /nodes | {args.duracao}s por fase")
+    print(f"📤 {args.uploads} uploads simultâneos de {args.tamanho_mb} MB na fase 2\n")
+    print(f"{'fase':<14}{'reqs':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'erros':>8}")
+
+    tempos, erros, _, _ = await _fase(args)
+    _imprimir("base", tempos, erros)
+
+    tempos, erros, tempos_up, erros_up = await _fase(args, conteudo)
+    _imprimir("com uploads", tempos, erros)
+
+    if tempos_up:
+        print(f"\n📦 uploads concluídos: {len(tempos_up)} | mediana {statistics.median(tempos_up):.2f}s | erros: {len(erros_up)}")
+    else:
+        print(f"\n⚠️  nenhum upload concluiu dentro da fase (erros: {len(erros_up)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência do GET /nodes com uploads grandes em andamento")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--tipo-usuario", default="pf")
+    parser.add_argument("--uploads", type=int, default=4, help="Uploads simultâneos na fase 2")
+    parser.add_argument("--tamanho-mb", type=int, default=20, help="Tamanho de cada upload")
+    parser.add_argument("--leitores", type=int, default=4, help="Clientes fazendo GET /nodes em loop")
+    parser.add_argument("--duracao", type=float, default=15.0, help="Segundos por fase")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
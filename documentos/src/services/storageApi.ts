@@ -1,5 +1,10 @@
 import { API_BASE_URL } from '../config/api';
 
+// Arquivos a partir deste tamanho vão ao R2 em partes paralelas (upload multipart retomável)
+const MULTIPART_THRESHOLD_BYTES = 64 * 1024 * 1024;
+const MULTIPART_CONCURRENCY = 4;
+const MULTIPART_STATE_PREFIX = 'multipartUpload:';
+
 // Normalizar tipo de usuário para o formato esperado pela API
 function normalizeTipoUsuario(tipo: string): 'pf' | 'pj' | 'freelancer' | 'collaborator' {
   const tipoLower = tipo.toLowerCase().trim();
@@ -239,6 +244,78 @@ class ApiService {
     return `${n.toFixed(1)} ${units[i]}`;
   }
 
+  // Upload multipart direto para o R2: partes em paralelo, retomável após falha/refresh
+  // (o estado fica no localStorage até o upload ser concluído)
+  private async uploadMultipart(file: File, presignedPayload: Record<string, any>): Promise<string> {
+    const stateKey = `${MULTIPART_STATE_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+    let upload: any = null;
+    let done = new Set<number>();
+
+    const saved = localStorage.getItem(stateKey);
+    if (saved) {
+      try {
+        const previous = JSON.parse(saved);
+        const params = new URLSearchParams({ key: previous.key, upload_id: previous.upload_id });
+        const existing = await this.request<any>(`/api/v1/nodes/upload/multipart/parts?${params}`);
+        done = new Set(existing.parts.map((p: any) => p.part_number));
+        upload = previous;
+        console.log(`🔁 Retomando upload multipart: ${done.size}/${upload.part_count} partes já enviadas`);
+      } catch {
+        localStorage.removeItem(stateKey); // Upload expirou/abortado: recomeçar
+      }
+    }
+
+    if (!upload) {
+      upload = await this.request<any>('/api/v1/nodes/upload/multipart/initiate', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(presignedPayload)
+      });
+      localStorage.setItem(stateKey, JSON.stringify(upload));
+    }
+
+    const pending: number[] = [];
+    for (let n = 1; n <= upload.part_count; n++) {
+      if (!done.has(n)) pending.push(n);
+    }
+
+    if (pending.length) {
+      // A API presigna até 1000 partes por requisição
+      const urls = new Map<number, string>();
+      for (let i = 0; i < pending.length; i += 1000) {
+        const presigned = await this.request<any>('/api/v1/nodes/upload/multipart/presign-parts', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ key: upload.key, upload_id: upload.upload_id, part_numbers: pending.slice(i, i + 1000) })
+        });
+        presigned.parts.forEach((p: any) => urls.set(p.part_number, p.url));
+      }
+
+      const worker = async () => {
+        while (pending.length) {
+          const n = pending.shift()!;
+          const start = (n - 1) * upload.part_size;
+          const response = await fetch(urls.get(n)!, {
+            method: 'PUT',
+            body: file.slice(start, Math.min(start + upload.part_size, file.size))
+          });
+          if (!response.ok) {
+            throw new Error(`Falha no envio da parte ${n}: ${response.statusText}`);
+          }
+        }
+      };
+      await Promise.all(Array.from({ length: MULTIPART_CONCURRENCY }, worker));
+    }
+
+    const completed = await this.request<any>('/api/v1/nodes/upload/multipart/complete', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ key: upload.key, upload_id: upload.upload_id })
+    });
+    localStorage.removeItem(stateKey);
+    return completed.public_url;
+  }
+
   // 1. Criar arquivo/pasta (OTIMIZADO com Upload Direto)
   async createStorageNode(data: CreateFileRequest): Promise<ApiFileItem> {
     const userInfo = getUserInfo();
@@ -264,25 +341,33 @@ class ApiService {
           company_type: userInfo.company_type
         };
 
-        const presigned = await this.request<any>('/api/v1/nodes/upload/presigned', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(presignedPayload)
-        });
-
-        console.log('✅ URL Presignada recebida. Iniciando upload para R2...');
-
-        // 2. Upload Direto para R2 (PUT)
-        const uploadResponse = await fetch(presigned.upload_url, {
-          method: 'PUT',
-          headers: { 
-            'Content-Type': data.file.type || 'application/octet-stream'
-          },
-          body: data.file
-        });
-
-        if (!uploadResponse.ok) {
-          throw new Error(`Falha no upload para R2: ${uploadResponse.statusText}`);
+        let publicUrl: string;
+        if (data.file.size >= MULTIPART_THRESHOLD_BYTES) {
+          // Arquivos grandes: partes paralelas direto para o R2
+          console.log('📦 Arquivo grande: upload multipart para R2...');
+          publicUrl = await this.uploadMultipart(data.file, presignedPayload);
+        } else {
+          const presigned = await this.request<any>('/api/v1/nodes/upload/presigned', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(presignedPayload)
+          });
+
+          console.log('✅ URL Presignada recebida. Iniciando upload para R2...');
+
+          // 2. Upload Direto para R2 (PUT)
+          const uploadResponse = await fetch(presigned.upload_url, {
+            method: 'PUT',
+            headers: { 
+              'Content-Type': data.file.type || 'application/octet-stream'
+            },
+            body: data.file
+          });
+
+          if (!uploadResponse.ok) {
+            throw new Error(`Falha no upload para R2: ${uploadResponse.statusText}`);
+          }
+          publicUrl = presigned.public_url;
         }
         
         console.log('✅ Upload para R2 concluído com sucesso!');
@@ -301,10 +386,11 @@ class ApiService {
           company_id: userInfo.company_id,
           company_type: userInfo.company_type,
           size: sizeStr,
+          size_bytes: data.file.size,
           extension: ext,
           status: data.status || 'Válido',
           comments: data.comments,
-          url: presigned.public_url,
+          url: publicUrl,
           data_validade: data.data_validade
         };
 